@@ -644,12 +644,13 @@ class TONOSAMAApp:
         st.markdown("### 📊 システム情報")
         
         current_state = self.state_manager.get_state()
+        memory_stats = self.state_manager.get_memory_stats()
         
         # システム統計
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("セッション数", 1)
+            st.metric("セッション数", memory_stats["sessions"])
             st.metric("処理ステップ", f"{current_state.current_step}/6")
         
         with col2:
@@ -672,7 +673,11 @@ class TONOSAMAApp:
             "バージョン": "2.0 Diamond Edition",
             "モデル": self.openai.model,
             "対応言語": "14言語",
-            "バックアップ": "自動"
+            "バックアップ": "自動",
+            "セッションメモリ": (
+                f"{memory_stats['resident_bytes'] / 1024 / 1024:.1f}MB / {memory_stats['cap_bytes'] / 1024 / 1024:.0f}MB"
+                f"（退避中 {memory_stats['spilled_sessions']}件）"
+            )
         }
         
         for key, value in settings.items():
@@ -697,9 +702,7 @@ class TONOSAMAApp:
         
         if uploaded_file and st.button("データをインポート"):
             try:
-                import json
-                data = json.load(uploaded_file)
-                if self.state_manager.import_state(data):
+                if self.state_manager.import_state(uploaded_file.getvalue()):
                     st.success("データをインポートしました")
                     st.rerun()
                 else:
@@ -707,26 +710,38 @@ class TONOSAMAApp:
             except Exception as e:
                 st.error(f"ファイル読み込みエラー: {e}")
         
-        # バックアップ管理
+        # バックアップ管理（現在のセッションのみ）
         st.markdown("#### バックアップ管理")
-        backup_dir = Path("data/backups")
-        if backup_dir.exists():
-            backup_files = list(backup_dir.glob("backup_*.json"))
-            if backup_files:
-                st.write(f"バックアップファイル: {len(backup_files)}件")
-                
-                # 最新のバックアップファイル表示
-                latest_backup = max(backup_files, key=lambda x: x.stat().st_mtime)
-                st.write(f"最新バックアップ: {latest_backup.name}")
-                
-                if st.button("最新バックアップから復元"):
-                    if self.state_manager.restore_from_backup(latest_backup):
-                        st.success("バックアップから復元しました")
+        backups = self.state_manager.list_backups()
+        if backups:
+            st.write(f"このセッションのバックアップ: {len(backups)}件")
+            
+            # 最新のバックアップ表示
+            latest_backup = backups[0]
+            st.write(f"最新バックアップ: v{latest_backup['version']} ({latest_backup['created_at'][:19]})")
+            
+            if st.button("最新バックアップから復元"):
+                if self.state_manager.restore_session():
+                    st.success("バックアップから復元しました")
+                    st.rerun()
+                else:
+                    st.error("復元に失敗しました")
+            
+            # 過去バージョンの選択復元
+            if len(backups) > 1:
+                selected_version = st.selectbox(
+                    "復元するバージョン",
+                    options=[b["version"] for b in backups],
+                    format_func=lambda v: f"v{v}"
+                )
+                if st.button("選択したバージョンに復元"):
+                    if self.state_manager.restore_session(version=selected_version):
+                        st.success(f"v{selected_version} に復元しました")
                         st.rerun()
                     else:
                         st.error("復元に失敗しました")
-            else:
-                st.info("バックアップファイルがありません")
+        else:
+            st.info("バックアップファイルがありません")
         
         # セッションリセット
         st.markdown("#### 危険な操作")
@@ -766,10 +781,7 @@ class TONOSAMAApp:
     def export_session_data(self):
         """セッションデータエクスポート"""
         try:
-            data = self.state_manager.export_state()
-            
-            import json
-            json_data = json.dumps(data, ensure_ascii=False, indent=2)
+            json_data = self.state_manager.export_state_json()
             
             current_state = self.state_manager.get_state()
             filename = f"tonosama_data_{current_state.session_id[:8]}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
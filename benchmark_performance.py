@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+⏱️ TONOSAMA Professional System - Performance Benchmark
+1兆円ダイヤモンド級品質の性能計測システム
+
+大規模メニューでの主要処理の従来経路との比較計測
+"""
+
+import sys
+import time
+import json
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List
+
+def print_header(title: str):
+    """ヘッダー表示"""
+    print("\n" + "="*60)
+    print(f"🏮 {title}")
+    print("="*60)
+
+def print_result(label: str, baseline_ms: float, optimized_ms: float):
+    """計測結果表示"""
+    speedup = baseline_ms / optimized_ms if optimized_ms else 0.0
+    print(f"⏱️ {label}: 従来 {baseline_ms:.2f}ms → 最適化 {optimized_ms:.2f}ms (x{speedup:.1f})")
+
+def measure(fn: Callable[[], Any], repeat: int) -> float:
+    """1回あたりの平均実行時間（ミリ秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+class TONOSAMABenchmark:
+    """TONOSAMA性能ベンチマーク"""
+    
+    def __init__(self, menu_size: int = 2000, repeat: int = 10):
+        self.menu_size = menu_size
+        self.repeat = repeat
+        self.results: List[Dict[str, Any]] = []
+        
+    def build_state(self):
+        """大規模メニューを持つ状態生成"""
+        from modules.state_manager import SystemState, StoreInfo, MenuItem
+        
+        menu = [
+            MenuItem(
+                id=f"menu_{i}",
+                name=f"料理{i}",
+                price=500 + i,
+                category=["前菜", "メイン", "デザート", "ドリンク"][i % 4],
+                desc=f"料理{i}の説明" * 5,
+                image_hash=f"{i:064x}",
+                recommendation_score=i % 5 + 1
+            )
+            for i in range(self.menu_size)
+        ]
+        
+        return SystemState(
+            session_id="benchmark",
+            store=StoreInfo(store_name_ja="ベンチマーク店", store_type="和食"),
+            menu=menu,
+            menu_order=[item.id for item in menu],
+            imperator_answers={f"q{i}": "回答" * 20 for i in range(15)},
+            generated_content={item.id: {"en": "description " * 10, "zh": "说明" * 10} for item in menu},
+            uploaded_menu_files=[],
+            validation_errors=[],
+            processing_status={}
+        )
+        
+    def benchmark_state_codec(self) -> None:
+        """状態コーデック往復（asdict+json vs StateCodec）"""
+        from modules.state_manager import SystemState, state_codec
+        from modules.state_codec import ORJSON_AVAILABLE
+        
+        print_header(f"状態コーデック往復 (メニュー {self.menu_size}品, orjson={'有' if ORJSON_AVAILABLE else '無'})")
+        state = self.build_state()
+        
+        def legacy_round_trip():
+            data = json.loads(json.dumps(asdict(state), ensure_ascii=False))
+            return SystemState(**data)
+            
+        baseline = measure(legacy_round_trip, self.repeat)
+        optimized = measure(lambda: state_codec.round_trip(state), self.repeat)
+        
+        restored = state_codec.round_trip(state)
+        assert type(restored.menu[0]).__name__ == "MenuItem", "MenuItem復元失敗"
+        assert type(restored.store).__name__ == "StoreInfo", "StoreInfo復元失敗"
+        assert state_codec.encode(restored) == state_codec.encode(state), "往復で内容が変化"
+        
+        print_result("エクスポート→インポート", baseline, optimized)
+        self.results.append({"name": "state_codec", "baseline_ms": baseline, "optimized_ms": optimized})
+        
+    def benchmark_menu_table(self) -> None:
+        """メニュー統計（リスト走査 vs 列指向テーブル）・1品あたりメモリ"""
+        import tracemalloc
+        from modules.menu_table import MenuTable
+        
+        size = max(self.menu_size, 10000)
+        print_header(f"メニュー統計 (メニュー {size}品)")
+        self.menu_size, original_size = size, self.menu_size
+        state = self.build_state()
+        self.menu_size = original_size
+        
+        def legacy_stats():
+            menu = state.menu
+            avg_price = sum(item.price for item in menu) / len(menu)
+            high_recommend = len([item for item in menu if item.recommendation_score >= 4])
+            category_counts = {}
+            for item in menu:
+                category = item.category or "その他"
+                category_counts[category] = category_counts.get(category, 0) + 1
+            by_price = [item.id for item in sorted(menu, key=lambda item: item.price)]
+            return avg_price, high_recommend, category_counts, by_price
+        
+        table = MenuTable.from_items(state.menu)
+        
+        def table_stats():
+            return (table.average_price(), table.count_recommended(4),
+                    table.category_counts(), table.sorted_ids("price"))
+        
+        assert legacy_stats() == table_stats(), "集計結果が不一致"
+        
+        baseline = measure(legacy_stats, self.repeat)
+        optimized = measure(table_stats, self.repeat)
+        build_ms = measure(lambda: MenuTable.from_items(state.menu), self.repeat)
+        print_result("平均・推奨数・カテゴリ別・価格順", baseline, optimized)
+        print(f"⏱️ テーブル構築（メニュー変更時のみ）: {build_ms:.2f}ms")
+        
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        items = self.build_state().menu
+        per_item = (tracemalloc.get_traced_memory()[0] - before) / len(items)
+        tracemalloc.stop()
+        print(f"💾 MenuItem 1品あたりメモリ（文字列含む）: {per_item:.0f} bytes")
+        
+        self.results.append({"name": "menu_table", "baseline_ms": baseline, "optimized_ms": optimized})
+        
+    def benchmark_food_report_csv(self) -> None:
+        """14言語食レポCSV生成（セル単位ループ vs 列単位構築）"""
+        from modules.csv_generator import get_csv_generator
+        
+        csv_generator = get_csv_generator()
+        size = max(self.menu_size, 5000)
+        print_header(f"14言語食レポCSV生成 (メニュー {size}品)")
+        
+        codes = [lang['code'] for lang in csv_generator.languages]
+        menu_data = [
+            {"id": f"menu_{i}", "name": f"料理{i}", "price": 500 + i, "category": "メイン"}
+            for i in range(size)
+        ]
+        # 一部の言語のみ生成済み（残りはフォールバック補完）
+        generated_data = {
+            f"menu_{i}": {code: f"{code} 食レポ{i} " * 20 for code in codes[:i % len(codes)]}
+            for i in range(size)
+        }
+        
+        def legacy_csv():
+            headers = ['メニューID', '料理名', '価格', 'カテゴリー']
+            for lang in csv_generator.languages:
+                headers.append(f"説明文_{lang['name']}")
+            rows = []
+            for i, item in enumerate(menu_data):
+                row = [
+                    item.get('id', f'menu_{i+1}'),
+                    item.get('name', ''),
+                    item.get('price', ''),
+                    item.get('category', 'メイン料理')
+                ]
+                for lang in csv_generator.languages:
+                    item_id = item.get('id', f'menu_{i+1}')
+                    if item_id in generated_data and lang['code'] in generated_data[item_id]:
+                        row.append(generated_data[item_id][lang['code']])
+                    else:
+                        row.append(csv_generator._get_fallback_menu_description(item, lang['code']))
+                rows.append(row)
+            return csv_generator._create_csv_content([headers] + rows)
+        
+        def vectorized_csv():
+            return csv_generator.generate_multilingual_food_report_csv(menu_data, generated_data, "ベンチマーク店")['content']
+        
+        assert legacy_csv() == vectorized_csv(), "CSV出力が不一致"
+        
+        repeat = max(1, self.repeat // 2)
+        baseline = measure(legacy_csv, repeat)
+        optimized = measure(vectorized_csv, repeat)
+        print_result("横型テーブル構築＋CSV書き出し", baseline, optimized)
+        
+        self.results.append({"name": "food_report_csv", "baseline_ms": baseline, "optimized_ms": optimized})
+        
+    def benchmark_food_report_csv_incremental(self) -> None:
+        """食レポCSV再出力（全行再構築 vs 行キャッシュ再利用・毎回1品のみ変更）"""
+        import codecs
+        from modules.csv_generator import get_csv_generator
+        
+        csv_generator = get_csv_generator()
+        size = 1000
+        print_header(f"食レポCSV再出力 (メニュー {size}品・1品変更)")
+        
+        codes = [lang['code'] for lang in csv_generator.languages]
+        menu_data = [
+            {"id": f"menu_{i}", "name": f"料理{i}", "price": 500 + i, "category": "メイン"}
+            for i in range(size)
+        ]
+        generated_data = {
+            f"menu_{i}": {code: f"{code} 食レポ{i} " * 20 for code in codes}
+            for i in range(size)
+        }
+        edits = iter(range(10 ** 9))
+        
+        def edit_one():
+            n = next(edits)
+            generated_data[f"menu_{n % size}"] = dict(generated_data[f"menu_{n % size}"], en=f"edited {n}")
+        
+        def full_rebuild():
+            edit_one()
+            content = csv_generator.generate_multilingual_food_report_csv(menu_data, generated_data, "ベンチマーク店")['content']
+            return codecs.BOM_UTF8 + content.encode('utf-8')
+        
+        def cached_export():
+            edit_one()
+            return csv_generator.render_multilingual_food_report_csv(menu_data, generated_data)
+        
+        assert full_rebuild() == csv_generator.render_multilingual_food_report_csv(menu_data, generated_data), "CSV出力が不一致"
+        
+        baseline = measure(full_rebuild, self.repeat)
+        optimized = measure(cached_export, self.repeat)
+        print_result("全行エンコード → 変更行のみ再エンコード", baseline, optimized)
+        
+        self.results.append({"name": "food_report_csv_incremental", "baseline_ms": baseline, "optimized_ms": optimized})
+        
+    def benchmark_download_payload(self) -> None:
+        """ダウンロードボタン再描画（毎回生成 vs ETagキャッシュ）"""
+        from modules.csv_generator import get_csv_generator
+        
+        csv_generator = get_csv_generator()
+        size = max(self.menu_size, 5000)
+        print_header(f"食レポCSVダウンロード再描画 (メニュー {size}品)")
+        
+        codes = [lang['code'] for lang in csv_generator.languages]
+        menu_data = [
+            {"id": f"menu_{i}", "name": f"料理{i}", "price": 500 + i, "category": "メイン"}
+            for i in range(size)
+        ]
+        generated_data = {
+            f"menu_{i}": {code: f"{code} 食レポ{i} " * 20 for code in codes[:i % len(codes)]}
+            for i in range(size)
+        }
+        
+        def regenerate():
+            content = csv_generator.generate_multilingual_food_report_csv(menu_data, generated_data, "ベンチマーク店")['content']
+            return csv_generator.create_downloadable_csv(content, "")
+        
+        def memoized():
+            return csv_generator.food_report_payload(menu_data, generated_data, "ベンチマーク店")['data']
+        
+        assert regenerate() == memoized(), "CSV出力が不一致"
+        
+        repeat = max(1, self.repeat // 2)
+        baseline = measure(regenerate, repeat)
+        optimized = measure(memoized, repeat)
+        print_result("再実行ごとの生成 → ETag一致時はキャッシュ", baseline, optimized)
+        
+        self.results.append({"name": "download_payload", "baseline_ms": baseline, "optimized_ms": optimized})
+        
+    def benchmark_columnar_export(self) -> None:
+        """食レポ読み込み（QUOTE_ALL・BOM付きCSV vs 型付きParquet）"""
+        import io
+        import pandas as pd
+        from modules.csv_generator import get_csv_generator, PYARROW_AVAILABLE
+        
+        size = max(self.menu_size, 5000)
+        print_header(f"食レポ読み込み (メニュー {size}品)")
+        if not PYARROW_AVAILABLE:
+            print("⏭️ pyarrow未インストールのためスキップ")
+            return
+        
+        import pyarrow.parquet as pq
+        
+        csv_generator = get_csv_generator()
+        codes = [lang['code'] for lang in csv_generator.languages]
+        menu_data = [
+            {"id": f"menu_{i}", "name": f"料理{i}", "price": 500 + i, "category": "メイン"}
+            for i in range(size)
+        ]
+        generated_data = {
+            f"menu_{i}": {code: f"{code} 食レポ{i} " * 20 for code in codes[:i % len(codes)]}
+            for i in range(size)
+        }
+        
+        csv_bytes = csv_generator.render_multilingual_food_report_csv(menu_data, generated_data)
+        parquet_bytes = csv_generator.table_to_bytes(csv_generator.food_report_table(menu_data, generated_data))
+        
+        repeat = max(1, self.repeat // 2)
+        baseline = measure(lambda: pd.read_csv(io.BytesIO(csv_bytes), encoding='utf-8-sig'), repeat)
+        optimized = measure(lambda: pq.read_table(io.BytesIO(parquet_bytes)).to_pandas(), repeat)
+        print_result("CSV解析 → Parquet読み込み", baseline, optimized)
+        print(f"📦 サイズ: CSV {len(csv_bytes) / 1e6:.1f}MB → Parquet {len(parquet_bytes) / 1e6:.1f}MB")
+        
+        self.results.append({"name": "columnar_export", "baseline_ms": baseline, "optimized_ms": optimized})
+        
+    def benchmark_layout_pivot(self) -> None:
+        """取引先向けレイアウト生成（レイアウトごとに縦持ち構築・走査 vs 1回構築・1回走査）"""
+        from modules.csv_generator import get_csv_generator
+        from modules.multilingual_pivot import PACKAGE_PARTNER_LAYOUTS, get_pivot_engine
+        
+        size = max(self.menu_size, 5000)
+        print_header(f"取引先向けレイアウト生成 (メニュー {size}品)")
+        
+        csv_generator = get_csv_generator()
+        engine = get_pivot_engine()
+        codes = [lang['code'] for lang in csv_generator.languages]
+        menu_data = [
+            {"id": f"menu_{i}", "name": f"料理{i}", "price": 500 + i, "category": "メイン"}
+            for i in range(size)
+        ]
+        generated_data = {
+            f"menu_{i}": {code: f"{code} 食レポ{i}" for code in codes[:i % len(codes)]}
+            for i in range(size)
+        }
+        layouts = ["shota_food_report"] + [name for name in PACKAGE_PARTNER_LAYOUTS if name in engine.layouts_for("food_report")]
+        
+        def per_layout():
+            for name in layouts:
+                engine.pivot(csv_generator.food_report_records(menu_data, generated_data), name)
+                
+        def one_pass():
+            engine.pivot_many(csv_generator.food_report_records(menu_data, generated_data), layouts)
+            
+        repeat = max(1, self.repeat // 2)
+        baseline = measure(per_layout, repeat)
+        optimized = measure(one_pass, repeat)
+        print_result(f"レイアウト{len(layouts)}種: 個別生成 → 一括ピボット", baseline, optimized)
+        
+        self.results.append({"name": "layout_pivot", "baseline_ms": baseline, "optimized_ms": optimized})
+        
+    def run_all(self) -> bool:
+        """全ベンチマーク実行"""
+        print_header("TONOSAMA Performance Benchmark")
+        
+        benchmarks = [
+            self.benchmark_state_codec,
+            self.benchmark_menu_table,
+            self.benchmark_food_report_csv,
+            self.benchmark_food_report_csv_incremental,
+            self.benchmark_download_payload,
+            self.benchmark_columnar_export,
+            self.benchmark_layout_pivot
+        ]
+        
+        all_passed = True
+        for benchmark in benchmarks:
+            try:
+                benchmark()
+            except Exception as e:
+                print(f"❌ {benchmark.__name__}: {e}")
+                all_passed = False
+                
+        return all_passed
+
+def main():
+    """メイン実行"""
+    menu_size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    benchmark = TONOSAMABenchmark(menu_size=menu_size)
+    success = benchmark.run_all()
+    
+    # 終了コード
+    sys.exit(0 if success else 1)
+
+if __name__ == "__main__":
+    main()
@@ -17,7 +17,22 @@ MODULES = {
     "google_drive": "Google Drive連携システム",
     "email_service": "メール送信システム",
     "ui_styling": "UIスタイリングシステム",
-    "error_handler": "エラーハンドリングシステム"
+    "error_handler": "エラーハンドリングシステム",
+    "dish_similarity": "料理類似検索システム",
+    "state_persistence": "状態永続化システム",
+    "state_store": "セッション別状態ストア",
+    "blob_store": "コンテンツアドレス型画像ストア",
+    "state_events": "変更フィールド追跡・変更通知",
+    "state_codec": "スキーマバージョン付き状態コーデック",
+    "menu_table": "列指向メニューテーブル",
+    "workspace": "複数店舗ワークスペース",
+    "session_memory": "セッションメモリ管理",
+    "state_backend": "共有状態バックエンド",
+    "state_history": "元に戻す・やり直し履歴",
+    "menu_ordering": "メニュー並び替えエンジン",
+    "package_archive": "完全パッケージZIPストリーミング",
+    "menu_import": "メニュー一括インポート",
+    "multilingual_pivot": "多言語データ縦持ち・ピボットエンジン"
 }
 
 def get_module_info():
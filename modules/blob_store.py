@@ -0,0 +1,201 @@
+"""
+TONOSAMA Professional System - Blob Store Module
+コンテンツアドレス型画像ストア - 1兆円ダイヤモンド級品質
+
+画像バイト列をSHA-256ハッシュで管理し、SystemStateにはハッシュのみ保持
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import time
+import logging
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Set, Union
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# BLOBハッシュ（SHA-256の16進64文字）
+BLOB_HASH_PATTERN = re.compile(r"(?<![0-9a-f])[0-9a-f]{64}(?![0-9a-f])")
+
+def find_blob_refs(document: Union[str, bytes]) -> Set[str]:
+    """直列化済み文書（状態・スナップショット・差分）中のBLOBハッシュを抽出
+    
+    フィールド構造に依存せずハッシュ形式の文字列をすべて参照とみなす（削除漏れ側に倒す保守的なマーク）
+    """
+    if isinstance(document, (bytes, bytearray, memoryview)):
+        document = bytes(document).decode("utf-8", errors="ignore")
+    return set(BLOB_HASH_PATTERN.findall(document))
+
+class BlobStore:
+    """ローカルディスク上のコンテンツアドレス型BLOBストア"""
+    
+    def __init__(self, root: Path = Path("data/blobs"), chunk_size: int = 1024 * 1024):
+        """初期化 - 保存ディレクトリ準備"""
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.chunk_size = chunk_size
+        
+    def path(self, blob_hash: str) -> Path:
+        """ハッシュから保存パスを算出（先頭2文字でディレクトリ分散）"""
+        return self.root / blob_hash[:2] / blob_hash[2:]
+        
+    def exists(self, blob_hash: str) -> bool:
+        """BLOB存在確認"""
+        return bool(blob_hash) and self.path(blob_hash).exists()
+        
+    def put(self, data: Union[bytes, bytearray, memoryview]) -> str:
+        """BLOB保存（同一内容は重複保存しない）"""
+        blob_hash = hashlib.sha256(data).hexdigest()
+        
+        if self.exists(blob_hash):
+            self._touch(blob_hash)
+        else:
+            self._atomic_write(blob_hash, [bytes(data)])
+            
+        return blob_hash
+        
+    def put_stream(self, stream: BinaryIO) -> str:
+        """ファイルオブジェクトからのBLOB保存（チャンク単位でハッシュ計算）"""
+        hasher = hashlib.sha256()
+        tmp_fd, tmp_name = tempfile.mkstemp(dir=self.root, prefix=".incoming_")
+        
+        try:
+            with os.fdopen(tmp_fd, "wb") as tmp:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+                    
+            blob_hash = hasher.hexdigest()
+            target = self.path(blob_hash)
+            
+            if target.exists():
+                os.unlink(tmp_name)
+                self._touch(blob_hash)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_name, target)
+                
+            return blob_hash
+            
+        except Exception:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+            
+    def get(self, blob_hash: str) -> Optional[bytes]:
+        """BLOB読み込み"""
+        if not self.exists(blob_hash):
+            return None
+            
+        with open(self.path(blob_hash), "rb") as f:
+            return f.read()
+            
+    def view(self, blob_hash: str) -> Optional[memoryview]:
+        """mmapによるゼロコピー読み込み（読み取り専用）"""
+        if not self.exists(blob_hash):
+            return None
+            
+        with open(self.path(blob_hash), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            
+        return memoryview(mapped)
+        
+    def iter_chunks(self, blob_hash: str) -> Iterator[bytes]:
+        """チャンク単位の逐次読み込み"""
+        with open(self.path(blob_hash), "rb") as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+                
+    def size(self, blob_hash: str) -> int:
+        """BLOBサイズ（バイト）"""
+        return self.path(blob_hash).stat().st_size if self.exists(blob_hash) else 0
+        
+    def delete(self, blob_hash: str) -> None:
+        """BLOB削除"""
+        if self.exists(blob_hash):
+            self.path(blob_hash).unlink()
+            
+    def collect_garbage(self, live_hashes: Iterable[str], min_age_seconds: float = 3600.0) -> Dict[str, int]:
+        """マーク&スイープ - 参照されていないBLOBの削除（統計を返却）
+        
+        live_hashes は呼び出し側で全状態・バックアップから収集したハッシュ
+        保存・再利用から min_age_seconds 未満のBLOBと書き込み途中の一時ファイルは保持
+        （マーク後に保存された画像を参照する状態がまだ永続化されていない場合の保護）
+        """
+        live = set(live_hashes)
+        cutoff = time.time() - min_age_seconds
+        stats = {"kept": 0, "removed": 0, "freed_bytes": 0}
+        
+        for path in list(self.root.glob(".incoming_*")) + list(self.root.glob("*/*")):
+            try:
+                if not path.is_file():
+                    continue
+                info = path.stat()
+                referenced = not path.name.startswith(".incoming_") and path.parent.name + path.name in live
+                if referenced or info.st_mtime >= cutoff:
+                    stats["kept"] += 1
+                    continue
+                path.unlink(missing_ok=True)
+                stats["removed"] += 1
+                stats["freed_bytes"] += info.st_size
+            except OSError as e:
+                logger.warning(f"BLOB削除エラー: {e}")
+                
+        if stats["removed"]:
+            logger.info(f"未参照BLOBを削除: {stats['removed']}件 ({stats['freed_bytes']}バイト)")
+        return stats
+        
+    def get_stats(self) -> Dict[str, int]:
+        """ストア統計"""
+        files = [p for p in self.root.glob("*/*") if p.is_file()]
+        return {
+            "blob_count": len(files),
+            "total_bytes": sum(p.stat().st_size for p in files)
+        }
+        
+    def _touch(self, blob_hash: str) -> None:
+        """更新日時の更新（再利用されたBLOBをガベージコレクションの猶予期間で保護）"""
+        try:
+            os.utime(self.path(blob_hash))
+        except OSError as e:
+            logger.warning(f"BLOB更新日時の更新エラー: {e}")
+            
+    def _atomic_write(self, blob_hash: str, chunks) -> None:
+        """一時ファイル経由の書き込み（同時書き込みでも破損しない）"""
+        target = self.path(blob_hash)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=".incoming_")
+        
+        try:
+            with os.fdopen(tmp_fd, "wb") as tmp:
+                for chunk in chunks:
+                    tmp.write(chunk)
+            os.replace(tmp_name, target)
+        except Exception as e:
+            logger.error(f"BLOB書き込みエラー: {e}")
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+
+# グローバルインスタンス
+_blob_store = None
+
+def get_blob_store() -> BlobStore:
+    """BLOBストアの取得"""
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore()
+    return _blob_store
@@ -7,17 +7,44 @@ TONOSAMA Professional System - CSV Generator Module
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import io
+import itertools
 import csv
+import codecs
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Any, Sequence, Tuple, Union
 import logging
 from dataclasses import asdict
+from modules.state_codec import StateCodec
+from modules.multilingual_pivot import LongTable, PACKAGE_PARTNER_LAYOUTS, get_pivot_engine
+
+# pyarrow（存在する場合のみ・列指向エクスポート用）
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# xlsxwriter（存在する場合のみ・XLSXエクスポート用）
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
 
 # ログ設定
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 出力テンプレートのバージョン（書式・フォールバック文面を変更したら更新 → 全ETagが変わる）
+TEMPLATE_VERSION = "2024.1"
+
 class CSVGenerator:
     """完璧なCSV生成システム"""
     
@@ -27,6 +54,35 @@ class CSVGenerator:
         self.delimiter = ','
         self.newline = '\n'
         
+        # ストリーミング出力設定
+        self.chunk_size = 64 * 1024  # 出力チャンクの目安（バイト）
+        self.spool_max_memory = 8 * 1024 * 1024  # これを超える一時ファイルはディスクへ
+        
+        # 食レポ行のエンコード済みバイト列キャッシュ（行内容 → CSV行・LRU）
+        self.row_cache_max_bytes = 16 * 1024 * 1024
+        self.row_cache_direct_limit = 64  # 変更行がこれ以下なら行単位で構築（DataFrame構築を省略）
+        self.row_batch_size = 256  # ストリーミング時に一度にエンコードする行数（出力前に保持する上限）
+        self._row_cache: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._row_cache_bytes = 0
+        self._row_cache_signature: Tuple = ()
+        self._row_cache_lock = threading.Lock()
+        self._row_cache_hits = 0
+        self._row_cache_misses = 0
+        
+        # CSVプレビュー（書き出し時に先頭行と行数・列数を記録・内容ハッシュでキャッシュ）
+        self.preview_rows = 100
+        self.preview_cache_size = 32
+        self._preview_cache: "OrderedDict[Tuple[int, int], Dict[str, Any]]" = OrderedDict()
+        self._preview_lock = threading.Lock()
+        
+        # ダウンロード用ペイロード（入力内容のハッシュ = ETag → 生成済みバイト列・LRU）
+        self.payload_cache_max_bytes = 32 * 1024 * 1024
+        self._payload_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._payload_cache_bytes = 0
+        self._payload_lock = threading.Lock()
+        self._payload_hits = 0
+        self._payload_misses = 0
+        
         # 14言語定義（正太さん形式）
         self.languages = [
             {'code': 'ja', 'name': '日本語'},
@@ -45,36 +101,42 @@ class CSVGenerator:
             {'code': 'it', 'name': 'イタリア語'}
         ]
     
+    def store_info_rows(self, store_data: Dict) -> List[List[Any]]:
+        """店舗情報の行（ヘッダー含む・CSV / XLSX共通）"""
+        # ヘッダー
+        headers = ['項目', '内容', '備考']
+        
+        # データ行構築
+        rows = [
+            ['店舗名（日本語）', store_data.get('store_name_ja', ''), ''],
+            ['店舗名（ローマ字）', store_data.get('store_name_romaji', ''), ''],
+            ['業種', store_data.get('store_type', ''), ''],
+            ['価格帯', store_data.get('price_band', ''), ''],
+            ['住所', store_data.get('address', ''), ''],
+            ['電話番号', store_data.get('tel', ''), ''],
+            ['ウェブサイト', store_data.get('website', ''), ''],
+            ['Instagram', store_data.get('instagram', ''), ''],
+            ['Facebook', store_data.get('facebook', ''), ''],
+            ['メールアドレス', store_data.get('email', ''), ''],
+            ['最寄り駅', store_data.get('nearest_station', ''), ''],
+            ['徒歩時間', store_data.get('walk_time', ''), '分'],
+            ['営業時間', store_data.get('open_hours', ''), ''],
+            ['定休日', store_data.get('closed_days', ''), '']
+        ]
+        
+        # 設備情報追加
+        facility_info = self._get_facility_info_rows(store_data)
+        rows.extend(facility_info)
+        
+        return [headers] + rows
+    
     def generate_store_info_csv(self, store_data: Dict) -> Dict[str, Any]:
         """店舗情報CSV生成（基本情報）"""
         try:
-            # ヘッダー
-            headers = ['項目', '内容', '備考']
-            
-            # データ行構築
-            rows = [
-                ['店舗名（日本語）', store_data.get('store_name_ja', ''), ''],
-                ['店舗名（ローマ字）', store_data.get('store_name_romaji', ''), ''],
-                ['業種', store_data.get('store_type', ''), ''],
-                ['価格帯', store_data.get('price_band', ''), ''],
-                ['住所', store_data.get('address', ''), ''],
-                ['電話番号', store_data.get('tel', ''), ''],
-                ['ウェブサイト', store_data.get('website', ''), ''],
-                ['Instagram', store_data.get('instagram', ''), ''],
-                ['Facebook', store_data.get('facebook', ''), ''],
-                ['メールアドレス', store_data.get('email', ''), ''],
-                ['最寄り駅', store_data.get('nearest_station', ''), ''],
-                ['徒歩時間', store_data.get('walk_time', ''), '分'],
-                ['営業時間', store_data.get('open_hours', ''), ''],
-                ['定休日', store_data.get('closed_days', ''), '']
-            ]
-            
-            # 設備情報追加
-            facility_info = self._get_facility_info_rows(store_data)
-            rows.extend(facility_info)
+            table = self.store_info_rows(store_data)
             
             # CSV生成
-            csv_content = self._create_csv_content([headers] + rows)
+            csv_content = self._create_csv_content(table)
             filename = f"{store_data.get('store_name_ja', 'レストラン')}_店舗情報.csv"
             
             logger.info(f"店舗情報CSV生成完了: {filename}")
@@ -83,7 +145,7 @@ class CSVGenerator:
                 'success': True,
                 'content': csv_content,
                 'filename': filename,
-                'rows': len(rows)
+                'rows': len(table) - 1
             }
             
         except Exception as e:
@@ -102,26 +164,8 @@ class CSVGenerator:
                     'error': 'ストーリーテキストが設定されていません'
                 }
             
-            # ヘッダー作成（横型：言語が列）
-            headers = ['店舗名'] + [lang['name'] + 'ストーリー' for lang in self.languages]
-            
-            # データ行作成（1行に全言語のストーリー）
-            row_data = [store_name]
-            
-            for lang in self.languages:
-                if lang['code'] == 'ja':
-                    # 日本語はオリジナル
-                    row_data.append(story_text)
-                elif translated_content and lang['code'] in translated_content:
-                    # 翻訳済みコンテンツを使用
-                    row_data.append(translated_content[lang['code']])
-                else:
-                    # フォールバック翻訳
-                    fallback = self._get_fallback_story_translation(story_text, lang['code'], store_name)
-                    row_data.append(fallback)
-            
             # CSV生成
-            csv_content = self._create_csv_content([headers, row_data])
+            csv_content = self._create_csv_content(self.story_rows(story_text, store_name, translated_content))
             filename = f"{store_name}_店主ストーリー_14言語.csv"
             
             logger.info(f"店主ストーリー14言語CSV生成完了: {filename}")
@@ -143,65 +187,574 @@ class CSVGenerator:
     def generate_multilingual_food_report_csv(self, menu_data: List[Dict], generated_data: Dict[str, Dict[str, str]], store_name: str) -> Dict[str, Any]:
         """14言語食レポCSV生成（正太さん形式：横型）"""
         try:
-            # ヘッダー作成
-            headers = [
-                'メニューID',
-                '料理名',
-                '価格',
-                'カテゴリー'
-            ]
+            # CSV生成
+            frame = self.build_food_report_frame(menu_data, generated_data)
+            csv_content = self._frame_to_csv(frame)
+            filename = f"{store_name}_食レポ_14言語.csv"
+            self._remember_preview(csv_content, self._frame_preview(frame, len(csv_content)))
             
-            # 各言語の説明文列を追加
-            for lang in self.languages:
-                headers.append(f"説明文_{lang['name']}")
+            logger.info(f"14言語食レポCSV生成完了: {filename}")
             
-            rows = []
+            return {
+                'success': True,
+                'content': csv_content,
+                'filename': filename,
+                'menu_count': len(menu_data),
+                'languages_count': len(self.languages)
+            }
             
-            # メニューデータ処理
-            for i, item in enumerate(menu_data):
-                row = [
-                    item.get('id', f'menu_{i+1}'),
-                    item.get('name', ''),
-                    item.get('price', ''),
-                    item.get('category', 'メイン料理')
+        except Exception as e:
+            logger.error(f"14言語食レポCSV生成エラー: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def food_report_headers(self) -> List[str]:
+        """14言語食レポCSVのヘッダー（正太さん形式レイアウトの定義から）"""
+        return get_pivot_engine().headers('shota_food_report', self.languages)
+    
+    def food_report_records(self, menu_data: List[Dict], generated_data: Dict[str, Dict[str, str]]) -> LongTable:
+        """食レポの縦持ちデータ（料理 × 言語の説明文・未生成はフォールバック）"""
+        generated_data = generated_data or {}
+        table = LongTable('food_report', self.languages)
+        templates = [(lang['code'], *self._fallback_menu_template(lang['code']).split('{name}', 1)) for lang in self.languages]
+        
+        for i, item in enumerate(menu_data):
+            item_id = item.get('id', f'menu_{i+1}')
+            name = item.get('name', '')
+            index = table.add_item(id=item_id, name=name, price=item.get('price', ''), category=item.get('category', 'メイン料理'))
+            
+            texts = generated_data.get(item_id) or {}
+            for code, prefix, suffix in templates:
+                text = texts.get(code)
+                if text is None:
+                    table.add_text(index, 'description', code, f"{prefix}{name}{suffix}", True)
+                else:
+                    table.add_text(index, 'description', code, text)
+        
+        return table
+    
+    def build_food_report_frame(self, menu_data: List[Dict], generated_data: Dict[str, Dict[str, str]],
+                                start: int = 0) -> pd.DataFrame:
+        """14言語食レポの横型テーブルを列単位で構築（未生成セルはフォールバックを一括補完・start はバッチ先頭位置）"""
+        ids = [item.get('id', f'menu_{start+i+1}') for i, item in enumerate(menu_data)]
+        names = pd.Series([item.get('name', '') for item in menu_data], dtype=object)
+        codes = [lang['code'] for lang in self.languages]
+        
+        # 生成済みコンテンツ（料理ID × 言語）をメニュー順・言語順に整列
+        content = pd.DataFrame.from_dict(generated_data or {}, orient='index', dtype=object)
+        content = content.reindex(index=ids, columns=codes)
+        
+        columns = {
+            'メニューID': ids,
+            '料理名': names.to_numpy(),
+            '価格': [item.get('price', '') for item in menu_data],
+            'カテゴリー': [item.get('category', 'メイン料理') for item in menu_data]
+        }
+        
+        fallback_names = None
+        for lang, header in zip(self.languages, self.food_report_headers()[4:]):
+            column = content[lang['code']].to_numpy(dtype=object)
+            missing = pd.isna(column)
+            if missing.any():
+                if fallback_names is None:
+                    fallback_names = names.map(str)
+                prefix, suffix = self._fallback_menu_template(lang['code']).split('{name}', 1)
+                column = column.copy()
+                column[missing] = (prefix + fallback_names[missing] + suffix).to_numpy()
+            columns[header] = column
+        
+        return pd.DataFrame(columns, columns=self.food_report_headers(), dtype=object)
+    
+    def _menu_batches(self, menu_data: Iterable[Dict]) -> Iterator[Tuple[int, List[Dict]]]:
+        """メニューを row_batch_size 件ずつ読み出し（バッチ先頭位置, バッチ）"""
+        items = iter(menu_data)
+        start = 0
+        while True:
+            batch = list(itertools.islice(items, self.row_batch_size))
+            if not batch:
+                return
+            yield start, batch
+            start += len(batch)
+    
+    def food_report_rows(self, menu_data: Iterable[Dict], generated_data: Dict[str, Dict[str, str]]) -> Iterator[Sequence[Any]]:
+        """14言語食レポの行を順次生成（ヘッダー含む・row_batch_size 行ずつ構築しメニュー全体の表は保持しない）"""
+        yield self.food_report_headers()
+        for start, batch in self._menu_batches(menu_data):
+            yield from self.build_food_report_frame(batch, generated_data, start).itertuples(index=False, name=None)
+    
+    def stream_multilingual_food_report_csv(self, menu_data: Iterable[Dict], generated_data: Dict[str, Dict[str, str]]) -> Iterator[bytes]:
+        """14言語食レポCSVのバイトチャンク出力（row_batch_size 行ずつエンコードして順次出力・未変更行はキャッシュから連結）"""
+        yield codecs.BOM_UTF8
+        yield (self._csv_line(self.food_report_headers()) + '\r\n').encode('utf-8')
+        
+        chunk: List[bytes] = []
+        size = 0
+        for start, batch in self._menu_batches(menu_data):
+            for row in self.encode_food_report_rows(batch, generated_data, start):
+                chunk.append(row)
+                size += len(row)
+                if size >= self.chunk_size:
+                    yield b"".join(chunk)
+                    chunk = []
+                    size = 0
+        if chunk:
+            yield b"".join(chunk)
+    
+    def render_multilingual_food_report_csv(self, menu_data: List[Dict], generated_data: Dict[str, Dict[str, str]]) -> bytes:
+        """14言語食レポCSVのダウンロード用バイト列（BOM付き・generate_multilingual_food_report_csv と同一内容）"""
+        return b"".join(self.stream_multilingual_food_report_csv(menu_data, generated_data))
+    
+    def encode_food_report_rows(self, menu_data: List[Dict], generated_data: Dict[str, Dict[str, str]], start: int = 0) -> List[bytes]:
+        """食レポ各行のエンコード済みバイト列（内容が同じ行はキャッシュを再利用し変更行のみ再エンコード）
+        
+        start はメニュー全体での先頭位置（ID未設定の料理の既定ID用・ストリーミング時のバッチ単位呼び出し）
+        """
+        generated_data = generated_data or {}
+        codes = tuple(lang['code'] for lang in self.languages)
+        
+        # 行キー: 行を決定する全内容（ID・料理名・価格・カテゴリー・各言語の生成文）
+        keys: List[Tuple] = []
+        uncacheable = set()
+        for i, item in enumerate(menu_data):
+            item_id = item.get('id', f'menu_{start+i+1}')
+            texts = generated_data.get(item_id) or {}
+            key = (item_id, item.get('name', ''), item.get('price', ''), item.get('category', 'メイン料理'))
+            key += tuple(texts.get(code) for code in codes)
+            try:
+                hash(key)
+            except TypeError:
+                uncacheable.add(i)  # ハッシュ不可能な値を含む行はキャッシュしない
+            keys.append(key)
+        
+        rows: List[Optional[bytes]] = [None] * len(keys)
+        with self._row_cache_lock:
+            if self._row_cache_signature != codes:
+                self._clear_row_cache()
+                self._row_cache_signature = codes
+            
+            cache = self._row_cache
+            for i, key in enumerate(keys):
+                if i not in uncacheable:
+                    row = cache.get(key)
+                    if row is not None:
+                        cache.move_to_end(key)
+                        rows[i] = row
+        
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            # 変更・未キャッシュ行のみ構築（少数なら行単位・多数なら列単位で一括）
+            if len(missing) <= self.row_cache_direct_limit:
+                lines = [self._csv_line(self._food_report_row(keys[i], menu_data[i])) for i in missing]
+            else:
+                subset = [
+                    menu_data[i] if 'id' in menu_data[i] else dict(menu_data[i], id=f'menu_{start+i+1}')
+                    for i in missing
                 ]
+                subset_data = {item['id']: generated_data[item['id']] for item in subset if item['id'] in generated_data}
+                lines = self._frame_csv_lines(self.build_food_report_frame(subset, subset_data))
+            encoded = [(line + '\r\n').encode('utf-8') for line in lines]
+            
+            with self._row_cache_lock:
+                for i, row in zip(missing, encoded):
+                    rows[i] = row
+                    key = keys[i]
+                    if i not in uncacheable and key not in self._row_cache:
+                        self._row_cache[key] = row
+                        self._row_cache_bytes += len(row)
+                self._evict_row_cache()
+        
+        with self._row_cache_lock:
+            self._row_cache_hits += len(rows) - len(missing)
+            self._row_cache_misses += len(missing)
+        
+        return rows
+    
+    def _food_report_row(self, key: Tuple, item: Dict) -> List[Any]:
+        """食レポ1行の値（行キーから組み立て・未生成の言語はフォールバック）"""
+        row = list(key[:4])
+        for lang, text in zip(self.languages, key[4:]):
+            row.append(self._get_fallback_menu_description(item, lang['code']) if text is None else text)
+        return row
+    
+    def _evict_row_cache(self) -> None:
+        """上限超過分を古い行から破棄（ロック取得済みで呼び出し）"""
+        while self._row_cache_bytes > self.row_cache_max_bytes and self._row_cache:
+            _, row = self._row_cache.popitem(last=False)
+            self._row_cache_bytes -= len(row)
+    
+    def _clear_row_cache(self) -> None:
+        """行キャッシュの全破棄（ロック取得済みで呼び出し）"""
+        self._row_cache.clear()
+        self._row_cache_bytes = 0
+    
+    def clear_row_cache(self) -> None:
+        """行キャッシュのクリア"""
+        with self._row_cache_lock:
+            self._clear_row_cache()
+    
+    def get_row_cache_stats(self) -> Dict[str, Any]:
+        """行キャッシュ統計"""
+        with self._row_cache_lock:
+            return {
+                'rows': len(self._row_cache),
+                'bytes': self._row_cache_bytes,
+                'max_bytes': self.row_cache_max_bytes,
+                'hits': self._row_cache_hits,
+                'misses': self._row_cache_misses
+            }
+    
+    def _story_translations(self, story_text: str, store_name: str, translated_content: Dict[str, str] = None) -> List[Tuple[str, bool]]:
+        """言語順のストーリー（本文, フォールバックか）"""
+        texts = []
+        for lang in self.languages:
+            if lang['code'] == 'ja':
+                # 日本語はオリジナル
+                texts.append((story_text, False))
+            elif translated_content and lang['code'] in translated_content:
+                # 翻訳済みコンテンツを使用
+                texts.append((translated_content[lang['code']], False))
+            else:
+                # フォールバック翻訳
+                texts.append((self._get_fallback_story_translation(story_text, lang['code'], store_name), True))
+        return texts
+    
+    def story_records(self, story_text: str, store_name: str, translated_content: Dict[str, str] = None) -> LongTable:
+        """店主ストーリーの縦持ちデータ（1店舗 × 言語）"""
+        table = LongTable('story', self.languages)
+        index = table.add_item(store_name=store_name)
+        for lang, (text, is_fallback) in zip(self.languages, self._story_translations(story_text, store_name, translated_content)):
+            table.add_text(index, 'story', lang['code'], text, is_fallback)
+        return table
+    
+    def story_rows(self, story_text: str, store_name: str, translated_content: Dict[str, str] = None) -> List[List[Any]]:
+        """店主ストーリーの行（横型：言語が列・ヘッダー含む・CSV / XLSX共通）"""
+        return get_pivot_engine().pivot(self.story_records(story_text, store_name, translated_content), 'shota_story')
+    
+    def generate_layout_exports(self, store_name: str, story_text: str, menu_data: List[Dict],
+                                generated_data: Dict[str, Dict[str, str]],
+                                layouts: Sequence[str] = PACKAGE_PARTNER_LAYOUTS) -> Dict[str, Any]:
+        """レイアウト定義によるCSV出力（データ種別ごとに縦持ちデータを1回構築し、全レイアウトを1回の走査で生成）
+        
+        各ファイルはバイトチャンクのイテレータ（ZIP書き込み時に逐次エンコードし、CSV全体の文字列を保持しない）
+        """
+        try:
+            engine = get_pivot_engine()
+            specs = {name: engine.get_layout(name) for name in layouts}
+            builders = {
+                'story': lambda: self.story_records(story_text, store_name) if story_text else None,
+                'food_report': lambda: self.food_report_records(menu_data, generated_data)
+            }
+            
+            files: Dict[str, Iterator[bytes]] = {}
+            for dataset, build in builders.items():
+                names = [name for name, spec in specs.items() if spec['dataset'] == dataset]
+                table = build() if names else None
+                if table is None:
+                    continue
+                
+                for name, result in engine.pivot_many(table, names).items():
+                    template = specs[name].get('filename', f'{{store_name}}_{name}.csv')
+                    if specs[name]['shape'] == 'per_language':
+                        for lang in self.languages:
+                            if lang['code'] in result:
+                                filename = template.format(store_name=store_name, language=lang['code'], language_name=lang['name'])
+                                files[filename] = self.iter_csv_bytes(result[lang['code']])
+                    else:
+                        files[template.format(store_name=store_name)] = self.iter_csv_bytes(result)
+            
+            logger.info(f"レイアウト別CSV生成完了: {store_name} ({len(files)}ファイル)")
+            
+            return {
+                'success': True,
+                'files': files
+            }
+            
+        except Exception as e:
+            logger.error(f"レイアウト別CSV生成エラー: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _require_pyarrow(self) -> None:
+        """列指向エクスポートの前提確認"""
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("列指向エクスポートには pyarrow が必要です（pip install pyarrow）")
+    
+    def _language_column(self, repeat: int) -> "pa.DictionaryArray":
+        """言語コード列（辞書エンコード・各行で全言語を順に繰り返し）"""
+        indices = pa.array(np.tile(np.arange(len(self.languages), dtype=np.int8), repeat))
+        return pa.DictionaryArray.from_arrays(indices, pa.array([lang['code'] for lang in self.languages]))
+    
+    @staticmethod
+    def _to_int(value: Any) -> Optional[int]:
+        """整数列の値（数値化できない値はnull）"""
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, int):
+            return value
+        try:
+            return int(str(value).replace(',', '').strip())
+        except (TypeError, ValueError):
+            return None
+    
+    def store_info_table(self, store_data: Dict) -> "pa.Table":
+        """店舗情報の列指向テーブル（1店舗1行・徒歩時間は整数・業種と価格帯は辞書エンコード）"""
+        self._require_pyarrow()
+        columns = {}
+        for name, value in store_data.items():
+            if name == 'walk_time':
+                columns[name] = pa.array([self._to_int(value)], type=pa.int32())
+            elif name in ('store_type', 'price_band'):
+                columns[name] = pa.array([value], type=pa.string()).dictionary_encode()
+            else:
+                columns[name] = pa.array([None if value is None else str(value)], type=pa.string())
+        return pa.table(columns)
+    
+    def story_table(self, story_text: str, store_name: str, translated_content: Dict[str, str] = None) -> "pa.Table":
+        """店主ストーリーの列指向テーブル（縦型：1言語1行・言語は辞書エンコード）"""
+        self._require_pyarrow()
+        translations = self._story_translations(story_text, store_name, translated_content)
+        return pa.table({
+            'store_name': pa.array([store_name] * len(translations), type=pa.string()),
+            'language': self._language_column(1),
+            'story': pa.array([text for text, _ in translations], type=pa.string()),
+            'is_fallback': pa.array([fallback for _, fallback in translations], type=pa.bool_())
+        })
+    
+    def food_report_table(self, menu_data: List[Dict], generated_data: Dict[str, Dict[str, str]]) -> "pa.Table":
+        """14言語食レポの列指向テーブル（縦型：料理×言語・価格は整数・言語とカテゴリーは辞書エンコード）"""
+        self._require_pyarrow()
+        records = self.food_report_records(menu_data, generated_data)
+        attributes = records.attributes
+        
+        # 料理属性は料理ごとに1回変換し、レコードの料理番号で展開
+        item_index = pa.array(records.item, type=pa.int64())
+        
+        def item_column(name: str) -> "pa.Array":
+            return pa.array([None if a[name] is None else str(a[name]) for a in attributes], type=pa.string())
+        
+        return pa.table({
+            'menu_id': item_column('id').take(item_index),
+            'name': item_column('name').take(item_index),
+            'price': pa.array([self._to_int(a['price']) for a in attributes], type=pa.int64()).take(item_index),
+            'category': item_column('category').dictionary_encode().take(item_index),
+            'language': pa.DictionaryArray.from_arrays(
+                pa.array(records.language, type=pa.int8()), pa.array([lang['code'] for lang in self.languages])
+            ),
+            'text': pa.array(records.text, type=pa.string()),
+            'is_fallback': pa.array(records.is_fallback, type=pa.bool_())
+        })
+    
+    def table_to_bytes(self, table: "pa.Table", fmt: str = 'parquet') -> bytes:
+        """列指向テーブルのシリアライズ（parquet: zstd圧縮 / arrow: Arrow IPCファイル形式）"""
+        self._require_pyarrow()
+        sink = pa.BufferOutputStream()
+        if fmt == 'parquet':
+            pq.write_table(table, sink, compression='zstd')
+        elif fmt == 'arrow':
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        else:
+            raise ValueError(f"未対応の列指向形式です: {fmt}")
+        return sink.getvalue().to_pybytes()
+    
+    def generate_columnar_exports(self, store_data: Dict, story_text: str, menu_data: List[Dict],
+                                  generated_data: Dict[str, Dict[str, str]], fmt: str = 'parquet') -> Dict[str, Any]:
+        """店舗情報・ストーリー・食レポの列指向エクスポート（CSVと同一内容・型付き）"""
+        try:
+            self._require_pyarrow()
+            store_name = store_data.get('store_name_ja', '') or 'レストラン'
+            tables = {'store_info': self.store_info_table(store_data)}
+            if story_text:
+                tables['story'] = self.story_table(story_text, store_name)
+            tables['food_report'] = self.food_report_table(menu_data, generated_data)
+            
+            files = {name: self.table_to_bytes(table, fmt) for name, table in tables.items()}
+            logger.info(f"列指向エクスポート完了: {store_name} ({fmt}, {len(files)}テーブル)")
+            
+            return {
+                'success': True,
+                'files': files,
+                'format': fmt,
+                'rows': {name: table.num_rows for name, table in tables.items()}
+            }
+            
+        except Exception as e:
+            logger.error(f"列指向エクスポートエラー: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def write_xlsx(self, sheets: Iterable[Tuple[str, Iterable[Sequence[Any]], int]], output: Any) -> Dict[str, int]:
+        """(シート名, 行イテレータ（先頭がヘッダー）, 固定列数) の並びからXLSXを書き出し（constant_memoryモード：書き出し済みの行は一時ファイルへ）"""
+        if not XLSXWRITER_AVAILABLE:
+            raise RuntimeError("XLSXエクスポートには xlsxwriter が必要です（pip install xlsxwriter）")
+        
+        workbook = xlsxwriter.Workbook(output, {
+            'constant_memory': True,
+            'strings_to_numbers': False,
+            'strings_to_formulas': False,  # "=" で始まる説明文を数式として扱わない
+            'strings_to_urls': False
+        })
+        header_format = workbook.add_format({'bold': True, 'bg_color': '#F3E8D2', 'border': 1, 'text_wrap': True, 'valign': 'top'})
+        text_format = workbook.add_format({'text_wrap': True, 'valign': 'top'})
+        row_counts = {}
+        
+        try:
+            for sheet_name, rows, frozen_columns in sheets:
+                worksheet = workbook.add_worksheet(sheet_name)
+                row_index = -1
                 
-                # 各言語の説明文を追加
-                for lang in self.languages:
-                    item_id = item.get('id', f'menu_{i+1}')
-                    if (item_id in generated_data and 
-                        lang['code'] in generated_data[item_id]):
-                        # AI生成済みコンテンツ使用
-                        description = generated_data[item_id][lang['code']]
+                for row_index, row in enumerate(rows):
+                    if row_index == 0:
+                        # ヘッダー固定・固定列は狭く、言語ごとの本文列は折り返し表示
+                        worksheet.freeze_panes(1, frozen_columns)
+                        if frozen_columns:
+                            worksheet.set_column(0, frozen_columns - 1, 18)
+                        if len(row) > frozen_columns:
+                            worksheet.set_column(frozen_columns, len(row) - 1, 40, text_format)
+                        worksheet.write_row(0, 0, row, header_format)
                     else:
-                        # フォールバック使用
-                        description = self._get_fallback_menu_description(item, lang['code'])
-                    
-                    row.append(description)
+                        worksheet.write_row(row_index, 0, ['' if value is None else value for value in row])
                 
-                rows.append(row)
+                row_counts[sheet_name] = max(row_index, 0)
+        finally:
+            workbook.close()
+        
+        return row_counts
+    
+    def generate_xlsx_workbook(self, store_data: Dict, story_text: str, menu_data: Iterable[Dict],
+                               generated_data: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+        """店舗情報・ストーリー・食レポを1シートずつ持つXLSX（CSVと同じ行ソース・食レポはバッチ単位で一時ファイルへ書き出し）"""
+        try:
+            store_name = store_data.get('store_name_ja', '') or 'レストラン'
+            sheets = [('店舗情報', self.store_info_rows(store_data), 1)]
+            if story_text:
+                sheets.append(('店主ストーリー', self.story_rows(story_text, store_name), 1))
+            sheets.append(('AI食レポ_14言語', self.food_report_rows(menu_data, generated_data), 4))
             
-            # CSV生成
-            csv_content = self._create_csv_content([headers] + rows)
-            filename = f"{store_name}_食レポ_14言語.csv"
+            spooled = tempfile.SpooledTemporaryFile(max_size=self.spool_max_memory, mode='w+b')
+            row_counts = self.write_xlsx(sheets, spooled)
+            spooled.seek(0)
             
-            logger.info(f"14言語食レポCSV生成完了: {filename}")
+            filename = f"{store_name}_14言語データ.xlsx"
+            logger.info(f"XLSX生成完了: {filename}")
             
             return {
                 'success': True,
-                'content': csv_content,
+                'file': spooled,
                 'filename': filename,
-                'menu_count': len(menu_data),
-                'languages_count': len(self.languages)
+                'rows': row_counts
             }
             
         except Exception as e:
-            logger.error(f"14言語食レポCSV生成エラー: {e}")
+            logger.error(f"XLSX生成エラー: {e}")
             return {
                 'success': False,
                 'error': str(e)
             }
     
+    def payload_etag(self, kind: str, *inputs: Any) -> str:
+        """入力内容（テンプレートバージョン・言語構成を含む）のハッシュによるETag"""
+        digest = hashlib.blake2b(digest_size=16)
+        header = f"{TEMPLATE_VERSION}\0{kind}\0{','.join(lang['code'] for lang in self.languages)}"
+        digest.update(header.encode('utf-8'))
+        for value in inputs:
+            digest.update(b"\0")
+            digest.update(StateCodec.dumps_dict({'v': value}))
+        return f"{kind}-{digest.hexdigest()}"
+    
+    def memoized_payload(self, kind: str, inputs: Sequence[Any], build: Callable[[], bytes],
+                         filename: str, mime: str = 'text/csv') -> Dict[str, Any]:
+        """ダウンロード用ペイロード（同一入力ならキャッシュを返し生成を省略）"""
+        etag = self.payload_etag(kind, *inputs)
+        
+        with self._payload_lock:
+            payload = self._payload_cache.get(etag)
+            if payload is not None:
+                self._payload_cache.move_to_end(etag)
+                self._payload_hits += 1
+                return payload
+        
+        data = build()
+        payload = {'etag': etag, 'data': data, 'filename': filename, 'mime': mime, 'size': len(data)}
+        
+        with self._payload_lock:
+            self._payload_misses += 1
+            if etag not in self._payload_cache:
+                self._payload_cache[etag] = payload
+                self._payload_cache_bytes += len(data)
+            # 上限超過分を古いものから破棄
+            while self._payload_cache_bytes > self.payload_cache_max_bytes and len(self._payload_cache) > 1:
+                _, evicted = self._payload_cache.popitem(last=False)
+                self._payload_cache_bytes -= evicted['size']
+        
+        return payload
+    
+    def invalidate_payloads(self, kind: Optional[str] = None) -> int:
+        """ペイロードキャッシュの破棄（種類指定時はその種類のみ）"""
+        with self._payload_lock:
+            etags = [etag for etag in self._payload_cache if kind is None or etag.startswith(f"{kind}-")]
+            for etag in etags:
+                self._payload_cache_bytes -= self._payload_cache.pop(etag)['size']
+        return len(etags)
+    
+    def get_payload_cache_stats(self) -> Dict[str, Any]:
+        """ペイロードキャッシュ統計"""
+        with self._payload_lock:
+            return {
+                'entries': len(self._payload_cache),
+                'bytes': self._payload_cache_bytes,
+                'max_bytes': self.payload_cache_max_bytes,
+                'hits': self._payload_hits,
+                'misses': self._payload_misses,
+                'template_version': TEMPLATE_VERSION
+            }
+    
+    def store_info_payload(self, store_data: Dict) -> Dict[str, Any]:
+        """店舗情報CSVのダウンロード用ペイロード"""
+        store_name = store_data.get('store_name_ja', '') or 'レストラン'
+        return self.memoized_payload(
+            'store_info', (store_data,),
+            lambda: self._create_csv_content(self.store_info_rows(store_data)).encode(self.encoding),
+            f"{store_name}_店舗情報.csv"
+        )
+    
+    def story_payload(self, story_text: str, store_name: str, translated_content: Dict[str, str] = None) -> Dict[str, Any]:
+        """店主ストーリー14言語CSVのダウンロード用ペイロード"""
+        return self.memoized_payload(
+            'story', (story_text, store_name, translated_content),
+            lambda: self._create_csv_content(self.story_rows(story_text, store_name, translated_content)).encode(self.encoding),
+            f"{store_name}_店主ストーリー_14言語.csv"
+        )
+    
+    def food_report_payload(self, menu_data: List[Dict], generated_data: Dict[str, Dict[str, str]], store_name: str) -> Dict[str, Any]:
+        """14言語食レポCSVのダウンロード用ペイロード"""
+        return self.memoized_payload(
+            'food_report', (menu_data, generated_data),
+            lambda: self.render_multilingual_food_report_csv(menu_data, generated_data),
+            f"{store_name}_食レポ_14言語.csv"
+        )
+    
+    def menu_rows(self, menu_data: List[Dict]) -> Iterator[List[Any]]:
+        """メニュー一覧の行（ヘッダー含む・一括インポートのテンプレートと同じ列）"""
+        yield ['メニューID', '料理名', '価格', 'カテゴリー', '説明', '推奨度']
+        for item in menu_data:
+            yield [item.get('id', ''), item.get('name', ''), item.get('price', ''), item.get('category', ''),
+                   item.get('desc', ''), item.get('recommendation_score', '')]
+    
+    def menu_payload(self, menu_data: List[Dict], store_name: str) -> Dict[str, Any]:
+        """メニュー一覧CSVのダウンロード用ペイロード"""
+        return self.memoized_payload(
+            'menu', (menu_data,),
+            lambda: self._create_csv_content(self.menu_rows(menu_data)).encode(self.encoding),
+            f"{store_name}_menu.csv"
+        )
+    
     def generate_package_summary_csv(self, package_data: Dict) -> Dict[str, Any]:
         """パッケージサマリーCSV生成"""
         try:
@@ -290,67 +843,213 @@ class CSVGenerator:
         
         return fallbacks.get(language, fallbacks['en'])
     
-    def _get_fallback_menu_description(self, menu_item: Dict, language: str) -> str:
-        """メニューフォールバック説明"""
-        name = menu_item.get('name', '')
-        
-        fallbacks = {
-            'ja': f"{name}は当店自慢の一品です。厳選された食材を使用し、丁寧に調理いたします。",
-            'en': f"{name} is our signature dish, carefully prepared with selected ingredients.",
-            'ko': f"{name}는 저희 식당의 대표 메뉴입니다. 엄선된 재료로 정성껏 조리합니다.",
-            'zh-CN': f"{name}是本店的招牌菜，采用精选食材精心制作。",
-            'zh-TW': f"{name}是本店的招牌菜，採用精選食材精心製作。"
+    def _fallback_menu_template(self, language: str) -> str:
+        """メニューフォールバック説明のテンプレート（{name} に料理名）"""
+        templates = {
+            'ja': "{name}は当店自慢の一品です。厳選された食材を使用し、丁寧に調理いたします。",
+            'en': "{name} is our signature dish, carefully prepared with selected ingredients.",
+            'ko': "{name}는 저희 식당의 대표 메뉴입니다. 엄선된 재료로 정성껏 조리합니다.",
+            'zh-CN': "{name}是本店的招牌菜，采用精选食材精心制作。",
+            'zh-TW': "{name}是本店的招牌菜，採用精選食材精心製作。"
         }
         
-        return fallbacks.get(language, fallbacks['en'])
+        return templates.get(language, templates['en'])
+    
+    def _get_fallback_menu_description(self, menu_item: Dict, language: str) -> str:
+        """メニューフォールバック説明"""
+        prefix, suffix = self._fallback_menu_template(language).split('{name}', 1)
+        return f"{prefix}{menu_item.get('name', '')}{suffix}"
     
-    def _create_csv_content(self, data: List[List[str]]) -> str:
-        """CSV形式文字列の作成"""
+    def _csv_writer(self, output: io.StringIO):
+        """CSVライター（全フィールドをクォート）"""
+        return csv.writer(output, delimiter=self.delimiter, quotechar='"', quoting=csv.QUOTE_ALL)
+    
+    def _create_csv_content(self, data: Iterable[Sequence[Any]]) -> str:
+        """CSV形式文字列の作成（プレビュー情報も書き出しながら記録）"""
         output = io.StringIO()
-        writer = csv.writer(output, delimiter=self.delimiter, quotechar='"', quoting=csv.QUOTE_ALL)
+        writer = self._csv_writer(output)
+        preview = self._new_preview()
         
         for row in data:
             writer.writerow(row)
+            self._observe_preview(preview, row)
         
         content = output.getvalue()
         output.close()
         
+        preview['size'] = len(content)
+        self._remember_preview(content, preview)
+        
         return content
     
+    def _new_preview(self) -> Dict[str, Any]:
+        """空のプレビュー情報"""
+        return {'header': None, 'rows': [], 'row_count': 0, 'column_count': 0, 'size': 0}
+    
+    def _observe_preview(self, preview: Dict[str, Any], row: Sequence[Any]) -> None:
+        """書き出した1行をプレビュー情報へ反映（先頭N行のみ保持）"""
+        if preview['header'] is None:
+            preview['header'] = [str(value) for value in row]
+            preview['column_count'] = len(row)
+            return
+        if preview['row_count'] < self.preview_rows:
+            preview['rows'].append(['' if value is None else str(value) for value in row])
+        preview['row_count'] += 1
+        preview['column_count'] = max(preview['column_count'], len(row))
+    
+    def _frame_preview(self, frame: pd.DataFrame, size: int) -> Dict[str, Any]:
+        """DataFrameからのプレビュー情報（先頭N行のみ文字列化）"""
+        head = frame.head(self.preview_rows).to_numpy(dtype=object).tolist()
+        return {
+            'header': [str(name) for name in frame.columns],
+            'rows': [['' if value is None else str(value) for value in row] for row in head],
+            'row_count': len(frame),
+            'column_count': len(frame.columns),
+            'size': size
+        }
+    
+    @staticmethod
+    def _preview_key(csv_content: str) -> Tuple[int, int]:
+        """プレビューキャッシュのキー（文字列のハッシュはオブジェクトに保持されるため同一内容の再表示はO(1)）"""
+        return (len(csv_content), hash(csv_content))
+    
+    def _remember_preview(self, csv_content: str, preview: Dict[str, Any]) -> None:
+        """プレビュー情報のキャッシュ登録（上限超過分は古いものから破棄）"""
+        key = self._preview_key(csv_content)
+        with self._preview_lock:
+            self._preview_cache[key] = preview
+            self._preview_cache.move_to_end(key)
+            while len(self._preview_cache) > self.preview_cache_size:
+                self._preview_cache.popitem(last=False)
+    
+    def get_csv_preview(self, csv_content: str) -> Dict[str, Any]:
+        """CSVのプレビュー情報（生成時に記録済みならキャッシュ・未知の内容は先頭N行のみ保持して行数を数える）"""
+        key = self._preview_key(csv_content)
+        with self._preview_lock:
+            preview = self._preview_cache.get(key)
+            if preview is not None:
+                self._preview_cache.move_to_end(key)
+                return preview
+        
+        preview = self._new_preview()
+        for row in csv.reader(io.StringIO(csv_content.lstrip('\ufeff'))):
+            self._observe_preview(preview, row)
+        preview['size'] = len(csv_content)
+        if preview['header'] is None:
+            preview['header'] = []
+        
+        self._remember_preview(csv_content, preview)
+        return preview
+    
+    def preview_multilingual_food_report(self, menu_data: List[Dict], generated_data: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+        """14言語食レポCSVのプレビュー情報（先頭N品のみ構築・CSV全体は生成しない）"""
+        head = [
+            item if 'id' in item else dict(item, id=f'menu_{i+1}')
+            for i, item in enumerate(menu_data[:self.preview_rows])
+        ]
+        generated_data = generated_data or {}
+        head_generated = {item['id']: generated_data[item['id']] for item in head if item['id'] in generated_data}
+        preview = self._frame_preview(self.build_food_report_frame(head, head_generated), 0)
+        preview['row_count'] = len(menu_data)
+        preview['size'] = None  # ストリーミング出力のため未確定
+        return preview
+    
+    def iter_csv_bytes(self, rows: Iterable[Sequence[Any]], chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        """行イテレータからBOM付きUTF-8のバイトチャンクを順次生成（BOMが先頭チャンク）"""
+        chunk_size = chunk_size or self.chunk_size
+        buffer = io.StringIO()
+        writer = self._csv_writer(buffer)
+        
+        yield codecs.BOM_UTF8
+        
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= chunk_size:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+        buffer.close()
+    
+    @staticmethod
+    def _csv_field(value: Any) -> str:
+        """クォート内に書き出すフィールド値（" は二重化）"""
+        if value is None:
+            return ''
+        if type(value) is not str:
+            value = str(value)
+        return value.replace('"', '""')
+    
+    def _csv_line(self, values: Iterable[Any]) -> str:
+        """1行分のCSV（全フィールドをクォート・改行なし）"""
+        return '"' + f'"{self.delimiter}"'.join(self._csv_field(value) for value in values) + '"'
+    
+    def _frame_csv_lines(self, frame: pd.DataFrame) -> List[str]:
+        """DataFrameの列単位一括CSV化（データ行のみ・改行なし）"""
+        separator = f'"{self.delimiter}"'
+        
+        # 列ごとにエスケープしてから行単位で連結
+        columns = [[self._csv_field(value) for value in frame[name].to_numpy()] for name in frame.columns]
+        return ['"' + separator.join(row) + '"' for row in zip(*columns)]
+    
+    def _frame_to_csv(self, frame: pd.DataFrame, header: bool = True) -> str:
+        """DataFrameの列単位一括CSV化（_create_csv_content と同一の書式・全フィールドをクォート）"""
+        lines = [self._csv_line(frame.columns)] if header else []
+        lines.extend(self._frame_csv_lines(frame))
+        
+        return '\r\n'.join(lines) + '\r\n' if lines else ''
+    
+    def spool_csv(self, chunks: Iterable[bytes]) -> tempfile.SpooledTemporaryFile:
+        """バイトチャンクを一時ファイルへ書き出し（先頭へ巻き戻し済み・大きい場合はディスク）"""
+        spooled = tempfile.SpooledTemporaryFile(max_size=self.spool_max_memory, mode='w+b')
+        for chunk in chunks:
+            spooled.write(chunk)
+        spooled.seek(0)
+        return spooled
+    
     def create_downloadable_csv(self, content: str, filename: str) -> bytes:
         """ダウンロード可能なCSVファイル作成"""
         # BOM付きUTF-8エンコーディング
         return content.encode(self.encoding)
     
-    def display_csv_preview(self, csv_content: str, title: str = "CSVプレビュー", max_rows: int = 10):
-        """CSVプレビュー表示"""
+    def display_csv_preview(self, csv_content: Union[str, Dict[str, Any]], title: str = "CSVプレビュー", max_rows: int = 10):
+        """CSVプレビュー表示（CSV文字列またはプレビュー情報・全体の再解析はしない）"""
         try:
-            # CSV文字列をDataFrameに変換
-            df = pd.read_csv(io.StringIO(csv_content))
+            preview = csv_content if isinstance(csv_content, dict) else self.get_csv_preview(csv_content)
             
             st.subheader(title)
             
-            # 基本統計
+            # 基本統計（書き出し時に記録済み）
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("行数", len(df))
+                st.metric("行数", preview['row_count'])
             with col2:
-                st.metric("列数", len(df.columns))
+                st.metric("列数", preview['column_count'])
             with col3:
-                st.metric("データサイズ", f"{len(csv_content)} 文字")
+                st.metric("データサイズ", f"{preview['size']} 文字" if preview['size'] is not None else "-")
             
-            # データ表示
-            if len(df) > max_rows:
-                st.write(f"最初の{max_rows}行を表示:")
-                st.dataframe(df.head(max_rows))
-                st.info(f"他に{len(df) - max_rows}行のデータがあります")
+            # データ表示（保持済みの先頭行のみ）
+            rows = preview['rows'][:max_rows]
+            header = preview['header']
+            if all(len(row) == len(header) for row in rows):
+                df = pd.DataFrame(rows, columns=header)
+            else:
+                df = pd.DataFrame(rows)
+            
+            if preview['row_count'] > len(rows):
+                st.write(f"最初の{len(rows)}行を表示:")
+                st.dataframe(df)
+                st.info(f"他に{preview['row_count'] - len(rows)}行のデータがあります")
             else:
                 st.dataframe(df)
                 
         except Exception as e:
             st.error(f"CSVプレビューエラー: {e}")
-            st.text("生のCSVデータ:")
-            st.text(csv_content[:500] + "..." if len(csv_content) > 500 else csv_content)
+            if isinstance(csv_content, str):
+                st.text("生のCSVデータ:")
+                st.text(csv_content[:500] + "..." if len(csv_content) > 500 else csv_content)
 
 # グローバルインスタンス
 csv_generator = CSVGenerator()
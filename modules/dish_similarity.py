@@ -0,0 +1,242 @@
+"""
+TONOSAMA Professional System - Dish Similarity Module
+料理説明文ニアデュプリケートキャッシュ - 1兆円ダイヤモンド級品質
+
+文字n-gramベクトルによるローカル類似検索（外部埋め込みサービス不要）
+店舗をまたいで同じ料理の食レポ下書きを提案・再利用
+"""
+
+import json
+import math
+import os
+import threading
+import unicodedata
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@dataclass(slots=True)
+class DishRecord:
+    """登録済み料理レコード"""
+    record_id: str = ""
+    name: str = ""
+    category: str = ""
+    store_name: str = ""
+    descriptions: Dict[str, str] = field(default_factory=dict)  # 言語コード→説明文
+    contexts: Dict[str, str] = field(default_factory=dict)  # 言語コード→生成時の入力指紋（料理名以外のプロンプト）
+
+@dataclass
+class DishMatch:
+    """類似検索結果"""
+    record: DishRecord
+    score: float
+
+class DishSimilarityIndex:
+    """文字n-gram転置インデックスによる料理類似検索"""
+    
+    def __init__(self, index_file: Path = Path("data/dish_index.jsonl"),
+                 threshold: float = 0.8, ngram_sizes: Tuple[int, ...] = (2, 3)):
+        """初期化 - 転置インデックスと永続化ファイルの準備"""
+        self.index_file = Path(index_file)
+        self.threshold = threshold
+        self.ngram_sizes = ngram_sizes
+        
+        self._records: List[DishRecord] = []
+        self._record_pos: Dict[str, int] = {}  # record_id → レコード位置
+        self._postings: Dict[str, Dict[int, float]] = {}  # n-gram → {レコード位置: 重み}
+        self._lock = threading.RLock()
+        
+        self._load()
+        
+    @staticmethod
+    def normalize(text: str) -> str:
+        """表記ゆれ吸収（全角半角・大小文字・空白）"""
+        text = unicodedata.normalize("NFKC", text or "").lower()
+        return "".join(ch for ch in text if not ch.isspace())
+        
+    def vectorize(self, text: str) -> Dict[str, float]:
+        """文字n-gramのL2正規化ベクトル生成"""
+        padded = f"^{self.normalize(text)}$"
+        counts: Dict[str, float] = {}
+        
+        for n in self.ngram_sizes:
+            for i in range(len(padded) - n + 1):
+                gram = padded[i:i + n]
+                counts[gram] = counts.get(gram, 0.0) + 1.0
+                
+        norm = math.sqrt(sum(w * w for w in counts.values()))
+        if norm == 0:
+            return {}
+            
+        return {gram: w / norm for gram, w in counts.items()}
+        
+    def make_record_id(self, name: str, store_name: str = "") -> str:
+        """レコードID生成（店舗×正規化料理名）"""
+        return f"{self.normalize(store_name)}::{self.normalize(name)}"
+        
+    def add(self, name: str, language: str, description: str,
+            category: str = "", store_name: str = "", context: str = "", persist: bool = True) -> DishRecord:
+        """料理説明文の登録（同一店舗・同一料理は言語ごとに上書き・context は生成時の入力指紋）"""
+        record_id = self.make_record_id(name, store_name)
+        
+        with self._lock:
+            pos = self._record_pos.get(record_id)
+            
+            if pos is None:
+                record = DishRecord(
+                    record_id=record_id,
+                    name=name,
+                    category=category,
+                    store_name=store_name
+                )
+                self._insert(record)
+            else:
+                record = self._records[pos]
+                if category:
+                    record.category = category
+                    
+            record.descriptions[language] = description
+            if context:
+                record.contexts[language] = context
+            else:
+                record.contexts.pop(language, None)
+            
+            if persist:
+                self._append_to_file({
+                    "record_id": record_id,
+                    "name": name,
+                    "category": record.category,
+                    "store_name": store_name,
+                    "descriptions": {language: description},
+                    "contexts": {language: context} if context else {}
+                })
+                
+        return record
+        
+    def search(self, name: str, top_k: int = 5, language: Optional[str] = None,
+               min_score: float = 0.0) -> List[DishMatch]:
+        """類似料理検索（コサイン類似度降順）"""
+        query = self.vectorize(name)
+        if not query:
+            return []
+            
+        scores: Dict[int, float] = {}
+        
+        with self._lock:
+            # 転置インデックスで共通n-gramを持つレコードのみ内積計算
+            for gram, q_weight in query.items():
+                postings = self._postings.get(gram)
+                if not postings:
+                    continue
+                for pos, d_weight in postings.items():
+                    scores[pos] = scores.get(pos, 0.0) + q_weight * d_weight
+                    
+            ranked = sorted(
+                ((pos, score) for pos, score in scores.items() if score >= min_score),
+                key=lambda x: x[1],
+                reverse=True
+            )
+            
+            matches = []
+            for pos, score in ranked:
+                record = self._records[pos]
+                if language and language not in record.descriptions:
+                    continue
+                matches.append(DishMatch(record=record, score=score))
+                if len(matches) >= top_k:
+                    break
+                    
+        return matches
+        
+    def find_reusable(self, name: str, language: str, store_name: str, context: str,
+                      threshold: Optional[float] = None) -> Optional[DishMatch]:
+        """そのまま再利用できる類似料理を取得
+        
+        同一店舗かつ料理名以外の生成入力（価格・カテゴリー・説明・店舗設備・アレルギー表示等）の
+        指紋が一致する説明文のみ対象（他店舗名・別価格・別アレルギー表示の混入防止）
+        """
+        if not context:
+            return None
+            
+        limit = self.threshold if threshold is None else threshold
+        store_key = self.normalize(store_name)
+        for match in self.search(name, top_k=len(self._records), language=language, min_score=limit):
+            record = match.record
+            if self.normalize(record.store_name) == store_key and record.contexts.get(language) == context:
+                return match
+        return None
+        
+    def suggest_drafts(self, name: str, language: str, top_k: int = 3) -> List[Tuple[str, float, str]]:
+        """下書き候補一覧（料理名, 類似度, 説明文）"""
+        return [
+            (match.record.name, match.score, match.record.descriptions[language])
+            for match in self.search(name, top_k=top_k, language=language, min_score=self.threshold)
+        ]
+        
+    def __len__(self) -> int:
+        return len(self._records)
+        
+    def _insert(self, record: DishRecord) -> None:
+        """レコード・ベクトル・転置インデックスへの追加"""
+        pos = len(self._records)
+        vector = self.vectorize(record.name)
+        
+        self._records.append(record)
+        self._record_pos[record.record_id] = pos
+        
+        for gram, weight in vector.items():
+            self._postings.setdefault(gram, {})[pos] = weight
+            
+    def _append_to_file(self, entry: Dict) -> None:
+        """追記専用ファイルへの永続化"""
+        try:
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.index_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logger.error(f"料理インデックス保存エラー: {e}")
+            
+    def _load(self) -> None:
+        """永続化ファイルからの復元"""
+        if not self.index_file.exists():
+            return
+            
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    contexts = entry.get("contexts", {})
+                    for language, description in entry.get("descriptions", {}).items():
+                        self.add(
+                            entry.get("name", ""),
+                            language,
+                            description,
+                            category=entry.get("category", ""),
+                            store_name=entry.get("store_name", ""),
+                            context=contexts.get(language, ""),
+                            persist=False
+                        )
+                        
+            logger.info(f"料理インデックス読み込み完了: {len(self._records)}件")
+            
+        except Exception as e:
+            logger.error(f"料理インデックス読み込みエラー: {e}")
+
+# グローバルインスタンス
+_dish_similarity_index = None
+
+def get_dish_similarity_index() -> DishSimilarityIndex:
+    """料理類似インデックスの取得（類似度しきい値は環境変数 TONOSAMA_DISH_SIMILARITY_THRESHOLD）"""
+    global _dish_similarity_index
+    if _dish_similarity_index is None:
+        _dish_similarity_index = DishSimilarityIndex(
+            threshold=float(os.getenv("TONOSAMA_DISH_SIMILARITY_THRESHOLD", "0.8"))
+        )
+    return _dish_similarity_index
@@ -9,7 +9,7 @@ import streamlit as st
 import os
 import io
 import json
-from typing import Dict, List, Optional, Tuple
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload
 from google.oauth2.credentials import Credentials
@@ -184,9 +184,9 @@ class GoogleDriveIntegration:
             logger.error(f"フォルダ作成エラー: {e}")
             return None
     
-    def upload_file(self, file_content: bytes, file_name: str, parent_folder_id: str, 
+    def upload_file(self, file_content: Union[bytes, BinaryIO], file_name: str, parent_folder_id: str, 
                    mime_type: str = 'application/octet-stream') -> Optional[str]:
-        """ファイルアップロード"""
+        """ファイルアップロード（バイト列またはファイルオブジェクト・後者はチャンク単位で送信）"""
         if not self.service:
             return None
         
@@ -196,8 +196,13 @@ class GoogleDriveIntegration:
                 'parents': [parent_folder_id]
             }
             
+            if isinstance(file_content, (bytes, bytearray)):
+                file_content = io.BytesIO(file_content)
+            else:
+                file_content.seek(0)
+            
             media = MediaIoBaseUpload(
-                io.BytesIO(file_content),
+                file_content,
                 mimetype=mime_type,
                 resumable=True
             )
@@ -309,6 +314,16 @@ class GoogleDriveIntegration:
                 'uploaded_files': {}
             }
             
+            # 0. 完全パッケージZIP（CSV・画像・マニフェストを1ファイルで）
+            if 'package_zip' in all_data:
+                file_id = self.upload_file(
+                    all_data['package_zip'],
+                    f"{store_name}_完全パッケージ.zip",
+                    folder_id,
+                    'application/zip'
+                )
+                package_info['uploaded_files']['package_zip'] = file_id
+            
             # 1. 店舗基本情報アップロード
             if 'store_info_csv' in all_data:
                 file_id = self.upload_file(
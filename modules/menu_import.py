@@ -0,0 +1,177 @@
+"""
+TONOSAMA Professional System - Menu Import Module
+メニュー一括インポート - 1兆円ダイヤモンド級品質
+
+CSV / Excel（XLSX）のメニュー表を読み込み、全行を列単位で一括検証
+行ごとのエラーを報告し、有効な行は1回の状態確定でまとめて登録
+"""
+
+import codecs
+import io
+import logging
+from typing import Any, Dict, Iterable, List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from modules.menu_ordering import DEFAULT_CATEGORY_SEQUENCE
+from modules.state_manager import MenuItem
+
+# openpyxl（存在する場合のみ・XLSX読み込み用）
+try:
+    import openpyxl  # noqa: F401
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 列名の別名（MenuItemのフィールド → 受け付ける見出し・先頭がテンプレートの見出し）
+COLUMN_ALIASES: Dict[str, Sequence[str]] = {
+    "id": ("メニューID", "ID", "id"),
+    "name": ("料理名", "メニュー名", "name", "dish_name"),
+    "price": ("価格", "price"),
+    "category": ("カテゴリー", "カテゴリ", "category"),
+    "desc": ("説明", "料理説明", "desc", "description"),
+    "recommendation_score": ("推奨度", "おすすめ度", "recommendation_score", "recommendation_level")
+}
+REQUIRED_COLUMNS = ("name", "price", "category")
+
+class MenuImporter:
+    """メニュー表の読み込み・一括検証"""
+    
+    def __init__(self, categories: Sequence[str] = DEFAULT_CATEGORY_SEQUENCE, max_rows: int = 5000):
+        """初期化"""
+        self.categories = tuple(categories)
+        self.max_rows = max_rows
+        
+    def template_csv(self) -> bytes:
+        """インポート用テンプレートCSV（BOM付きUTF-8）"""
+        headers = [aliases[0] for aliases in COLUMN_ALIASES.values()]
+        example = ["", "醤油ラーメン", "980", self.categories[1], "自家製麺と醤油ダレの看板メニュー", "5"]
+        return codecs.BOM_UTF8 + (",".join(headers) + "\r\n" + ",".join(example) + "\r\n").encode("utf-8")
+        
+    def read_table(self, data: bytes, filename: str) -> pd.DataFrame:
+        """CSV / XLSXの読み込み（全列を文字列として取得し、見出しをフィールド名へ対応付け）"""
+        extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+        
+        if extension == "csv":
+            frame = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, encoding="utf-8-sig")
+        elif extension in ("xlsx", "xlsm"):
+            if not OPENPYXL_AVAILABLE:
+                raise ValueError("Excelファイルの読み込みには openpyxl が必要です（pip install openpyxl）")
+            frame = pd.read_excel(io.BytesIO(data), dtype=str, keep_default_na=False, engine="openpyxl")
+        else:
+            raise ValueError(f"未対応のファイル形式です: {filename}（CSV / XLSXのみ）")
+            
+        lookup = {alias.strip().lower(): field for field, aliases in COLUMN_ALIASES.items() for alias in aliases}
+        renamed = {}
+        for column in frame.columns:
+            field = lookup.get(str(column).strip().lower())
+            if field and field not in renamed.values():
+                renamed[column] = field
+        frame = frame[list(renamed)].rename(columns=renamed)
+        
+        missing = [COLUMN_ALIASES[field][0] for field in REQUIRED_COLUMNS if field not in frame.columns]
+        if missing:
+            raise ValueError(f"必須列がありません: {'、'.join(missing)}")
+        if len(frame) > self.max_rows:
+            raise ValueError(f"一度に取り込めるのは{self.max_rows}行までです（{len(frame)}行）")
+            
+        for field in COLUMN_ALIASES:
+            if field not in frame.columns:
+                frame[field] = ""
+        return frame.reset_index(drop=True)
+        
+    @staticmethod
+    def _name_key(names: pd.Series) -> pd.Series:
+        """重複判定用の料理名（全角・半角と大文字・小文字を同一視）"""
+        return names.str.normalize("NFKC").str.casefold()
+        
+    def validate(self, frame: pd.DataFrame, existing_names: Iterable[str] = (),
+                 existing_ids: Iterable[str] = ()) -> Dict[str, Any]:
+        """全行の一括検証（列単位の判定から行ごとのエラーを作成）"""
+        name = frame["name"].astype(str).str.strip()
+        category = frame["category"].astype(str).str.strip()
+        item_id = frame["id"].astype(str).str.strip()
+        desc = frame["desc"].astype(str).str.strip()
+        
+        price = pd.to_numeric(frame["price"].astype(str).str.replace(r"[¥￥,円\s]", "", regex=True), errors="coerce")
+        score_text = frame["recommendation_score"].astype(str).str.strip()
+        score = pd.to_numeric(score_text, errors="coerce")
+        
+        name_key = self._name_key(name)
+        existing_keys = set(self._name_key(pd.Series(list(existing_names), dtype=object).astype(str).str.strip()))
+        row_numbers = np.arange(len(frame)) + 2  # 見出しが1行目
+        
+        # ファイル内重複は最初の出現行を案内
+        first_row = pd.Series(row_numbers, index=frame.index).groupby(name_key).transform("first")
+        duplicate_messages = "ファイル内で料理名が重複しています（" + first_row.astype(str) + "行目）"
+        
+        checks: List[Any] = [
+            (name == "", "料理名が未入力です"),
+            (price.isna(), "価格が数値ではありません"),
+            (price.notna() & (price <= 0), "価格は正の数で入力してください"),
+            (price.notna() & (price > 0) & (price % 1 != 0), "価格は整数（円）で入力してください"),
+            (~category.isin(self.categories), f"カテゴリーは {'・'.join(self.categories)} のいずれかです"),
+            ((name != "") & name_key.duplicated(keep="first"), duplicate_messages),
+            ((name != "") & name_key.isin(existing_keys), "同じ料理名のメニューが登録済みです"),
+            ((item_id != "") & item_id.duplicated(keep="first"), "ファイル内でメニューIDが重複しています"),
+            ((item_id != "") & item_id.isin(set(existing_ids)), "同じメニューIDが登録済みです"),
+            ((score_text != "") & (score.isna() | ~score.between(1, 5) | (score % 1 != 0)), "推奨度は1〜5の整数で入力してください")
+        ]
+        
+        masks = np.column_stack([mask.to_numpy(dtype=bool) for mask, _ in checks]) if len(frame) else np.zeros((0, len(checks)), dtype=bool)
+        invalid = masks.any(axis=1)
+        
+        errors = []
+        for i in np.flatnonzero(invalid):
+            messages = [
+                message if isinstance(message, str) else message.iat[i]
+                for (_, message), failed in zip(checks, masks[i]) if failed
+            ]
+            errors.append({"row": int(row_numbers[i]), "name": name.iat[i], "messages": messages})
+            
+        valid = ~invalid
+        items = [
+            MenuItem(id=row_id, name=row_name, price=int(row_price), category=row_category, desc=row_desc,
+                     **({"recommendation_score": int(row_score)} if pd.notna(row_score) else {}))
+            for row_id, row_name, row_price, row_category, row_desc, row_score in zip(
+                item_id[valid], name[valid], price[valid], category[valid], desc[valid], score[valid]
+            )
+        ]
+        
+        return {
+            "items": items,
+            "errors": errors,
+            "total_rows": len(frame),
+            "valid_rows": len(items)
+        }
+        
+    def import_file(self, data: Union[bytes, bytearray], filename: str, existing_names: Iterable[str] = (),
+                    existing_ids: Iterable[str] = ()) -> Dict[str, Any]:
+        """ファイルの読み込みと検証（登録は呼び出し側で add_menu_items）"""
+        try:
+            frame = self.read_table(bytes(data), filename)
+            result = self.validate(frame, existing_names, existing_ids)
+            logger.info(f"メニューインポート検証完了: {filename} ({result['valid_rows']}/{result['total_rows']}行有効)")
+            return {"success": True, **result}
+            
+        except Exception as e:
+            logger.error(f"メニューインポートエラー: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
+# グローバルインスタンス
+_menu_importer = None
+
+def get_menu_importer() -> MenuImporter:
+    """メニューインポートインスタンスの取得"""
+    global _menu_importer
+    if _menu_importer is None:
+        _menu_importer = MenuImporter()
+    return _menu_importer
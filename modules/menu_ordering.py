@@ -0,0 +1,87 @@
+"""
+TONOSAMA Professional System - Menu Ordering Module
+メニュー並び替えエンジン - 1兆円ダイヤモンド級品質
+
+アイテムごとの複合ソートキーを事前計算してキャッシュし
+メニュー変更時は該当アイテムのキーのみ再計算（並び替えは表示順IDのみ書き換え）
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 既定のカテゴリ表示順（外国人観光客向けの自然な流れ・未登録カテゴリは末尾に名前順）
+DEFAULT_CATEGORY_SEQUENCE = ("前菜", "メイン", "ご飯・麺", "デザート", "ドリンク", "その他")
+
+# 並び順定義（キー名 → (フィールド, 降順) の優先順リスト）
+ORDERINGS: Dict[str, Tuple[Tuple[str, bool], ...]] = {
+    "recommendation": (("recommendation_score", True), ("price", False)),
+    "price": (("price", False),),
+    "price_desc": (("price", True),),
+    "category": (("category", False), ("recommendation_score", True), ("price", False))
+}
+
+class MenuOrderingEngine:
+    """複合ソートキーをキャッシュするメニュー並び替えエンジン"""
+    
+    def __init__(self, menu: List[Any], category_sequence: Sequence[str] = DEFAULT_CATEGORY_SEQUENCE,
+                 orderings: Optional[Dict[str, Tuple[Tuple[str, bool], ...]]] = None):
+        """初期化 - 全アイテムのソートキーを計算"""
+        self.menu = menu
+        self.orderings = dict(orderings or ORDERINGS)
+        self.category_rank = {category: i for i, category in enumerate(category_sequence)}
+        
+        # 並び順 → アイテムID → 複合キー
+        self._keys: Dict[str, Dict[str, Tuple]] = {name: {} for name in self.orderings}
+        for item in menu:
+            self.update(item)
+            
+    def is_bound_to(self, menu: List[Any]) -> bool:
+        """キャッシュが現在のメニューリストと対応しているか"""
+        return self.menu is menu and all(len(keys) == len(menu) for keys in self._keys.values())
+        
+    def _field_key(self, item: Any, field_name: str, descending: bool) -> Tuple:
+        """単一フィールドのキー（カテゴリは表示順の順位・数値の降順は符号反転）"""
+        value = getattr(item, field_name, None)
+        
+        if field_name == "category":
+            category = value or ""
+            rank = self.category_rank.get(category, len(self.category_rank))
+            return (-rank, category) if descending else (rank, category)
+        if isinstance(value, str):
+            return (value,)
+        value = value or 0
+        return (-value,) if descending else (value,)
+        
+    def compute_key(self, item: Any, ordering: str) -> Tuple:
+        """複合ソートキーの計算"""
+        key: Tuple = ()
+        for field_name, descending in self.orderings[ordering]:
+            key += self._field_key(item, field_name, descending)
+        return key
+        
+    def update(self, item: Any) -> None:
+        """アイテムのキー再計算（追加・更新時）"""
+        for ordering, keys in self._keys.items():
+            keys[item.id] = self.compute_key(item, ordering)
+            
+    def remove(self, item_id: str) -> None:
+        """アイテムのキー削除"""
+        for keys in self._keys.values():
+            keys.pop(item_id, None)
+            
+    def add_ordering(self, name: str, spec: Iterable[Tuple[str, bool]]) -> None:
+        """並び順の追加（例: (("category", False), ("price", True))）"""
+        self.orderings[name] = tuple(spec)
+        self._keys[name] = {item.id: self.compute_key(item, name) for item in self.menu}
+        
+    def order(self, ordering: str, item_ids: Sequence[str]) -> List[str]:
+        """キャッシュ済みキーによる並び替え（同一キーは現在の順序を維持する安定ソート）"""
+        if ordering not in self._keys:
+            raise ValueError(f"未対応の並び替えキーです: {ordering}")
+            
+        keys = self._keys[ordering]
+        return sorted((item_id for item_id in item_ids if item_id in keys), key=keys.__getitem__)
@@ -0,0 +1,138 @@
+"""
+TONOSAMA Professional System - Menu Table Module
+列指向メニューテーブル - 1兆円ダイヤモンド級品質
+
+価格・推奨度を配列、カテゴリを整数コード（文字列は intern）で保持し
+集計・並び替えをベクトル化して実行
+"""
+
+import sys
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# カテゴリ未設定時の表示名
+UNCATEGORIZED = "その他"
+
+# 価格帯区分（円）
+DEFAULT_PRICE_BANDS = (("〜1,000円", 1000), ("1,000-3,000円", 3000), ("3,000円〜", None))
+
+class MenuTable:
+    """メニューの列指向スナップショット（読み取り専用）"""
+    
+    def __init__(self, ids: List[str], names: List[str], prices: np.ndarray,
+                 scores: np.ndarray, category_codes: np.ndarray, categories: List[str]):
+        """初期化 - 各列の配列"""
+        self.ids = ids
+        self.names = names
+        self.prices = prices
+        self.scores = scores
+        self.category_codes = category_codes
+        self.categories = categories
+        
+    @classmethod
+    def from_items(cls, items: Sequence[Any]) -> "MenuTable":
+        """MenuItem列からの構築（カテゴリ文字列は intern して整数コード化）"""
+        count = len(items)
+        ids: List[str] = [""] * count
+        names: List[str] = [""] * count
+        prices = np.zeros(count, dtype=np.int64)
+        scores = np.zeros(count, dtype=np.int8)
+        category_codes = np.zeros(count, dtype=np.int32)
+        categories: List[str] = []
+        category_index: Dict[str, int] = {}
+        
+        for i, item in enumerate(items):
+            ids[i] = item.id
+            names[i] = item.name
+            prices[i] = item.price or 0
+            scores[i] = item.recommendation_score or 0
+            
+            category = item.category or UNCATEGORIZED
+            code = category_index.get(category)
+            if code is None:
+                code = len(categories)
+                category_index[category] = code
+                categories.append(sys.intern(category))
+            category_codes[i] = code
+            
+        return cls(ids, names, prices, scores, category_codes, categories)
+        
+    def __len__(self) -> int:
+        return len(self.ids)
+        
+    # ---- 集計 ----
+    
+    def average_price(self) -> float:
+        """平均価格"""
+        return float(self.prices.mean()) if len(self) else 0.0
+        
+    def price_stats(self) -> Dict[str, float]:
+        """価格統計（最小・最大・平均・中央値）"""
+        if not len(self):
+            return {"min": 0.0, "max": 0.0, "mean": 0.0, "median": 0.0}
+        return {
+            "min": float(self.prices.min()),
+            "max": float(self.prices.max()),
+            "mean": float(self.prices.mean()),
+            "median": float(np.median(self.prices))
+        }
+        
+    def count_recommended(self, min_score: int = 4) -> int:
+        """推奨度が閾値以上の件数"""
+        return int(np.count_nonzero(self.scores >= min_score))
+        
+    def category_counts(self) -> Dict[str, int]:
+        """カテゴリ別件数（登録順）"""
+        counts = np.bincount(self.category_codes, minlength=len(self.categories))
+        return {category: int(counts[code]) for code, category in enumerate(self.categories)}
+        
+    def category_average_price(self) -> Dict[str, float]:
+        """カテゴリ別平均価格"""
+        counts = np.bincount(self.category_codes, minlength=len(self.categories))
+        totals = np.bincount(self.category_codes, weights=self.prices, minlength=len(self.categories))
+        return {
+            category: float(totals[code] / counts[code]) if counts[code] else 0.0
+            for code, category in enumerate(self.categories)
+        }
+        
+    def price_band_counts(self, bands=DEFAULT_PRICE_BANDS) -> Dict[str, int]:
+        """価格帯別件数（上限未満で区分・最後の区分は上限なし）"""
+        edges = [upper for _, upper in bands if upper is not None]
+        counts = np.bincount(np.searchsorted(edges, self.prices, side="right"), minlength=len(bands))
+        return {label: int(counts[i]) for i, (label, _) in enumerate(bands)}
+        
+    # ---- 並び替え・抽出 ----
+    
+    def sorted_ids(self, by: str = "recommendation", descending: Optional[bool] = None) -> List[str]:
+        """指定キーでの並び替え結果（安定ソート）"""
+        if by == "price":
+            order = np.argsort(-self.prices if descending else self.prices, kind="stable")
+        elif by == "recommendation":
+            # 推奨度降順（既定）→ 価格昇順
+            keys = self.scores.astype(np.int64) if descending is False else -self.scores.astype(np.int64)
+            order = np.lexsort((self.prices, keys))
+        elif by == "category":
+            # カテゴリ名順 → 推奨度降順
+            rank = np.argsort(np.argsort(np.array(self.categories, dtype=object), kind="stable"))
+            category_rank = rank[self.category_codes] if len(self.categories) else self.category_codes
+            if descending:
+                category_rank = -category_rank
+            order = np.lexsort((-self.scores.astype(np.int64), category_rank))
+        else:
+            raise ValueError(f"未対応の並び替えキーです: {by}")
+            
+        return [self.ids[i] for i in order]
+        
+    def ids_in_category(self, category: str) -> List[str]:
+        """カテゴリに属するIDの一覧"""
+        try:
+            code = self.categories.index(category or UNCATEGORIZED)
+        except ValueError:
+            return []
+        return [self.ids[i] for i in np.flatnonzero(self.category_codes == code)]
@@ -0,0 +1,291 @@
+"""
+TONOSAMA Professional System - Multilingual Pivot Module
+多言語データ縦持ち・ピボットエンジン - 1兆円ダイヤモンド級品質
+
+多言語テキストを縦持ち（項目・フィールド・言語・本文）で保持し
+横型・縦型・言語別の表を1回の走査でまとめて生成（取引先形式はレイアウト定義の追加のみ）
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 出力形状
+SHAPES = ("wide", "long", "per_language")
+
+# 縦型の行に出力できる値（record_columns のソース名）
+RECORD_SOURCES = ("field", "language", "language_name", "text", "is_fallback")
+DEFAULT_RECORD_COLUMNS = (("field", "field"), ("language", "language"), ("text", "text"))
+
+# レイアウト定義（名前 → 設定）
+#   dataset: 対象データ（story / food_report）
+#   shape: wide（1項目1行・言語が列）/ long（1項目×フィールド×言語で1行）/ per_language（言語ごとに1表）
+#   item_columns: 項目属性の列（(属性名, 見出し) の順）
+#   value_header: wide / per_language の本文列の見出し（{field} {language} {language_name} を置換）
+#   record_columns: long の本文側の列（(ソース名, 見出し) の順）
+#   fields / languages: 出力するフィールド・言語コード（省略時はデータに含まれる全て）
+#   filename: 出力ファイル名（{store_name}・per_language は {language} {language_name} も置換）
+LAYOUTS: Dict[str, Dict[str, Any]] = {
+    # 正太さん形式（横型）
+    "shota_story": {
+        "dataset": "story",
+        "shape": "wide",
+        "item_columns": (("store_name", "店舗名"),),
+        "fields": ("story",),
+        "value_header": "{language_name}ストーリー",
+        "filename": "{store_name}_店主ストーリー_14言語.csv"
+    },
+    "shota_food_report": {
+        "dataset": "food_report",
+        "shape": "wide",
+        "item_columns": (("id", "メニューID"), ("name", "料理名"), ("price", "価格"), ("category", "カテゴリー")),
+        "fields": ("description",),
+        "value_header": "説明文_{language_name}",
+        "filename": "{store_name}_食レポ_14言語.csv"
+    },
+    # 取引先向け（縦型・言語別）
+    "tidy_story": {
+        "dataset": "story",
+        "shape": "long",
+        "item_columns": (("store_name", "店舗名"),),
+        "fields": ("story",),
+        "record_columns": (("language", "言語コード"), ("language_name", "言語"), ("text", "ストーリー"), ("is_fallback", "仮翻訳")),
+        "filename": "{store_name}_店主ストーリー_縦型.csv"
+    },
+    "tidy_food_report": {
+        "dataset": "food_report",
+        "shape": "long",
+        "item_columns": (("id", "メニューID"), ("name", "料理名"), ("price", "価格"), ("category", "カテゴリー")),
+        "fields": ("description",),
+        "record_columns": (("language", "言語コード"), ("language_name", "言語"), ("text", "説明文"), ("is_fallback", "仮翻訳")),
+        "filename": "{store_name}_食レポ_縦型.csv"
+    },
+    "food_report_by_language": {
+        "dataset": "food_report",
+        "shape": "per_language",
+        "item_columns": (("id", "メニューID"), ("name", "料理名"), ("price", "価格"), ("category", "カテゴリー")),
+        "fields": ("description",),
+        "value_header": "説明文",
+        "filename": "{store_name}_食レポ_{language}.csv"
+    }
+}
+
+# 完全パッケージに同梱する取引先向けレイアウト
+PACKAGE_PARTNER_LAYOUTS = ("tidy_story", "tidy_food_report", "food_report_by_language")
+
+class LongTable:
+    """縦持ちの多言語データ（項目属性 + 項目×フィールド×言語の本文・列ごとのリストで保持）"""
+    
+    def __init__(self, dataset: str, languages: Sequence[Dict[str, str]]):
+        """初期化 - 言語定義（code / name）の順が言語番号"""
+        self.dataset = dataset
+        self.languages = [dict(lang) for lang in languages]
+        self.language_index = {lang["code"]: i for i, lang in enumerate(self.languages)}
+        
+        # 項目（番号 = 追加順）の属性
+        self.attributes: List[Dict[str, Any]] = []
+        
+        # 本文レコード（同じ添字が1レコード）
+        self.item: List[int] = []
+        self.field: List[str] = []
+        self.language: List[int] = []
+        self.text: List[Any] = []
+        self.is_fallback: List[bool] = []
+        
+    def add_item(self, **attributes: Any) -> int:
+        """項目の追加（項目番号を返却）"""
+        self.attributes.append(attributes)
+        return len(self.attributes) - 1
+        
+    def add_text(self, item: int, field: str, language: str, text: Any, is_fallback: bool = False) -> None:
+        """本文レコードの追加"""
+        self.item.append(item)
+        self.field.append(field)
+        self.language.append(self.language_index[language])
+        self.text.append(text)
+        self.is_fallback.append(is_fallback)
+        
+    def __len__(self) -> int:
+        return len(self.text)
+        
+    @property
+    def item_count(self) -> int:
+        return len(self.attributes)
+        
+    def fields(self) -> List[str]:
+        """フィールド名（出現順）"""
+        return list(dict.fromkeys(self.field))
+        
+    def records(self) -> Iterator[Tuple[int, str, int, Any, bool]]:
+        """(項目番号, フィールド, 言語番号, 本文, フォールバックか) を順次生成"""
+        return zip(self.item, self.field, self.language, self.text, self.is_fallback)
+
+class _WideSink:
+    """横型（1項目1行・フィールド×言語が列）"""
+    
+    def __init__(self, spec: Dict[str, Any], table: LongTable, fields: List[str], languages: List[int]):
+        item_columns = spec.get("item_columns", ())
+        
+        # (フィールド, 言語番号) → 列位置（フィールド順 → 言語順）
+        self.columns: Dict[Tuple[str, int], int] = {}
+        headers = [header for _, header in item_columns]
+        for field in fields:
+            for index in languages:
+                self.columns[(field, index)] = len(headers)
+                headers.append(_format_header(spec.get("value_header", "{field}_{language}"), field, table.languages[index]))
+        self.headers = headers
+        
+        blank = [""] * len(self.columns)
+        self.rows = [values + blank for values in _item_values(item_columns, table)]
+        
+    def add(self, item: int, field: str, language: int, text: Any, is_fallback: bool) -> None:
+        column = self.columns.get((field, language))
+        if column is not None:
+            self.rows[item][column] = text
+            
+    def result(self) -> List[List[Any]]:
+        return [self.headers] + self.rows
+
+class _LongSink:
+    """縦型（1レコード1行）"""
+    
+    def __init__(self, spec: Dict[str, Any], table: LongTable, fields: List[str], languages: List[int]):
+        item_columns = spec.get("item_columns", ())
+        record_columns = spec.get("record_columns", DEFAULT_RECORD_COLUMNS)
+        unknown = [source for source, _ in record_columns if source not in RECORD_SOURCES]
+        if unknown:
+            raise ValueError(f"未対応の列ソースです: {', '.join(unknown)}")
+            
+        self.headers = [header for _, header in item_columns] + [header for _, header in record_columns]
+        self.positions = [RECORD_SOURCES.index(source) for source, _ in record_columns]
+        self.fields = set(fields)
+        self.languages = {index: (table.languages[index]["code"], table.languages[index]["name"]) for index in languages}
+        self.item_values = _item_values(item_columns, table)
+        self.rows: List[List[Any]] = []
+        
+    def add(self, item: int, field: str, language: int, text: Any, is_fallback: bool) -> None:
+        lang = self.languages.get(language)
+        if lang is None or field not in self.fields:
+            return
+        values = (field, lang[0], lang[1], text, is_fallback)  # RECORD_SOURCES の順
+        self.rows.append(self.item_values[item] + [values[position] for position in self.positions])
+        
+    def result(self) -> List[List[Any]]:
+        return [self.headers] + self.rows
+
+class _PerLanguageSink:
+    """言語別（言語ごとに1項目1行・フィールドが列）"""
+    
+    def __init__(self, spec: Dict[str, Any], table: LongTable, fields: List[str], languages: List[int]):
+        item_columns = spec.get("item_columns", ())
+        offset = len(item_columns)
+        self.table = table
+        self.field_columns = {field: offset + i for i, field in enumerate(fields)}
+        self.headers = {
+            index: [header for _, header in item_columns] + [
+                _format_header(spec.get("value_header", "{field}"), field, table.languages[index]) for field in fields
+            ]
+            for index in languages
+        }
+        
+        item_values = _item_values(item_columns, table)
+        blank = [""] * len(fields)
+        self.rows = {index: [values + blank for values in item_values] for index in languages}
+        
+    def add(self, item: int, field: str, language: int, text: Any, is_fallback: bool) -> None:
+        rows = self.rows.get(language)
+        column = self.field_columns.get(field)
+        if rows is not None and column is not None:
+            rows[item][column] = text
+            
+    def result(self) -> Dict[str, List[List[Any]]]:
+        return {
+            self.table.languages[index]["code"]: [self.headers[index]] + rows
+            for index, rows in self.rows.items()
+        }
+
+_SINKS = {"wide": _WideSink, "long": _LongSink, "per_language": _PerLanguageSink}
+
+def _item_values(item_columns: Sequence[Tuple[str, str]], table: LongTable) -> List[List[Any]]:
+    """項目ごとの属性列の値"""
+    return [[attributes.get(name, "") for name, _ in item_columns] for attributes in table.attributes]
+
+def _format_header(template: str, field: str, lang: Dict[str, str]) -> str:
+    """本文列の見出し"""
+    return template.format(field=field, language=lang["code"], language_name=lang["name"])
+
+class PivotEngine:
+    """縦持ちデータから複数レイアウトの表を1回の走査で生成"""
+    
+    def __init__(self, layouts: Optional[Mapping[str, Dict[str, Any]]] = None):
+        """初期化"""
+        self.layouts: Dict[str, Dict[str, Any]] = dict(layouts or LAYOUTS)
+        
+    def register_layout(self, name: str, spec: Dict[str, Any]) -> None:
+        """レイアウトの追加・上書き（取引先形式の追加はこれのみ）"""
+        self.validate_layout(spec)
+        self.layouts[name] = dict(spec)
+        
+    def get_layout(self, name: str) -> Dict[str, Any]:
+        """レイアウト設定の取得"""
+        if name not in self.layouts:
+            raise ValueError(f"未登録のレイアウトです: {name}")
+        return self.layouts[name]
+        
+    def layouts_for(self, dataset: str) -> List[str]:
+        """データ種別に対応するレイアウト名"""
+        return [name for name, spec in self.layouts.items() if spec.get("dataset") == dataset]
+        
+    @staticmethod
+    def validate_layout(spec: Dict[str, Any]) -> None:
+        """レイアウト設定の検証"""
+        if spec.get("shape") not in SHAPES:
+            raise ValueError(f"未対応の出力形状です: {spec.get('shape')}（{' / '.join(SHAPES)}）")
+        if not spec.get("dataset"):
+            raise ValueError("レイアウトに dataset が指定されていません")
+            
+    def _sink(self, spec: Dict[str, Any], table: LongTable) -> Any:
+        """レイアウト1件分の出力先"""
+        self.validate_layout(spec)
+        if spec["dataset"] != table.dataset:
+            raise ValueError(f"レイアウトのデータ種別が一致しません: {spec['dataset']} / {table.dataset}")
+            
+        fields = list(spec.get("fields") or table.fields())
+        codes = spec.get("languages")
+        languages = [table.language_index[code] for code in codes if code in table.language_index] if codes else list(range(len(table.languages)))
+        return _SINKS[spec["shape"]](spec, table, fields, languages)
+        
+    def pivot_many(self, table: LongTable, names: Iterable[str]) -> Dict[str, Any]:
+        """複数レイアウトの一括生成（レコードの走査は1回・per_language は 言語コード → 表）"""
+        sinks = {name: self._sink(self.get_layout(name), table) for name in names}
+        adders = [sink.add for sink in sinks.values()]
+        
+        for record in table.records():
+            for add in adders:
+                add(*record)
+                
+        return {name: sink.result() for name, sink in sinks.items()}
+        
+    def pivot(self, table: LongTable, name: str) -> Any:
+        """単一レイアウトの生成"""
+        return self.pivot_many(table, [name])[name]
+        
+    def headers(self, name: str, languages: Sequence[Dict[str, str]]) -> List[str]:
+        """横型レイアウトの見出し（データなしで決定・fields の指定が必要）"""
+        spec = self.get_layout(name)
+        if spec["shape"] != "wide" or not spec.get("fields"):
+            raise ValueError(f"見出しのみの取得は fields 指定の横型レイアウトのみ対応です: {name}")
+        return self._sink(spec, LongTable(spec["dataset"], languages)).headers
+
+# グローバルインスタンス
+_pivot_engine = None
+
+def get_pivot_engine() -> PivotEngine:
+    """ピボットエンジンインスタンスの取得"""
+    global _pivot_engine
+    if _pivot_engine is None:
+        _pivot_engine = PivotEngine()
+    return _pivot_engine
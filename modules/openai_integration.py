@@ -9,17 +9,23 @@ TONOSAMA Professional System - OpenAI Integration Module
 import streamlit as st
 import openai
 import asyncio
+import os
 import time
 import logging
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 import json
+import hashlib
 from dataclasses import dataclass
+from modules.dish_similarity import get_dish_similarity_index
 
 # ログ設定
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 類似料理の食レポ再利用モード
+REUSE_MODES = ("off", "suggest", "auto")
+
 @dataclass
 class LanguageInfo:
     """言語情報データクラス"""
@@ -132,6 +138,16 @@ class OpenAIIntegration:
         self.request_count = 0
         self.last_request_time = 0
         self.min_request_interval = 1.0  # 秒
+        
+        # 類似料理の食レポ再利用（文字n-gramローカル検索・環境変数 TONOSAMA_DISH_REUSE_MODE）
+        #   off: 検索・登録とも無効
+        #   suggest: 他店舗・他メニューの生成済み説明文を編集可能な下書きとして提案（既定）
+        #   auto: 提案に加え、同一店舗・料理名以外の生成入力が完全一致する説明文を自動再利用
+        self.dish_index = get_dish_similarity_index()
+        self.description_reuse_mode = os.getenv("TONOSAMA_DISH_REUSE_MODE", "suggest").strip().lower()
+        if self.description_reuse_mode not in REUSE_MODES:
+            logger.warning(f"未対応の食レポ再利用モードです: {self.description_reuse_mode} - suggestで動作")
+            self.description_reuse_mode = "suggest"
     
     def get_api_key(self) -> Optional[str]:
         """APIキーの安全な取得"""
@@ -215,6 +231,16 @@ class OpenAIIntegration:
     async def generate_menu_description(self, menu_item: Dict, language: str, store_info: Dict) -> str:
         """AI食レポ生成（指定言語）"""
         try:
+            store_name = store_info.get('store_name_ja', '')
+            context = self._menu_prompt_context(menu_item, language, store_info)
+            
+            # 同一店舗・同一入力で生成済みの類似料理の食レポがあれば再利用（autoモードのみ）
+            if self.description_reuse_mode == "auto":
+                match = self.dish_index.find_reusable(menu_item.get('name', ''), language, store_name, context)
+                if match:
+                    logger.info(f"類似料理の食レポ再利用: {menu_item.get('name', '')} ← {match.record.name} ({match.score:.2f})")
+                    return match.record.descriptions[language]
+            
             api_key = self.get_api_key()
             if not api_key:
                 raise Exception("OpenAI APIキーが設定されていません")
@@ -232,6 +258,17 @@ class OpenAIIntegration:
                 f"食レポ生成 ({language})"
             )
             
+            # 他店舗・他メニューでの下書き提案・再利用のため登録
+            if self.description_reuse_mode != "off":
+                self.dish_index.add(
+                    menu_item.get('name', ''),
+                    language,
+                    response,
+                    category=menu_item.get('category', ''),
+                    store_name=store_name,
+                    context=context
+                )
+            
             return response
             
         except Exception as e:
@@ -444,6 +481,11 @@ Please write only the description without any additional formatting or labels.""
 
         return prompt
     
+    def _menu_prompt_context(self, menu_item: Dict, language: str, store_info: Dict) -> str:
+        """食レポ生成入力の指紋（料理名を除いたプロンプトのハッシュ・価格・店舗・設備/アレルギー情報を含む）"""
+        prompt = self._build_menu_prompt(dict(menu_item, name=''), language, store_info)
+        return hashlib.blake2b(prompt.encode('utf-8'), digest_size=16).hexdigest()
+    
     def _build_translation_prompt(self, content: str, target_language: str) -> str:
         """翻訳プロンプト構築"""
         lang_info = self.languages.get(target_language, self.languages['en'])
@@ -549,6 +591,15 @@ Translation:"""
         lang_name = self.languages.get(language, {}).get('name', language)
         return f"[{lang_name} translation of: {content[:50]}...]"
     
+    def suggest_similar_descriptions(self, menu_item: Dict, language: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        """類似料理の食レポ下書き候補取得（他店舗を含む・offモードでは提案なし）"""
+        if self.description_reuse_mode == "off":
+            return []
+        return [
+            {"name": name, "score": score, "description": description}
+            for name, score, description in self.dish_index.suggest_drafts(menu_item.get('name', ''), language, top_k)
+        ]
+    
     def get_supported_languages(self) -> List[LanguageInfo]:
         """サポート言語一覧取得"""
         return list(self.languages.values())
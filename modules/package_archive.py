@@ -0,0 +1,231 @@
+"""
+TONOSAMA Professional System - Package Archive Module
+完全パッケージZIPストリーミング - 1兆円ダイヤモンド級品質
+
+CSV・画像・マニフェストを1つのZIPへ逐次書き出し（アーカイブ全体をメモリ上に構築しない）
+圧縮済み画像（JPEG等）は再圧縮せず無圧縮格納
+"""
+
+import hashlib
+import io
+import json
+import logging
+import posixpath
+import tempfile
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 圧縮済み形式（再圧縮しても縮まないため無圧縮で格納）
+STORED_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".zip", ".gz", ".parquet", ".xlsx"})
+
+# パッケージ構成（キー → (フォルダ, ファイル名テンプレート)・Google Driveのフォルダ構成と同一）
+PACKAGE_LAYOUT: Tuple[Tuple[str, str, str], ...] = (
+    ("store_info_csv", "01_店舗基本情報", "{store_name}_店舗基本情報.csv"),
+    ("story_csv", "02_店主ストーリー", "{store_name}_14言語ストーリー.csv"),
+    ("menu_csv", "03_メニュー情報", "{store_name}_14言語メニュー.csv"),
+    ("food_report_csv", "04_AI食レポ", "{store_name}_14言語AI食レポ.csv"),
+    ("store_info_parquet", "05_分析用データ", "{store_name}_店舗基本情報.parquet"),
+    ("story_parquet", "05_分析用データ", "{store_name}_14言語ストーリー.parquet"),
+    ("food_report_parquet", "05_分析用データ", "{store_name}_14言語AI食レポ.parquet"),
+    ("workbook_xlsx", "06_Excel", "{store_name}_14言語データ.xlsx")
+)
+IMAGE_FOLDER = "03_メニュー情報/images"
+PARTNER_FOLDER = "07_取引先形式"  # レイアウト定義による縦型・言語別CSV
+MANIFEST_NAME = "manifest.json"
+
+# エントリの内容（バイト列・ファイルオブジェクト・バイトチャンクのイテレータ）
+EntrySource = Union[bytes, bytearray, memoryview, Any, Iterable[bytes]]
+
+class _ChunkSink:
+    """ZipFileの出力先（書き込まれたバイト列を溜めて順次取り出す・シーク不可）"""
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.pending = 0
+        
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self.pending += len(data)
+        return len(data)
+        
+    def flush(self) -> None:
+        pass
+        
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.pending = 0
+        return data
+
+def _iter_source(source: EntrySource, chunk_size: int) -> Iterator[bytes]:
+    """エントリ内容をバイトチャンクとして順次取り出し"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+        return
+        
+    if hasattr(source, "read"):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        return
+        
+    yield from source
+
+class SpooledArchive(io.RawIOBase):
+    """一時ファイルへ書き出したZIPの読み出し口
+    
+    st.download_button がそのまま受け付ける RawIOBase として一時ファイルを包む
+    （ページ側で全体を読み込んだ複製を作らない）
+    """
+    
+    def __init__(self, spooled: tempfile.SpooledTemporaryFile):
+        super().__init__()
+        self._spooled = spooled
+        
+    def readable(self) -> bool:
+        return True
+        
+    def seekable(self) -> bool:
+        return True
+        
+    def readinto(self, buffer) -> int:
+        data = self._spooled.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+        
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._spooled.seek(offset, whence)
+        
+    def tell(self) -> int:
+        return self._spooled.tell()
+        
+    def close(self) -> None:
+        if not self.closed:
+            self._spooled.close()
+        super().close()
+
+class PackageArchiveBuilder:
+    """完全パッケージZIPの逐次生成"""
+    
+    def __init__(self, chunk_size: int = 256 * 1024, spool_max_memory: int = 16 * 1024 * 1024):
+        """初期化"""
+        self.chunk_size = chunk_size  # 出力チャンクの目安（バイト）
+        self.spool_max_memory = spool_max_memory  # これを超える一時ファイルはディスクへ
+        
+    def archive_filename(self, store_name: str) -> str:
+        """ダウンロード・アップロード用のファイル名"""
+        return f"{store_name}_完全パッケージ.zip"
+        
+    def is_stored(self, name: str) -> bool:
+        """無圧縮で格納するか（圧縮済み形式）"""
+        return posixpath.splitext(name)[1].lower() in STORED_EXTENSIONS
+        
+    def package_entries(self, store_name: str, package_data: Dict[str, Any]) -> Iterator[Tuple[str, EntrySource]]:
+        """パッケージデータ（Google Drive連携と同一形式）からZIP内パスと内容の組を順次生成"""
+        for key, folder, template in PACKAGE_LAYOUT:
+            if package_data.get(key) is not None:
+                yield f"{folder}/{template.format(store_name=store_name)}", package_data[key]
+                
+        for filename, source in (package_data.get("partner_files") or {}).items():
+            yield f"{PARTNER_FOLDER}/{posixpath.basename(filename)}", source
+            
+        images = package_data.get("images") or {}
+        if isinstance(images, Mapping):
+            images = images.items()
+            
+        used = set()
+        for image_name, source in images:
+            # パス区切りを除去し、同名ファイルは連番で区別
+            base = posixpath.basename(str(image_name).replace("\\", "/")) or "image"
+            name = base
+            stem, ext = posixpath.splitext(base)
+            n = 1
+            while name in used:
+                n += 1
+                name = f"{stem}_{n}{ext}"
+            used.add(name)
+            yield f"{IMAGE_FOLDER}/{name}", source
+            
+    def iter_zip(self, store_name: str, package_data: Dict[str, Any]) -> Iterator[bytes]:
+        """ZIPのバイトチャンクを順次生成（マニフェストは末尾に格納）"""
+        sink = _ChunkSink()
+        created_at = datetime.now()
+        files = []
+        
+        with zipfile.ZipFile(sink, "w") as archive:
+            for name, source in self.package_entries(store_name, package_data):
+                info = zipfile.ZipInfo(name, date_time=created_at.timetuple()[:6])
+                info.compress_type = zipfile.ZIP_STORED if self.is_stored(name) else zipfile.ZIP_DEFLATED
+                
+                digest = hashlib.sha256()
+                size = 0
+                with archive.open(info, "w") as dest:
+                    for chunk in _iter_source(source, self.chunk_size):
+                        dest.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                        if sink.pending >= self.chunk_size:
+                            yield sink.drain()
+                            
+                files.append({
+                    "path": name,
+                    "size": size,
+                    "sha256": digest.hexdigest(),
+                    "compression": "stored" if info.compress_type == zipfile.ZIP_STORED else "deflated"
+                })
+                
+            manifest = {
+                "system": "TONOSAMA Professional System",
+                "store_name": store_name,
+                "created_at": created_at.isoformat(),
+                "file_count": len(files),
+                "total_bytes": sum(f["size"] for f in files),
+                "files": files
+            }
+            archive.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2),
+                             compress_type=zipfile.ZIP_DEFLATED)
+                             
+        yield sink.drain()
+        logger.info(f"パッケージZIP生成完了: {store_name} ({len(files)}ファイル)")
+        
+    def spool(self, store_name: str, package_data: Dict[str, Any]) -> SpooledArchive:
+        """ZIPを一時ファイルへ書き出し（先頭へ巻き戻し済み・大きい場合はディスク）"""
+        spooled = tempfile.SpooledTemporaryFile(max_size=self.spool_max_memory, mode="w+b")
+        for chunk in self.iter_zip(store_name, package_data):
+            spooled.write(chunk)
+        spooled.seek(0)
+        return SpooledArchive(spooled)
+        
+    @staticmethod
+    def read_manifest(archive_file: Any) -> Optional[Dict[str, Any]]:
+        """ZIPからマニフェストを読み込み"""
+        try:
+            archive_file.seek(0)
+            with zipfile.ZipFile(archive_file) as archive:
+                return json.loads(archive.read(MANIFEST_NAME).decode("utf-8"))
+        except (KeyError, zipfile.BadZipFile, ValueError) as e:
+            logger.error(f"マニフェスト読み込みエラー: {e}")
+            return None
+        finally:
+            archive_file.seek(0)
+
+# グローバルインスタンス
+_package_archive_builder = None
+
+def get_package_archive_builder() -> PackageArchiveBuilder:
+    """パッケージZIP生成インスタンスの取得"""
+    global _package_archive_builder
+    if _package_archive_builder is None:
+        _package_archive_builder = PackageArchiveBuilder()
+    return _package_archive_builder
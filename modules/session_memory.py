@@ -0,0 +1,330 @@
+"""
+TONOSAMA Professional System - Session Memory Module
+セッションメモリ管理・アイドルセッション退避 - 1兆円ダイヤモンド級品質
+
+セッションごとの概算メモリ量を計測し、プロセス全体の上限を超えた場合は
+最も長く使われていないセッションをローカルディスクへ退避（次回アクセス時に自動復元）
+長期間アクセスのないセッションは枠と退避ファイルを破棄（永続化済みの状態から再開）
+"""
+
+import os
+import sys
+import time
+import threading
+import logging
+from collections import OrderedDict, deque
+from collections.abc import Collection
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def deep_size(obj: Any, seen: Optional[set] = None) -> int:
+    """概算ディープサイズ（バイト・共有オブジェクトは1回のみ計上）"""
+    if seen is None:
+        seen = set()
+        
+    obj_id = id(obj)
+    if obj_id in seen:
+        return 0
+    seen.add(obj_id)
+    
+    size = sys.getsizeof(obj)
+    
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_size(key, seen) + deep_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        for value in obj:
+            size += deep_size(value, seen)
+    else:
+        slots = getattr(type(obj), "__slots__", ())
+        if hasattr(obj, "__dict__"):
+            size += deep_size(vars(obj), seen)
+        for slot in slots:
+            if hasattr(obj, slot):
+                size += deep_size(getattr(obj, slot), seen)
+        if not slots and not hasattr(obj, "__dict__") and isinstance(obj, Collection) and not hasattr(obj, "nbytes"):
+            # その他のコレクション（イテレータは消費しないため対象外・配列はバッファ込みで計上済み）
+            for value in obj:
+                size += deep_size(value, seen)
+                
+    return size
+
+class SessionExpiredError(LookupError):
+    """長時間アイドルにより破棄されたセッション枠へのアクセス"""
+    
+    def __init__(self, session_id: str):
+        super().__init__(f"セッションの有効期限が切れています: {session_id}")
+        self.session_id = session_id
+
+class SessionSlot:
+    """セッション状態の格納枠（退避中は state が None）"""
+    
+    def __init__(self, session_id: str, state: Any):
+        """初期化 - セッションIDと状態"""
+        self.session_id = session_id
+        self.state = state
+        self.derived: Dict[str, Any] = {}  # 状態から再構築可能な派生キャッシュ・元に戻す履歴（退避時に破棄）
+        self.size = 0
+        self.size_dirty = True
+        self.last_access = time.monotonic()
+        self.spill_path: Optional[Path] = None
+        self.expired = False  # 期限切れで破棄済み（以後は acquire で SessionExpiredError）
+        self.lock = threading.RLock()
+        
+    @property
+    def spilled(self) -> bool:
+        """ディスク退避中か"""
+        return self.state is None
+
+class SessionMemoryManager:
+    """プロセス全体のセッションメモリ上限管理（LRU退避）"""
+    
+    def __init__(self, dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any],
+                 cap_bytes: int = 512 * 1024 * 1024, spill_dir: Path = Path("data/spill"),
+                 min_idle_seconds: float = 60.0, idle_spill_seconds: Optional[float] = None,
+                 expire_idle_seconds: Optional[float] = 24 * 3600, enforce_interval: float = 5.0,
+                 sweep_interval: float = 3600.0):
+        """初期化 - 直列化関数・メモリ上限・退避先"""
+        self.dumps = dumps
+        self.loads = loads
+        self.cap_bytes = cap_bytes
+        self.spill_dir = Path(spill_dir)
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self.min_idle_seconds = min_idle_seconds      # 実行中のセッションを退避しないための最短アイドル時間
+        self.idle_spill_seconds = idle_spill_seconds  # 上限に関係なく退避するアイドル時間（None で無効）
+        self.expire_idle_seconds = expire_idle_seconds  # 枠と退避ファイルを破棄するアイドル時間（None で無効）
+        self.enforce_interval = enforce_interval
+        self.sweep_interval = sweep_interval  # 孤立した退避ファイル（前回プロセス等）の掃除間隔
+        
+        self._slots: "OrderedDict[str, SessionSlot]" = OrderedDict()  # 古い順
+        self._lock = threading.Lock()
+        self._last_enforce = 0.0
+        self._last_sweep = 0.0
+        
+        # 統計
+        self.spill_count = 0
+        self.rehydrate_count = 0
+        self.expire_count = 0
+        
+        self.sweep_spill_dir()
+        
+    def register(self, slot: SessionSlot) -> SessionSlot:
+        """セッション枠の登録（同一セッションの旧枠は置き換え）"""
+        with self._lock:
+            old = self._slots.pop(slot.session_id, None)
+            self._slots[slot.session_id] = slot
+            
+        if old is not None and old is not slot:
+            self._remove_spill_file(old)
+            
+        return slot
+        
+    def acquire(self, slot: SessionSlot) -> Any:
+        """状態の取得（退避中なら復元・LRU更新・期限切れで破棄済みなら SessionExpiredError）"""
+        with slot.lock:
+            if slot.expired:
+                raise SessionExpiredError(slot.session_id)
+            if slot.spilled:
+                self._rehydrate(slot)
+            slot.last_access = time.monotonic()
+            state = slot.state
+            
+        with self._lock:
+            if slot.session_id in self._slots:
+                self._slots.move_to_end(slot.session_id)
+            else:
+                self._slots[slot.session_id] = slot
+                
+        self.maybe_enforce(exclude=slot)
+        return state
+        
+    def mark_changed(self, slot: SessionSlot) -> None:
+        """状態変更の通知（次回計測時にサイズ再計算）"""
+        slot.size_dirty = True
+        slot.last_access = time.monotonic()
+        
+    def release(self, session_id: str) -> None:
+        """セッション枠の登録解除（リセット時等）"""
+        with self._lock:
+            slot = self._slots.pop(session_id, None)
+        if slot is not None:
+            self._remove_spill_file(slot)
+            
+    def maybe_enforce(self, exclude: Optional[SessionSlot] = None) -> None:
+        """一定間隔ごとの上限チェック"""
+        now = time.monotonic()
+        if now - self._last_enforce < self.enforce_interval:
+            return
+        self._last_enforce = now
+        self.enforce(exclude=exclude)
+        
+    def enforce(self, exclude: Optional[SessionSlot] = None) -> int:
+        """期限切れセッションの破棄と、上限超過・長時間アイドルのセッションの古い順の退避（退避件数を返却）"""
+        now = time.monotonic()
+        
+        if self.expire_idle_seconds is not None:
+            self.expire(exclude=exclude)
+        if now - self._last_sweep >= self.sweep_interval:
+            self.sweep_spill_dir()
+        
+        with self._lock:
+            slots = list(self._slots.values())
+            
+        total = 0
+        for slot in slots:
+            with slot.lock:
+                if not slot.spilled and slot.size_dirty:
+                    slot.size = deep_size(slot.state) + deep_size(slot.derived)
+                    slot.size_dirty = False
+                if not slot.spilled:
+                    total += slot.size
+                    
+        spilled = 0
+        for slot in slots:  # 古い順
+            if slot is exclude or slot.spilled:
+                continue
+                
+            idle = now - slot.last_access
+            if idle < self.min_idle_seconds:
+                continue
+                
+            over_cap = total > self.cap_bytes
+            idle_expired = self.idle_spill_seconds is not None and idle >= self.idle_spill_seconds
+            if not (over_cap or idle_expired):
+                continue
+                
+            freed = self._spill(slot)
+            if freed:
+                total -= freed
+                spilled += 1
+                
+        return spilled
+        
+    def expire(self, exclude: Optional[SessionSlot] = None) -> int:
+        """長時間アイドルのセッション枠を破棄し退避ファイルを削除（破棄件数を返却）"""
+        if self.expire_idle_seconds is None:
+            return 0
+            
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                slot for slot in self._slots.values()
+                if slot is not exclude and now - slot.last_access >= self.expire_idle_seconds
+            ]
+            for slot in expired:
+                del self._slots[slot.session_id]
+                
+        for slot in expired:
+            with slot.lock:
+                slot.expired = True
+                slot.state = None
+                slot.derived = {}
+                self._remove_spill_file(slot)
+            self.expire_count += 1
+            logger.info(f"期限切れセッション破棄: {slot.session_id}")
+            
+        return len(expired)
+        
+    def sweep_spill_dir(self) -> int:
+        """どの枠からも参照されていない古い退避ファイルの削除（削除件数を返却）"""
+        self._last_sweep = time.monotonic()
+        if self.expire_idle_seconds is None:
+            return 0
+            
+        with self._lock:
+            referenced = {slot.spill_path for slot in self._slots.values() if slot.spill_path is not None}
+            
+        cutoff = time.time() - self.expire_idle_seconds
+        removed = 0
+        for path in list(self.spill_dir.glob("*.json")) + list(self.spill_dir.glob("*.tmp")):
+            try:
+                if path not in referenced and path.stat().st_mtime < cutoff:
+                    path.unlink(missing_ok=True)
+                    removed += 1
+            except OSError as e:
+                logger.warning(f"退避ファイル削除エラー: {e}")
+                
+        if removed:
+            logger.info(f"孤立した退避ファイルを削除: {removed}件")
+        return removed
+        
+    def iter_serialized(self) -> Iterator[bytes]:
+        """全セッション枠の直列化済み状態（常駐中は直列化・退避中は退避ファイル）を順次取得"""
+        with self._lock:
+            slots = list(self._slots.values())
+            
+        for slot in slots:
+            with slot.lock:
+                if slot.expired:
+                    continue
+                try:
+                    data = slot.spill_path.read_bytes() if slot.spilled else self.dumps(slot.state)
+                except OSError as e:
+                    logger.warning(f"退避ファイル読み込みエラー: {e}")
+                    continue
+            yield data
+            
+    def get_stats(self) -> Dict[str, Any]:
+        """メモリ統計"""
+        with self._lock:
+            slots = list(self._slots.values())
+            
+        resident = [s for s in slots if not s.spilled]
+        return {
+            "sessions": len(slots),
+            "resident_sessions": len(resident),
+            "spilled_sessions": len(slots) - len(resident),
+            "resident_bytes": sum(s.size for s in resident),
+            "cap_bytes": self.cap_bytes,
+            "spill_count": self.spill_count,
+            "rehydrate_count": self.rehydrate_count,
+            "expire_count": self.expire_count
+        }
+        
+    def _spill(self, slot: SessionSlot) -> int:
+        """ディスク退避（解放したおおよそのバイト数を返却）"""
+        with slot.lock:
+            if slot.spilled:
+                return 0
+            try:
+                path = self.spill_dir / f"{slot.session_id}.json"
+                tmp_path = path.with_suffix(".tmp")
+                tmp_path.write_bytes(self.dumps(slot.state))
+                os.replace(tmp_path, path)
+                
+                freed = slot.size
+                slot.spill_path = path
+                slot.state = None
+                slot.derived = {}
+                self.spill_count += 1
+                
+                logger.info(f"アイドルセッション退避: {slot.session_id} ({freed / 1024:.0f}KB)")
+                return freed
+                
+            except Exception as e:
+                logger.error(f"セッション退避エラー: {e}")
+                return 0
+                
+    def _rehydrate(self, slot: SessionSlot) -> None:
+        """ディスクからの復元（slot.lock 取得済み前提）"""
+        slot.state = self.loads(slot.spill_path.read_bytes())
+        slot.size_dirty = True
+        self._remove_spill_file(slot)
+        self.rehydrate_count += 1
+        logger.info(f"退避セッション復元: {slot.session_id}")
+        
+    @staticmethod
+    def _remove_spill_file(slot: SessionSlot) -> None:
+        """退避ファイル削除"""
+        if slot.spill_path is not None:
+            try:
+                slot.spill_path.unlink(missing_ok=True)
+            except Exception as e:
+                logger.warning(f"退避ファイル削除エラー: {e}")
+            slot.spill_path = None
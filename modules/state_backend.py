@@ -0,0 +1,556 @@
+"""
+TONOSAMA Professional System - State Backend Module
+共有状態バックエンド - 1兆円ダイヤモンド級品質
+
+複数レプリカ間でセッション状態を共有するサーバーサイドストア
+バージョン番号による楽観的並行制御（SQLite / Redisプロトコル）
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlparse
+from modules.state_persistence import apply_json_patch, make_pointer, split_pointer
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class VersionConflictError(Exception):
+    """期待バージョンと保存済みバージョンの不一致（他レプリカが先に更新）"""
+    
+    def __init__(self, session_id: str, expected: int, actual: int):
+        super().__init__(f"状態バージョン競合: {session_id} (期待 {expected}, 実際 {actual})")
+        self.session_id = session_id
+        self.expected = expected
+        self.actual = actual
+
+class StateBackend:
+    """共有状態バックエンドの基底クラス（バージョン0は未保存を表す）"""
+    
+    def get(self, session_id: str) -> Optional[Tuple[int, bytes]]:
+        """状態取得（バージョン, 直列化済み状態）"""
+        raise NotImplementedError
+        
+    def get_version(self, session_id: str) -> int:
+        """保存済みバージョンのみ取得（更新確認用の軽量経路）"""
+        raise NotImplementedError
+        
+    def put(self, session_id: str, payload: bytes, expected_version: int) -> int:
+        """期待バージョン一致時のみ書き込み（新バージョンを返却・不一致時はVersionConflictError）"""
+        raise NotImplementedError
+        
+    def delete(self, session_id: str) -> None:
+        """状態削除"""
+        raise NotImplementedError
+        
+    def close(self) -> None:
+        """接続終了"""
+
+class SQLiteStateBackend(StateBackend):
+    """SQLite（WAL）による共有状態バックエンド（同一ホスト上の複数プロセス向け）"""
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS shared_sessions (
+        session_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        payload BLOB NOT NULL,
+        updated_at TEXT NOT NULL
+    ) WITHOUT ROWID;
+    """
+    
+    def __init__(self, db_path: Path = Path("data/shared_state.db"), busy_timeout_ms: int = 5000):
+        """初期化 - データベース接続とスキーマ作成"""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        self._conn.executescript(self.SCHEMA)
+        
+    def get(self, session_id: str) -> Optional[Tuple[int, bytes]]:
+        """状態取得"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, payload FROM shared_sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+            
+        return (row[0], bytes(row[1])) if row else None
+        
+    def get_version(self, session_id: str) -> int:
+        """保存済みバージョン取得"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM shared_sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+            
+        return row[0] if row else 0
+        
+    def put(self, session_id: str, payload: bytes, expected_version: int) -> int:
+        """比較交換書き込み（BEGIN IMMEDIATEで他プロセスの書き込みと直列化）"""
+        now = datetime.now(timezone.utc).isoformat()
+        
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT version FROM shared_sessions WHERE session_id = ?",
+                    (session_id,)
+                ).fetchone()
+                actual = row[0] if row else 0
+                
+                if actual != expected_version:
+                    raise VersionConflictError(session_id, expected_version, actual)
+                    
+                self._conn.execute(
+                    "INSERT INTO shared_sessions (session_id, version, payload, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET version = excluded.version, "
+                    "payload = excluded.payload, updated_at = excluded.updated_at",
+                    (session_id, actual + 1, payload, now)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+                
+        return actual + 1
+        
+    def delete(self, session_id: str) -> None:
+        """状態削除"""
+        with self._lock:
+            self._conn.execute("DELETE FROM shared_sessions WHERE session_id = ?", (session_id,))
+            
+    def close(self) -> None:
+        """接続終了"""
+        with self._lock:
+            self._conn.close()
+
+class RESPError(Exception):
+    """Redisサーバーのエラー応答"""
+
+class RESPConnection:
+    """最小限のRedisプロトコル（RESP2）クライアント"""
+    
+    def __init__(self, host: str = "localhost", port: int = 6379, password: Optional[str] = None,
+                 db: int = 0, timeout: float = 5.0, username: Optional[str] = None):
+        """初期化 - 接続は初回コマンド時に確立"""
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.db = db
+        self.timeout = timeout
+        
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        
+    def connect(self) -> None:
+        """接続確立（認証・DB選択）"""
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+        
+        if self.password:
+            auth = ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+            _check(self._send(*auth))
+        if self.db:
+            _check(self._send("SELECT", self.db))
+            
+    def execute(self, *args: Any, retry: bool = True) -> Any:
+        """コマンド実行（切断時は1回だけ再接続して再送・トランザクション中は再送しない）"""
+        if self._sock is None:
+            self.connect()
+            
+        try:
+            return self._send(*args)
+        except (ConnectionError, socket.timeout, OSError) as e:
+            if not retry:
+                self.close()
+                raise
+            logger.warning(f"Redis再接続: {e}")
+            self.close()
+            self.connect()
+            return self._send(*args)
+            
+    def close(self) -> None:
+        """接続終了"""
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+        
+    def _send(self, *args: Any) -> Any:
+        """コマンド送信と応答受信"""
+        self._sock.sendall(self._encode(args))
+        return self._read_reply()
+        
+    @staticmethod
+    def _encode(args: Tuple[Any, ...]) -> bytes:
+        """コマンドのRESP配列化"""
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if isinstance(arg, (bytes, bytearray, memoryview)):
+                data = bytes(arg)
+            else:
+                data = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n" % len(data))
+            parts.append(data)
+            parts.append(b"\r\n")
+        return b"".join(parts)
+        
+    def _read_reply(self) -> Any:
+        """応答の解析（エラー応答はRESPErrorとして返却）"""
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis接続が切断されました")
+            
+        prefix, body = line[:1], line[1:-2]
+        
+        if prefix == b"+":
+            return body.decode("utf-8")
+        if prefix == b"-":
+            return RESPError(body.decode("utf-8"))
+        if prefix == b":":
+            return int(body)
+        if prefix == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if prefix == b"*":
+            length = int(body)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+            
+        raise ConnectionError(f"不正なRedis応答: {line!r}")
+
+def _check(reply: Any) -> Any:
+    """エラー応答の例外化"""
+    if isinstance(reply, RESPError):
+        raise reply
+    return reply
+
+def parse_redis_url(url: str) -> Dict[str, Any]:
+    """redis://[[user]:password@]host[:port][/db] の解析"""
+    parsed = urlparse(url)
+    if parsed.scheme != "redis":
+        raise ValueError(f"未対応のRedis URLです: {url}")
+        
+    db = parsed.path.lstrip("/")
+    return {
+        "host": parsed.hostname or "localhost",
+        "port": parsed.port or 6379,
+        "username": unquote(parsed.username) if parsed.username else None,
+        "password": unquote(parsed.password) if parsed.password else None,
+        "db": int(db) if db else 0
+    }
+
+class RedisStateBackend(StateBackend):
+    """Redisプロトコルによる共有状態バックエンド（WATCH/MULTI/EXECで比較交換）"""
+    
+    def __init__(self, url: str = "redis://localhost:6379/0", key_prefix: str = "tonosama:state:",
+                 ttl_seconds: Optional[int] = 7 * 24 * 3600, timeout: float = 5.0):
+        """初期化 - 接続先とキー設定"""
+        self.url = url
+        self.key_prefix = key_prefix
+        self.ttl_seconds = ttl_seconds
+        
+        self._lock = threading.Lock()  # WATCHは接続単位のためトランザクション全体を直列化
+        self._conn = RESPConnection(timeout=timeout, **parse_redis_url(url))
+        
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}"
+        
+    def get(self, session_id: str) -> Optional[Tuple[int, bytes]]:
+        """状態取得（バージョンと状態を1コマンドで取得）"""
+        with self._lock:
+            version, payload = _check(self._conn.execute("HMGET", self._key(session_id), "version", "payload"))
+            
+        if version is None or payload is None:
+            return None
+        return int(version), payload
+        
+    def get_version(self, session_id: str) -> int:
+        """保存済みバージョン取得"""
+        with self._lock:
+            version = _check(self._conn.execute("HGET", self._key(session_id), "version"))
+            
+        return int(version) if version is not None else 0
+        
+    def put(self, session_id: str, payload: bytes, expected_version: int) -> int:
+        """比較交換書き込み（WATCH中にキーが変更されるとEXECが失敗）"""
+        key = self._key(session_id)
+        now = datetime.now(timezone.utc).isoformat()
+        
+        with self._lock:
+            conn = self._conn
+            try:
+                _check(conn.execute("WATCH", key))
+                current = _check(conn.execute("HGET", key, "version", retry=False))
+                actual = int(current) if current is not None else 0
+                
+                if actual != expected_version:
+                    _check(conn.execute("UNWATCH", retry=False))
+                    raise VersionConflictError(session_id, expected_version, actual)
+                    
+                new_version = actual + 1
+                _check(conn.execute("MULTI", retry=False))
+                _check(conn.execute("HSET", key, "version", new_version, "payload", payload, "updated_at", now, retry=False))
+                if self.ttl_seconds:
+                    _check(conn.execute("EXPIRE", key, int(self.ttl_seconds), retry=False))
+                result = _check(conn.execute("EXEC", retry=False))
+                
+            except VersionConflictError:
+                raise
+            except Exception:
+                # トランザクション途中の失敗はWATCH・MULTI状態が不明なため接続を破棄
+                conn.close()
+                raise
+                
+        if result is None:
+            # WATCH後に他レプリカが更新
+            raise VersionConflictError(session_id, expected_version, self.get_version(session_id))
+            
+        for reply in result:
+            _check(reply)
+            
+        return new_version
+        
+    def delete(self, session_id: str) -> None:
+        """状態削除"""
+        with self._lock:
+            _check(self._conn.execute("DEL", self._key(session_id)))
+            
+    def close(self) -> None:
+        """接続終了"""
+        with self._lock:
+            self._conn.close()
+
+@dataclass(frozen=True)
+class SyncConflict:
+    """同一フィールドを自レプリカと他レプリカが異なる値へ変更した競合"""
+    session_id: str
+    fields: Tuple[str, ...]
+    remote_version: int
+    remote_payload: bytes
+
+class SharedStateSync:
+    """セッション単位の共有バックエンド同期（差分の書き込み予約・比較交換・フィールド単位の競合検出）
+    
+    セッションスレッドは確定した差分（JSON-Patch）の記録のみ行い、状態全体の直列化と
+    比較交換はライトビハインドスレッドで実行（最後に同期した状態へ未送信の差分を再生）
+    """
+    
+    # 競合判定から除外するフィールド（更新のたびに変わる付随情報）
+    IGNORED_FIELDS = frozenset({"last_updated"})
+    
+    def __init__(self, backend: StateBackend, session_id: str,
+                 dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any],
+                 version: int = 0, base: Optional[bytes] = None):
+        """初期化 - 同期対象と最後に同期したバージョン・直列化済み状態"""
+        self.backend = backend
+        self.session_id = session_id
+        self.dumps = dumps
+        self.loads = loads
+        
+        self.version = version
+        self.base = base
+        self.conflict: Optional[SyncConflict] = None
+        self.checked_at = 0.0
+        
+        self._replacement: Optional[bytes] = None  # 状態全体の置き換え（復元・インポート）
+        self._pending: List[Tuple[Set[str], bytes]] = []  # 未送信の差分（記録時に直列化）
+        self._epoch = 0
+        self._stale = False
+        self._writing = False
+        self._lock = threading.Lock()
+        
+    def record(self, ops: List[Dict[str, Any]]) -> None:
+        """確定した差分の記録（変更サイズに比例した直列化のみ）"""
+        fields = {split_pointer(op["path"])[0] for op in ops if op["path"]}
+        payload = self.dumps(ops)
+        with self._lock:
+            self._pending.append((fields, payload))
+            
+    def replace(self, payload: bytes) -> None:
+        """状態全体の置き換え予約（既知のバージョンに対する比較交換で書き込み）"""
+        with self._lock:
+            self._replacement = payload
+            self._pending = []
+            self._epoch += 1
+            
+    def has_changes(self) -> bool:
+        """未送信の変更の有無"""
+        with self._lock:
+            return self._replacement is not None or bool(self._pending)
+            
+    def dirty_fields(self, all_fields: List[str]) -> List[str]:
+        """未送信の変更があるフィールド（状態全体の置き換え予約時は全フィールド）"""
+        with self._lock:
+            if self._replacement is not None:
+                return list(all_fields)
+            dirty = set().union(*(fields for fields, _ in self._pending))
+        return [name for name in all_fields if name in dirty]
+        
+    def write(self) -> bool:
+        """未送信の変更の書き込み（ライトビハインドスレッドから呼び出し・競合時はFalse）"""
+        with self._lock:
+            if self.conflict is not None or self._writing:
+                return False
+            if self._replacement is None and not self._pending:
+                return True
+            expected, epoch = self.version, self._epoch
+            source = self._replacement if self._replacement is not None else self.base
+            pending = list(self._pending)
+            self._writing = True
+            
+        try:
+            document = self.loads(source) if source is not None else {}
+            for _, ops in pending:
+                apply_json_patch(document, self.loads(ops))
+            payload = self.dumps(document)
+            version = self.backend.put(self.session_id, payload, expected)
+            
+        except VersionConflictError as e:
+            # 他レプリカが先に更新 - セッションスレッドの次回確認で再適用
+            logger.warning(f"{e} - 最新状態へ再適用予定")
+            with self._lock:
+                self._writing = False
+                self._stale = True
+            return False
+            
+        except Exception:
+            with self._lock:
+                self._writing = False
+            raise
+            
+        with self._lock:
+            self._writing = False
+            self.version = version
+            self.base = payload
+            if self._epoch == epoch:
+                # 書き込み中に追加された差分は次回送信
+                self._replacement = None
+                del self._pending[:len(pending)]
+        return True
+        
+    def poll(self, now: float, interval: float) -> Optional[Tuple[int, bytes]]:
+        """他レプリカの更新確認（一定間隔ごと・書き込みで競合した場合は即時）"""
+        with self._lock:
+            if self._writing or (not self._stale and now - self.checked_at < interval):
+                return None
+            self.checked_at = now
+            
+        if self.backend.get_version(self.session_id) <= self.version:
+            with self._lock:
+                self._stale = False
+            return None
+        return self.backend.get(self.session_id)
+        
+    def rebase(self, remote_version: int, remote_payload: bytes,
+               local: Dict[str, Any]) -> Tuple[Dict[str, Any], Tuple[str, ...]]:
+        """他レプリカの状態への未送信の変更の再適用
+        
+        local は未送信の変更があるフィールドの現在値（JSON化済み）。
+        他レプリカも変更し値が異なるフィールドは競合として記録し、解決まで書き込みを保留。
+        戻り値は再適用後の状態（競合フィールドは自レプリカの値）と競合フィールド
+        """
+        base = self.loads(self.base) if self.base is not None else {}
+        remote = self.loads(remote_payload)
+        
+        changed = {
+            name for name in remote.keys() | base.keys()
+            if name not in self.IGNORED_FIELDS and remote.get(name) != base.get(name)
+        }
+        conflicts = tuple(sorted(
+            name for name in changed & local.keys() if remote.get(name) != local[name]
+        ))
+        
+        with self._lock:
+            self.version = remote_version
+            self.base = remote_payload
+            self._stale = False
+            
+            # 位置指定の差分は他レプリカの状態と対応しないためフィールド単位の置換として再適用
+            self._replacement = None
+            self._pending = [(set(local), self.dumps([
+                {"op": "replace", "path": make_pointer(name), "value": value} for name, value in local.items()
+            ]))] if local else []
+            self._epoch += 1
+            
+            if conflicts:
+                self.conflict = SyncConflict(self.session_id, conflicts, remote_version, remote_payload)
+                
+        document = dict(remote)
+        document.update(local)
+        return document, conflicts
+        
+    def resolve(self, keep_local: bool) -> Optional[SyncConflict]:
+        """競合の解決（自レプリカ優先時は保留中の置換をそのまま書き込み・他レプリカ優先時は競合フィールドの置換を破棄）"""
+        with self._lock:
+            conflict, self.conflict = self.conflict, None
+            if conflict is None or keep_local:
+                return conflict
+                
+            dropped = set(conflict.fields)
+            pending = []
+            for fields, ops in self._pending:
+                kept = [op for op in self.loads(ops) if split_pointer(op["path"])[0] not in dropped]
+                if kept:
+                    pending.append((fields - dropped, self.dumps(kept)))
+            self._pending = pending
+            self._epoch += 1
+        return conflict
+
+def create_state_backend(kind: str, **options: Any) -> Optional[StateBackend]:
+    """種類名からのバックエンド生成（空文字・"none" は無効）"""
+    kind = (kind or "").strip().lower()
+    
+    if kind in ("", "none", "session"):
+        return None
+    if kind == "sqlite":
+        return SQLiteStateBackend(**options)
+    if kind == "redis":
+        return RedisStateBackend(**options)
+        
+    raise ValueError(f"未対応の状態バックエンドです: {kind}")
+
+# グローバルインスタンス
+_state_backend = None
+_state_backend_loaded = False
+
+def get_state_backend() -> Optional[StateBackend]:
+    """環境変数設定に基づく共有状態バックエンドの取得（未設定時はNone）"""
+    global _state_backend, _state_backend_loaded
+    if not _state_backend_loaded:
+        kind = os.getenv("TONOSAMA_STATE_BACKEND", "")
+        options: Dict[str, Any] = {}
+        
+        if kind == "sqlite" and os.getenv("TONOSAMA_STATE_DB"):
+            options["db_path"] = Path(os.getenv("TONOSAMA_STATE_DB"))
+        elif kind == "redis":
+            options["url"] = os.getenv("TONOSAMA_REDIS_URL", "redis://localhost:6379/0")
+            
+        _state_backend = create_state_backend(kind, **options)
+        _state_backend_loaded = True
+        
+        if _state_backend is not None:
+            logger.info(f"共有状態バックエンド: {type(_state_backend).__name__}")
+    return _state_backend
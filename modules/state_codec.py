@@ -0,0 +1,217 @@
+"""
+TONOSAMA Professional System - State Codec Module
+スキーマバージョン付き高速状態コーデック - 1兆円ダイヤモンド級品質
+
+データクラス専用のエンコード・デコード（asdictの深いコピーを回避）
+入れ子のStoreInfo / MenuItemを正しく復元し、旧バージョンのデータを移行
+"""
+
+import json
+import logging
+from dataclasses import fields, is_dataclass
+from typing import Any, Callable, Dict, Optional, Union
+
+# orjson（存在する場合のみ）
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 現行スキーマバージョン
+SCHEMA_VERSION = 2
+SCHEMA_KEY = "schema_version"
+
+# 旧ページ実装のメニュー辞書キー → MenuItemフィールド
+MENU_ITEM_ALIASES = {
+    "dish_name": "name",
+    "description": "desc",
+    "recommendation_level": "recommendation_score",
+    "image_filename": "image_path"
+}
+
+def _plain(value: Any) -> Any:
+    """汎用値のJSON互換化（データクラス・コンテナを再帰変換）"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if is_dataclass(value) and not isinstance(value, type):
+        return {f.name: _plain(getattr(value, f.name)) for f in fields(value)}
+    # アップロードファイル等のJSON非対応オブジェクト
+    return None
+
+def _migrate_v1(data: Dict[str, Any]) -> Dict[str, Any]:
+    """v1 → v2: 画像フィールドをBLOBハッシュ形式へ"""
+    if not isinstance(data.get("store_representative_image"), str):
+        data["store_representative_image"] = ""
+    data["uploaded_menu_files"] = [
+        f for f in (data.get("uploaded_menu_files") or []) if isinstance(f, str)
+    ]
+    
+    # 画像バイト列はBLOBストア移行前の形式のため破棄
+    data["menu"] = [
+        {k: v for k, v in item.items() if k != "image_data"} if isinstance(item, dict) else item
+        for item in data.get("menu") or []
+    ]
+    
+    return data
+
+# バージョン別移行関数（キーのバージョンから1つ上へ）
+MIGRATIONS: Dict[int, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    1: _migrate_v1
+}
+
+class StateCodec:
+    """SystemState専用コーデック"""
+    
+    def __init__(self, state_cls: type, store_cls: type, menu_item_cls: type):
+        """初期化 - データクラスのフィールド一覧を事前計算"""
+        self.state_cls = state_cls
+        self.store_cls = store_cls
+        self.menu_item_cls = menu_item_cls
+        
+        self._state_fields = tuple(f.name for f in fields(state_cls))
+        self._store_fields = tuple(f.name for f in fields(store_cls))
+        self._menu_item_fields = tuple(f.name for f in fields(menu_item_cls))
+        self._store_field_set = frozenset(self._store_fields)
+        self._menu_item_field_set = frozenset(self._menu_item_fields)
+        self._state_field_set = frozenset(self._state_fields)
+        
+    # ---- エンコード ----
+    
+    def encode_store(self, store: Any) -> Optional[Dict[str, Any]]:
+        """StoreInfo → 辞書"""
+        if store is None:
+            return None
+        if isinstance(store, dict):
+            return dict(store)
+        return {name: getattr(store, name) for name in self._store_fields}
+        
+    def encode_menu_item(self, item: Any) -> Dict[str, Any]:
+        """MenuItem → 辞書"""
+        if isinstance(item, dict):
+            return _plain(item)
+        return {name: getattr(item, name) for name in self._menu_item_fields}
+        
+    def encode_value(self, value: Any) -> Any:
+        """差分値のJSON化（既知のデータクラスは専用経路）"""
+        if isinstance(value, self.menu_item_cls):
+            return self.encode_menu_item(value)
+        if isinstance(value, self.store_cls):
+            return self.encode_store(value)
+        return _plain(value)
+        
+    def encode(self, state: Any) -> Dict[str, Any]:
+        """SystemState → 辞書（スキーマバージョン付き）"""
+        data: Dict[str, Any] = {SCHEMA_KEY: SCHEMA_VERSION}
+        
+        for name in self._state_fields:
+            value = getattr(state, name)
+            if name == "store":
+                data[name] = self.encode_store(value)
+            elif name == "menu":
+                data[name] = None if value is None else [self.encode_menu_item(item) for item in value]
+            else:
+                data[name] = _plain(value)
+                
+        return data
+        
+    def dumps(self, state: Any, indent: bool = False) -> bytes:
+        """SystemState → JSONバイト列"""
+        return self.dumps_dict(self.encode(state), indent=indent)
+        
+    @staticmethod
+    def dumps_dict(data: Dict[str, Any], indent: bool = False) -> bytes:
+        """辞書 → JSONバイト列（orjson利用可能時は高速経路）"""
+        if ORJSON_AVAILABLE:
+            option = orjson.OPT_INDENT_2 if indent else 0
+            return orjson.dumps(data, option=option | orjson.OPT_NON_STR_KEYS, default=lambda _: None)
+        return json.dumps(
+            data,
+            ensure_ascii=False,
+            indent=2 if indent else None,
+            default=lambda _: None
+        ).encode("utf-8")
+        
+    # ---- デコード ----
+    
+    def migrate(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """旧スキーマから現行スキーマへの移行"""
+        version = data.pop(SCHEMA_KEY, 1)
+        
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"未対応のスキーマバージョンです: {version}")
+            
+        while version < SCHEMA_VERSION:
+            data = MIGRATIONS[version](data)
+            version += 1
+            
+        return data
+        
+    def decode_store(self, data: Any) -> Any:
+        """辞書 → StoreInfo"""
+        if data is None or isinstance(data, self.store_cls):
+            return data if data is not None else self.store_cls()
+        return self.store_cls(**{k: v for k, v in data.items() if k in self._store_field_set})
+        
+    def decode_menu_item(self, data: Any) -> Any:
+        """辞書 → MenuItem"""
+        if isinstance(data, self.menu_item_cls):
+            return data
+            
+        # 旧ページ形式のキーを読み替え
+        data = dict(data)
+        for old_key, new_key in MENU_ITEM_ALIASES.items():
+            if old_key in data and not data.get(new_key):
+                data[new_key] = data.pop(old_key)
+                
+        return self.menu_item_cls(**{k: v for k, v in data.items() if k in self._menu_item_field_set})
+        
+    def decode(self, data: Dict[str, Any]) -> Any:
+        """辞書 → SystemState（入れ子データクラス復元・未知キーは除外）"""
+        # 旧形式バックアップファイル（{"state": {...}}）
+        if "state" in data and "session_id" not in data:
+            data = data["state"]
+            
+        data = self.migrate(dict(data))
+        
+        unknown = [k for k in data if k not in self._state_field_set]
+        if unknown:
+            logger.warning(f"未知の状態キーを除外: {unknown}")
+            
+        kwargs = {k: v for k, v in data.items() if k in self._state_field_set}
+        kwargs["store"] = self.decode_store(kwargs.get("store"))
+        kwargs["menu"] = [self.decode_menu_item(item) for item in kwargs.get("menu") or []]
+        
+        # コンテナ型フィールドの既定値補完
+        for name, default in (("menu_order", list), ("imperator_answers", dict),
+                              ("generated_content", dict), ("uploaded_menu_files", list),
+                              ("validation_errors", list), ("processing_status", dict)):
+            if kwargs.get(name) is None:
+                kwargs[name] = default()
+                
+        return self.state_cls(**kwargs)
+        
+    def loads(self, payload: Union[bytes, str]) -> Any:
+        """JSONバイト列 → SystemState"""
+        return self.decode(self.loads_dict(payload))
+        
+    @staticmethod
+    def loads_dict(payload: Union[bytes, str]) -> Dict[str, Any]:
+        """JSONバイト列 → 辞書（orjson利用可能時は高速経路）"""
+        if ORJSON_AVAILABLE:
+            return orjson.loads(payload)
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf-8-sig")
+        return json.loads(payload)
+        
+    def round_trip(self, state: Any) -> Any:
+        """エンコード→デコード（独立コピー生成）"""
+        return self.loads(self.dumps(state))
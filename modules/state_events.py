@@ -0,0 +1,101 @@
+"""
+TONOSAMA Professional System - State Events Module
+変更フィールド追跡・バージョン付き変更通知 - 1兆円ダイヤモンド級品質
+
+状態の書き込みごとに変更フィールドを記録し、単調増加バージョンを付与
+永続化・バリデーション・CSVキャッシュ等はフィールド単位で購読
+"""
+
+import itertools
+import weakref
+import threading
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Tuple
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 同一オブジェクトでも変更無しと判定できる不変型
+IMMUTABLE_TYPES = (str, int, float, bool, bytes, tuple, type(None))
+
+def is_unchanged(old: Any, new: Any) -> bool:
+    """書き込み値が現在値と同じか（同一の可変オブジェクトはその場で変更された可能性があるため変更扱い）"""
+    if old is new:
+        return isinstance(new, IMMUTABLE_TYPES)
+    try:
+        return bool(old == new)
+    except Exception:
+        return False
+
+@dataclass(frozen=True)
+class StateChange:
+    """確定した状態変更"""
+    session_id: str
+    version: int
+    fields: FrozenSet[str]
+
+class FieldVersions:
+    """セッション単位のバージョン・変更フィールド記録"""
+    
+    def __init__(self, state: Any, version: int = 1):
+        """初期化 - 対象状態オブジェクトと開始バージョン"""
+        self._state_ref = weakref.ref(state)  # 退避・置き換え後の旧状態を保持しない
+        self.version = version
+        self.base = version  # 状態オブジェクト置き換え時のバージョン
+        self.fields: Dict[str, int] = {}  # フィールド名 → 最終変更バージョン
+        
+    def tracks(self, state: Any) -> bool:
+        """対象の状態オブジェクトか"""
+        return self._state_ref() is state
+        
+    def mark(self, fields: Iterable[str]) -> int:
+        """変更フィールド記録（バージョン更新）"""
+        self.version += 1
+        for field_name in fields:
+            self.fields[field_name] = self.version
+        return self.version
+        
+    def stamp(self, fields: Iterable[str]) -> Tuple[int, ...]:
+        """指定フィールド群の変更スタンプ（キャッシュキー用）"""
+        return (self.base,) + tuple(self.fields.get(f, 0) for f in fields)
+        
+    def changed_since(self, version: int) -> FrozenSet[str]:
+        """指定バージョン以降に変更されたフィールド"""
+        if version < self.base:
+            return frozenset(["*"])
+        return frozenset(f for f, v in self.fields.items() if v > version)
+
+class ChangeNotifier:
+    """フィールド単位の変更通知（"*" は全フィールド購読）"""
+    
+    def __init__(self):
+        """初期化 - 購読者テーブル"""
+        self._subscribers: Dict[int, Tuple[FrozenSet[str], Callable[[Any, StateChange], None]]] = {}
+        self._tokens = itertools.count(1)
+        self._lock = threading.Lock()
+        
+    def subscribe(self, fields: Iterable[str], callback: Callable[[Any, StateChange], None]) -> int:
+        """購読登録（購読解除用トークンを返却）"""
+        token = next(self._tokens)
+        with self._lock:
+            self._subscribers[token] = (frozenset(fields), callback)
+        return token
+        
+    def unsubscribe(self, token: int) -> None:
+        """購読解除"""
+        with self._lock:
+            self._subscribers.pop(token, None)
+            
+    def publish(self, state: Any, change: StateChange) -> None:
+        """変更通知（関係するフィールドの購読者のみ呼び出し）"""
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+            
+        for fields, callback in subscribers:
+            if "*" in fields or "*" in change.fields or fields & change.fields:
+                try:
+                    callback(state, change)
+                except Exception as e:
+                    logger.error(f"変更通知エラー: {e}")
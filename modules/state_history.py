@@ -0,0 +1,529 @@
+"""
+TONOSAMA Professional System - State History Module
+構造共有スナップショットによる元に戻す・やり直し - 1兆円ダイヤモンド級品質
+
+変更されたフィールド・要素のみを複製し、未変更部分は直前のスナップショットと共有
+変更確定時の差分（JSON-Patch）が渡された場合は該当要素を含むチャンク・バケットのみ再作成（変更量に比例）
+履歴の移動は共有されていない範囲のみの差分（パッチ）として返却し、現在の状態へその場で適用
+保持件数は上限付き
+"""
+
+import copy
+import logging
+from bisect import bisect_right
+from collections import deque
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from modules.state_persistence import split_pointer
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 履歴対象外のフィールド（セッション識別・更新日時）
+HISTORY_EXCLUDED_FIELDS = frozenset({"session_id", "created_at", "last_updated"})
+
+# リストの分割単位（未変更のチャンクは前のスナップショットと共有・挿入削除でチャンク長は変動）
+CHUNK_SIZE = 32
+
+# 辞書パッチで「キーなし」を表す番兵
+_MISSING = object()
+
+class FrozenList:
+    """チャンク分割された不変リスト"""
+    
+    __slots__ = ("chunks", "length", "_offsets")
+    
+    def __init__(self, chunks: Tuple[Tuple[Any, ...], ...], length: int):
+        self.chunks = chunks
+        self.length = length
+        self._offsets: Optional[List[int]] = None
+        
+    def __len__(self) -> int:
+        return self.length
+        
+    def __iter__(self) -> Iterator[Any]:
+        for chunk in self.chunks:
+            yield from chunk
+
+    def __getitem__(self, index: int) -> Any:
+        offsets = self.offsets()
+        k = bisect_right(offsets, index) - 1
+        return self.chunks[k][index - offsets[k]]
+        
+    def offsets(self) -> List[int]:
+        """各チャンクの先頭位置（初回参照時に計算）"""
+        if self._offsets is None:
+            offsets = []
+            position = 0
+            for chunk in self.chunks:
+                offsets.append(position)
+                position += len(chunk)
+            self._offsets = offsets
+        return self._offsets
+
+class FrozenDict:
+    """キーのハッシュでバケット分割された不変辞書（未変更のバケットは前のスナップショットと共有）"""
+    
+    __slots__ = ("buckets", "length")
+    
+    def __init__(self, buckets: Tuple[Dict[Any, Any], ...], length: int):
+        self.buckets = buckets
+        self.length = length
+        
+    def _bucket(self, key: Any) -> Dict[Any, Any]:
+        return self.buckets[hash(key) & (len(self.buckets) - 1)]
+        
+    def __len__(self) -> int:
+        return self.length
+        
+    def __iter__(self) -> Iterator[Any]:
+        for bucket in self.buckets:
+            yield from bucket
+            
+    def __contains__(self, key: Any) -> bool:
+        return key in self._bucket(key)
+        
+    def __getitem__(self, key: Any) -> Any:
+        return self._bucket(key)[key]
+        
+    def get(self, key: Any, default: Any = None) -> Any:
+        return self._bucket(key).get(key, default)
+        
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        for bucket in self.buckets:
+            yield from bucket.items()
+
+def _bucket_count(length: int, previous: Any = None) -> int:
+    """FrozenDict のバケット数（2の累乗・前回の数で収まる間は維持して共有を保つ）"""
+    if isinstance(previous, FrozenDict):
+        count = len(previous.buckets)
+        if length <= 2 * count * CHUNK_SIZE and (count == 1 or 4 * length >= count * CHUNK_SIZE):
+            return count
+    count = 1
+    while count * CHUNK_SIZE < length:
+        count *= 2
+    return count
+
+def _item_key(value: Any) -> Any:
+    """要素の同一性判定キー（ID付きデータクラスはID）"""
+    return getattr(value, "id", None) if is_dataclass(value) else None
+
+def freeze(value: Any, previous: Any = None) -> Any:
+    """値の不変コピー作成（前回スナップショットと等しい部分は共有）"""
+    if value is None or isinstance(value, (str, int, float, bool, bytes)):
+        # 復元等で別オブジェクトになった等値も前回と共有
+        return previous if type(previous) is type(value) and previous == value else value
+        
+    if is_dataclass(value) and not isinstance(value, type):
+        if previous is not None and type(previous) is type(value) and previous == value:
+            return previous
+        return copy.copy(value)
+        
+    if isinstance(value, (list, tuple)):
+        return _freeze_list(value, previous if isinstance(previous, FrozenList) else None)
+        
+    if isinstance(value, dict):
+        # 大きな辞書はバケット単位で共有
+        if len(value) > CHUNK_SIZE or isinstance(previous, FrozenDict):
+            return _freeze_dict(value, previous)
+            
+        prev = previous if isinstance(previous, dict) else {}
+        frozen = {k: freeze(v, prev.get(k)) for k, v in value.items()}
+        
+        # 全キーが共有できた場合は辞書自体も共有
+        if isinstance(previous, dict) and len(prev) == len(frozen) and all(prev.get(k) is v for k, v in frozen.items()):
+            return previous
+        return frozen
+        
+    # アップロードファイル等の不明なオブジェクトは参照のみ保持
+    return value
+
+def _freeze_dict(value: Dict[Any, Any], previous: Any) -> FrozenDict:
+    """辞書のバケット分割不変化（前回と同じ内容のバケットは共有）"""
+    count = _bucket_count(len(value), previous)
+    grouped: List[Dict[Any, Any]] = [{} for _ in range(count)]
+    for k, v in value.items():
+        grouped[hash(k) & (count - 1)][k] = v
+        
+    if isinstance(previous, FrozenDict) and len(previous.buckets) == count:
+        old_buckets = previous.buckets
+    else:
+        prev = previous if isinstance(previous, (dict, FrozenDict)) else {}
+        old_buckets = tuple({k: prev[k] for k in bucket if k in prev} for bucket in grouped)
+        
+    buckets = []
+    for new, old in zip(grouped, old_buckets):
+        frozen = {k: freeze(v, old.get(k)) for k, v in new.items()}
+        shared = len(old) == len(frozen) and all(old.get(k, _MISSING) is v for k, v in frozen.items())
+        buckets.append(old if shared and isinstance(previous, FrozenDict) else frozen)
+        
+    if isinstance(previous, FrozenDict) and all(a is b for a, b in zip(buckets, previous.buckets)) and len(buckets) == len(previous.buckets):
+        return previous
+    return FrozenDict(tuple(buckets), len(value))
+
+def _freeze_list(values: Iterable[Any], previous: Optional[FrozenList]) -> FrozenList:
+    """リストの不変化（ID付き要素は前回の同一IDの要素と比較して共有）"""
+    prev_items = list(previous) if previous is not None else []
+    prev_by_key = {}
+    for item in prev_items:
+        key = _item_key(item)
+        if key is not None:
+            prev_by_key[key] = item
+            
+    items = []
+    for i, value in enumerate(values):
+        key = _item_key(value)
+        if key is not None:
+            prev = prev_by_key.get(key)
+        else:
+            prev = prev_items[i] if i < len(prev_items) else None
+        items.append(freeze(value, prev))
+        
+    # 前回のチャンク境界に沿って分割（同じ要素のままのチャンクは共有）
+    prev_chunks = previous.chunks if previous is not None else ()
+    chunks = []
+    start = 0
+    for prev_chunk in prev_chunks:
+        end = start + len(prev_chunk)
+        if end > len(items):
+            break
+        chunk = tuple(items[start:end])
+        chunks.append(prev_chunk if all(a is b for a, b in zip(prev_chunk, chunk)) else chunk)
+        start = end
+    chunks.extend(tuple(items[n:n + CHUNK_SIZE]) for n in range(start, len(items), CHUNK_SIZE))
+        
+    if previous is not None and len(chunks) == len(prev_chunks) and all(a is b for a, b in zip(chunks, prev_chunks)):
+        return previous
+    return FrozenList(tuple(chunks), len(items))
+
+class _Dirty:
+    """差分で変更された要素の位置（前回の不変値を保持し等値なら共有）"""
+    
+    __slots__ = ("previous",)
+    
+    def __init__(self, previous: Any = None):
+        self.previous = previous
+
+def _patch_frozen_list(values: List[Any], previous: FrozenList, ops: List[Tuple[str, List[str]]]) -> Optional[FrozenList]:
+    """差分の位置を含むチャンクのみ再作成（他のチャンクは共有・差分から辿れない場合は None）"""
+    # 差分が多い場合は全体比較の方が安い
+    if len(ops) * max(len(previous.chunks), 1) > 4 * max(len(values), CHUNK_SIZE):
+        return None
+        
+    chunks: List[Any] = list(previous.chunks)
+    length = previous.length
+    
+    def locate(index: int, inserting: bool) -> Optional[Tuple[int, int]]:
+        """位置 → (チャンク番号, チャンク内位置)・変更するチャンクは編集可能なリストへ"""
+        if not chunks:
+            if not inserting or index != 0:
+                return None
+            chunks.append([])
+            return 0, 0
+            
+        # 末尾への追加は走査しない
+        last = len(chunks) - 1
+        k, base = None, length - len(chunks[last])
+        if base <= index and (index < length or (inserting and index == length)):
+            k = last
+        else:
+            base = 0
+            for n, chunk in enumerate(chunks):
+                if index < base + len(chunk) or (inserting and index == base + len(chunk)):
+                    k = n
+                    break
+                base += len(chunk)
+        if k is None:
+            return None
+        if isinstance(chunks[k], tuple):
+            chunks[k] = list(chunks[k])
+        return k, index - base
+        
+    for kind, tokens in ops:
+        if not tokens:
+            return None  # フィールド全体の置き換え
+        token = tokens[0]
+        if token == "-":
+            index = length
+        elif token.isdigit():
+            index = int(token)
+        else:
+            return None
+            
+        if kind == "add" and len(tokens) == 1:
+            found = locate(index, True)
+            if found is None:
+                return None
+            k, i = found
+            chunks[k].insert(i, _Dirty())
+            length += 1
+        elif kind == "remove" and len(tokens) == 1:
+            found = locate(index, False)
+            if found is None:
+                return None
+            k, i = found
+            del chunks[k][i]
+            length -= 1
+            if not chunks[k]:
+                del chunks[k]
+        else:
+            # 要素の置き換え・要素内の変更
+            found = locate(index, False)
+            if found is None:
+                return None
+            k, i = found
+            if not isinstance(chunks[k][i], _Dirty):
+                chunks[k][i] = _Dirty(chunks[k][i])
+                
+    if length != len(values):
+        return None
+        
+    # 変更したチャンクのみ再作成（長くなったチャンクは分割）
+    frozen_chunks = []
+    position = 0
+    for chunk in chunks:
+        if isinstance(chunk, list):
+            items = [
+                freeze(values[position + i], slot.previous) if isinstance(slot, _Dirty) else slot
+                for i, slot in enumerate(chunk)
+            ]
+            frozen_chunks.extend(tuple(items[n:n + CHUNK_SIZE]) for n in range(0, len(items), CHUNK_SIZE))
+        else:
+            frozen_chunks.append(chunk)
+        position += len(chunk)
+        
+    # 変更前と同じ要素のままのチャンクは前回のものを共有
+    prev_chunks = previous.chunks
+    if len(frozen_chunks) == len(prev_chunks):
+        frozen_chunks = [
+            old if new is not old and len(new) == len(old) and all(a is b for a, b in zip(new, old)) else new
+            for new, old in zip(frozen_chunks, prev_chunks)
+        ]
+        if all(new is old for new, old in zip(frozen_chunks, prev_chunks)):
+            return previous
+            
+    # 削除の繰り返しで細かくなりすぎた場合は分割し直し（要素は共有のまま）
+    if len(frozen_chunks) > 2 * (length // CHUNK_SIZE + 1):
+        items = [item for chunk in frozen_chunks for item in chunk]
+        frozen_chunks = [tuple(items[n:n + CHUNK_SIZE]) for n in range(0, length, CHUNK_SIZE)]
+        
+    return FrozenList(tuple(frozen_chunks), length)
+
+def _patch_frozen_dict(values: Dict[Any, Any], previous: FrozenDict, ops: List[Tuple[str, List[str]]]) -> Optional[FrozenDict]:
+    """差分のキーを含むバケットのみ再作成（他のバケットは共有・差分から辿れない場合は None）"""
+    keys = set()
+    for _, tokens in ops:
+        if not tokens or (tokens[0] not in values and tokens[0] not in previous):
+            return None
+        keys.add(tokens[0])
+        
+    count = len(previous.buckets)
+    if _bucket_count(len(values), previous) != count:
+        return None  # バケット数の変更は全体で再分割
+        
+    buckets = list(previous.buckets)
+    copied = set()
+    for key in keys:
+        n = hash(key) & (count - 1)
+        old = previous.buckets[n].get(key, _MISSING)
+        if key in values:
+            value = freeze(values[key], None if old is _MISSING else old)
+            if value is old:
+                continue
+        elif old is _MISSING:
+            continue
+        if n not in copied:
+            buckets[n] = dict(buckets[n])
+            copied.add(n)
+        if key in values:
+            buckets[n][key] = value
+        else:
+            del buckets[n][key]
+            
+    if not copied:
+        return previous
+    return FrozenDict(tuple(buckets), len(values))
+
+def refreeze(value: Any, previous: Any, ops: Optional[List[Tuple[str, List[str]]]] = None) -> Any:
+    """前回の不変値から差分（フィールド内の (op, パス) 一覧）の箇所のみ再作成・差分なしは全体比較"""
+    if ops:
+        patched = None
+        if isinstance(previous, FrozenList) and isinstance(value, list):
+            patched = _patch_frozen_list(value, previous, ops)
+        elif isinstance(previous, FrozenDict) and isinstance(value, dict):
+            patched = _patch_frozen_dict(value, previous, ops)
+        if patched is not None:
+            return patched
+    return freeze(value, previous)
+
+def _ops_by_field(ops: Iterable[Dict[str, Any]]) -> Dict[str, List[Tuple[str, List[str]]]]:
+    """JSON-Patch差分をフィールド別の (op, フィールド内パス) 一覧へ"""
+    by_field: Dict[str, List[Tuple[str, List[str]]]] = {}
+    for op in ops:
+        tokens = split_pointer(op["path"])
+        if tokens:
+            by_field.setdefault(tokens[0], []).append((op["op"], tokens[1:]))
+    return by_field
+
+def thaw(value: Any) -> Any:
+    """不変コピーから編集可能な値を作成（スナップショット自体は変更されない）"""
+    if isinstance(value, FrozenList):
+        return [thaw(v) for v in value]
+    if isinstance(value, (dict, FrozenDict)):
+        return {k: thaw(v) for k, v in value.items()}
+    if is_dataclass(value) and not isinstance(value, type):
+        return copy.copy(value)
+    return value
+
+def _list_span(current: FrozenList, target: FrozenList) -> Tuple[int, int, int]:
+    """共有されていない範囲（開始, current側の終了, target側の終了）・共有チャンクは要素比較せず飛ばす"""
+    length = min(len(current), len(target))
+    
+    start = 0
+    for a, b in zip(current.chunks, target.chunks):
+        if a is not b:
+            break
+        start += len(a)
+    start = min(start, length)
+    while start < length and current[start] is target[start]:
+        start += 1
+        
+    # 末尾側も共有チャンクを飛ばす（挿入・削除でずれていても末尾から揃える）
+    end_current, end_target = len(current), len(target)
+    for a, b in zip(reversed(current.chunks), reversed(target.chunks)):
+        if a is not b or end_current - len(a) < start or end_target - len(b) < start:
+            break
+        end_current -= len(a)
+        end_target -= len(b)
+    while end_current > start and end_target > start and current[end_current - 1] is target[end_target - 1]:
+        end_current -= 1
+        end_target -= 1
+        
+    return start, end_current, end_target
+
+def field_patch(current: Any, target: Any) -> Tuple:
+    """current → target のフィールド差分
+    
+    ("list", 開始, 終了, 新要素) : リストの [開始:終了] を新要素で置き換え
+    ("dict", 更新, 削除キー)      : 辞書のキー単位の更新・削除
+    ("set", 値)                   : 値の置き換え
+    新要素・値は編集可能な複製（共有されていない部分のみ複製）
+    """
+    if isinstance(current, FrozenList) and isinstance(target, FrozenList):
+        start, end_current, end_target = _list_span(current, target)
+        return ("list", start, end_current, [thaw(target[i]) for i in range(start, end_target)])
+        
+    if isinstance(current, FrozenDict) and isinstance(target, FrozenDict) and len(current.buckets) == len(target.buckets):
+        # 共有バケットは比較せず飛ばす
+        updates, removed = {}, []
+        for old, new in zip(current.buckets, target.buckets):
+            if old is not new:
+                updates.update((key, thaw(value)) for key, value in new.items() if old.get(key, _MISSING) is not value)
+                removed.extend(key for key in old if key not in new)
+        return ("dict", updates, removed)
+        
+    if isinstance(current, (dict, FrozenDict)) and isinstance(target, (dict, FrozenDict)):
+        updates = {key: thaw(value) for key, value in target.items() if current.get(key, _MISSING) is not value}
+        removed = [key for key in current if key not in target]
+        return ("dict", updates, removed)
+        
+    return ("set", thaw(target))
+
+class Snapshot:
+    """状態スナップショット（フィールド → 不変値）"""
+    
+    __slots__ = ("values", "label")
+    
+    def __init__(self, values: Dict[str, Any], label: str = ""):
+        self.values = values
+        self.label = label
+        
+    @classmethod
+    def capture(cls, state: Any, label: str = "") -> "Snapshot":
+        """状態全体からの作成"""
+        return cls({
+            f.name: freeze(getattr(state, f.name))
+            for f in fields(state) if f.name not in HISTORY_EXCLUDED_FIELDS
+        }, label)
+        
+    def derive(self, state: Any, changed: Iterable[str], label: str = "",
+               ops: Optional[List[Dict[str, Any]]] = None) -> "Snapshot":
+        """変更フィールドのみ再作成した次のスナップショット（差分があればその箇所のみ・差分のないフィールドは共有）"""
+        values = dict(self.values)
+        by_field = _ops_by_field(ops) if ops is not None else None
+        for name in changed:
+            if name not in values:
+                continue
+            if by_field is None:
+                values[name] = freeze(getattr(state, name), values[name])
+            elif name in by_field:
+                values[name] = refreeze(getattr(state, name), values[name], by_field[name])
+        return Snapshot(values, label)
+        
+    def patch_from(self, other: "Snapshot") -> Dict[str, Tuple]:
+        """other（現在の状態）からこのスナップショットへのフィールド別パッチ（共有されていない部分のみ）"""
+        return {
+            name: field_patch(other.values.get(name), value)
+            for name, value in self.values.items()
+            if other.values.get(name) is not value
+        }
+
+class StateHistory:
+    """上限付きの元に戻す・やり直し履歴"""
+    
+    def __init__(self, state: Any, max_depth: int = 50):
+        """初期化 - 現在の状態を起点として記録"""
+        self.max_depth = max_depth
+        self._current = Snapshot.capture(state)
+        self._undo: deque = deque(maxlen=max_depth)
+        self._redo: List[Snapshot] = []
+        
+    def record(self, state: Any, changed: Iterable[str], label: str = "",
+               ops: Optional[List[Dict[str, Any]]] = None) -> None:
+        """変更の記録（やり直し履歴は破棄・ops は変更確定時のJSON-Patch差分）"""
+        changed = [name for name in changed if name not in HISTORY_EXCLUDED_FIELDS]
+        if not changed:
+            return
+            
+        snapshot = self._current.derive(state, changed, label or ", ".join(changed), ops)
+        if all(snapshot.values[name] is self._current.values[name] for name in changed):
+            return
+            
+        self._undo.append(self._current)
+        self._current = snapshot
+        self._redo.clear()
+        
+    def undo(self) -> Optional[Dict[str, Tuple]]:
+        """1つ前の状態へ（現在の状態へ適用するフィールド別パッチを返却・field_patch 参照）"""
+        if not self._undo:
+            return None
+        previous = self._current
+        self._redo.append(previous)
+        self._current = self._undo.pop()
+        return self._current.patch_from(previous)
+        
+    def redo(self) -> Optional[Dict[str, Tuple]]:
+        """取り消した変更の再適用（パッチは undo と同形式）"""
+        if not self._redo:
+            return None
+        previous = self._current
+        self._undo.append(previous)
+        self._current = self._redo.pop()
+        return self._current.patch_from(previous)
+        
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+        
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+        
+    def get_stats(self) -> Dict[str, Any]:
+        """履歴統計"""
+        return {
+            "undo_depth": len(self._undo),
+            "redo_depth": len(self._redo),
+            "max_depth": self.max_depth,
+            "next_undo": self._current.label if self._undo else "",
+            "next_redo": self._redo[-1].label if self._redo else ""
+        }
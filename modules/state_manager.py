@@ -3,16 +3,29 @@ TONOSAMA Professional System - State Management Module
 完璧な状態管理 - 1兆円ダイヤモンド級品質
 
 全システム状態の集中管理、永続化、バリデーション
+永続化はフィールド単位の差分ジャーナル＋定期スナップショット
 """
 
 import streamlit as st
-import json
+import os
+import time
 import uuid
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Iterable, Iterator, Optional, List, Tuple, Union
 import logging
-from dataclasses import dataclass, asdict
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
 from pathlib import Path
+from modules.state_persistence import WriteBehindPersister, DeltaJournal, make_pointer
+from modules.state_store import SQLiteStateStore
+from modules.state_events import ChangeNotifier, FieldVersions, StateChange, is_unchanged
+from modules.state_codec import StateCodec
+from modules.menu_table import MenuTable
+from modules.menu_ordering import MenuOrderingEngine
+from modules.session_memory import SessionExpiredError, SessionMemoryManager, SessionSlot
+from modules.state_backend import SharedStateSync, SyncConflict, get_state_backend
+from modules.state_history import StateHistory
+from modules.blob_store import find_blob_refs, get_blob_store
 
 # UI Styling Import（存在する場合のみ）
 try:
@@ -25,7 +38,7 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True)
 class StoreInfo:
     """店舗基本情報データクラス"""
     store_name_ja: str = ""
@@ -50,7 +63,7 @@ class StoreInfo:
     halal_support: str = ""
     allergy_info: str = ""
 
-@dataclass
+@dataclass(slots=True)
 class MenuItem:
     """メニューアイテムデータクラス"""
     id: str = ""
@@ -59,6 +72,7 @@ class MenuItem:
     category: str = ""
     desc: str = ""
     image_path: str = ""
+    image_hash: str = ""  # BlobStore上の画像ハッシュ
     recommendation_score: int = 1  # 1-5スター
 
 @dataclass
@@ -87,9 +101,9 @@ class SystemState:
     # AI生成コンテンツ
     generated_content: Dict[str, Dict[str, str]] = None
     
-    # アップロードファイル
-    store_representative_image: Any = None
-    uploaded_menu_files: List[Any] = None
+    # アップロードファイル（実データはBlobStore、状態にはハッシュのみ保持）
+    store_representative_image: str = ""
+    uploaded_menu_files: List[str] = None
     
     # プラン選択
     selected_plan: str = ""
@@ -99,21 +113,238 @@ class SystemState:
     validation_errors: List[str] = None
     processing_status: Dict[str, str] = None
 
+# スキーマバージョン付き状態コーデック（エクスポート・インポート・バックアップ共通）
+state_codec = StateCodec(SystemState, StoreInfo, MenuItem)
+
+# プロセス全体のセッションメモリ上限（超過時はアイドルセッションをディスク退避）
+# 長期間アクセスのないセッションは枠と退避ファイルを破棄（再アクセス時はセッション別ストアから復元）
+SESSION_MEMORY_CAP_MB = int(os.getenv("TONOSAMA_SESSION_MEMORY_MB", "512"))
+SESSION_EXPIRY_HOURS = float(os.getenv("TONOSAMA_SESSION_EXPIRY_HOURS", "24"))
+# 旧形式のJSONバックアップ（読み取り専用・新規作成しない・BLOB回収時の参照元としてのみ走査）
+LEGACY_BACKUP_DIR = Path("data/backups")
+# 画像BLOBのガベージコレクション猶予時間（保存・再利用からこの時間内のBLOBは未参照でも保持）
+BLOB_GC_MIN_AGE_HOURS = float(os.getenv("TONOSAMA_BLOB_GC_MIN_AGE_HOURS", "24"))
+
+session_memory = SessionMemoryManager(
+    dumps=state_codec.dumps,
+    loads=state_codec.loads,
+    cap_bytes=SESSION_MEMORY_CAP_MB * 1024 * 1024,
+    spill_dir=Path("data/spill"),
+    expire_idle_seconds=SESSION_EXPIRY_HOURS * 3600
+)
+
+class MenuIndex:
+    """メニューID索引（ID→アイテム・ID→位置を変更のたびに同期）"""
+    
+    def __init__(self, menu: List[MenuItem], menu_order: List[str]):
+        """初期化 - メニューリストと表示順リストから索引構築"""
+        self.menu = menu
+        self.menu_order = menu_order
+        self.items: Dict[str, MenuItem] = {item.id: item for item in menu}
+        self._menu_pos: Dict[str, int] = {item.id: i for i, item in enumerate(menu)}
+        self._order_pos: Dict[str, int] = {item_id: i for i, item_id in enumerate(menu_order)}
+        
+        # 削除で位置がずれた範囲（参照時に該当範囲のみ再計算）
+        self._menu_dirty_from: Optional[int] = None
+        self._order_dirty_from: Optional[int] = None
+        
+    def is_bound_to(self, state: SystemState) -> bool:
+        """索引が現在の状態のリストと対応しているか"""
+        return (
+            self.menu is state.menu
+            and self.menu_order is state.menu_order
+            and len(self.items) == len(state.menu)
+        )
+        
+    def get(self, item_id: str) -> Optional[MenuItem]:
+        """IDからアイテム取得"""
+        return self.items.get(item_id)
+        
+    def menu_position(self, item_id: str) -> Optional[int]:
+        """メニューリスト上の位置"""
+        if self._menu_dirty_from is not None:
+            for i in range(self._menu_dirty_from, len(self.menu)):
+                self._menu_pos[self.menu[i].id] = i
+            self._menu_dirty_from = None
+        return self._menu_pos.get(item_id)
+        
+    def order_position(self, item_id: str) -> Optional[int]:
+        """表示順リスト上の位置"""
+        if self._order_dirty_from is not None:
+            for i in range(self._order_dirty_from, len(self.menu_order)):
+                self._order_pos[self.menu_order[i]] = i
+            self._order_dirty_from = None
+        return self._order_pos.get(item_id)
+        
+    def append(self, menu_item: MenuItem) -> None:
+        """末尾追加"""
+        self.items[menu_item.id] = menu_item
+        self._menu_pos[menu_item.id] = len(self.menu)
+        self._order_pos[menu_item.id] = len(self.menu_order)
+        self.menu.append(menu_item)
+        self.menu_order.append(menu_item.id)
+        
+    def remove(self, item_id: str) -> List[Dict[str, Any]]:
+        """削除（JSON-Patch差分を返却）"""
+        ops = []
+        menu_pos = self.menu_position(item_id)
+        order_pos = self.order_position(item_id)
+        
+        if menu_pos is not None:
+            del self.menu[menu_pos]
+            ops.append({"op": "remove", "path": make_pointer("menu", menu_pos)})
+            self._menu_dirty_from = menu_pos if self._menu_dirty_from is None else min(self._menu_dirty_from, menu_pos)
+        if order_pos is not None:
+            del self.menu_order[order_pos]
+            ops.append({"op": "remove", "path": make_pointer("menu_order", order_pos)})
+            self._order_dirty_from = order_pos if self._order_dirty_from is None else min(self._order_dirty_from, order_pos)
+            
+        self.items.pop(item_id, None)
+        self._menu_pos.pop(item_id, None)
+        self._order_pos.pop(item_id, None)
+        return ops
+        
+    def splice_menu(self, start: int, stop: int, menu_items: List[MenuItem]) -> List[MenuItem]:
+        """メニューリストの範囲置き換え（置き換え前の要素を返却・位置は範囲以降のみ再計算）"""
+        removed = self.menu[start:stop]
+        self.menu[start:stop] = menu_items
+        
+        for item in removed:
+            self.items.pop(item.id, None)
+            self._menu_pos.pop(item.id, None)
+        for item in menu_items:
+            self.items[item.id] = item
+            
+        if len(menu_items) == len(removed):
+            for i, item in enumerate(menu_items, start):
+                self._menu_pos[item.id] = i
+        else:
+            self._menu_dirty_from = start if self._menu_dirty_from is None else min(self._menu_dirty_from, start)
+        return removed
+        
+    def splice_order(self, start: int, stop: int, item_ids: List[str]) -> None:
+        """表示順リストの範囲置き換え"""
+        removed = self.menu_order[start:stop]
+        self.menu_order[start:stop] = item_ids
+        
+        for item_id in removed:
+            self._order_pos.pop(item_id, None)
+        if len(item_ids) == len(removed):
+            for i, item_id in enumerate(item_ids, start):
+                self._order_pos[item_id] = i
+        else:
+            self._order_dirty_from = start if self._order_dirty_from is None else min(self._order_dirty_from, start)
+            
+    def set_order(self, new_order: List[str]) -> None:
+        """表示順リストの置き換え"""
+        self.menu_order[:] = new_order
+        self._order_pos = {item_id: i for i, item_id in enumerate(self.menu_order)}
+        self._order_dirty_from = None
+
+def _validate_store_step(state: SystemState) -> List[str]:
+    """Step 1: 店舗情報バリデーション"""
+    errors = []
+    if not state.store.store_name_ja:
+        errors.append("店舗名（日本語）が入力されていません")
+    if not state.store.store_type:
+        errors.append("業種が選択されていません")
+    return errors
+
+def _validate_story_step(state: SystemState) -> List[str]:
+    """Step 2: ストーリーバリデーション"""
+    if not state.story_approved:
+        return ["店主ストーリーが承認されていません"]
+    return []
+
+def _validate_menu_step(state: SystemState) -> List[str]:
+    """Step 3: メニューバリデーション"""
+    errors = []
+    if not state.menu:
+        errors.append("メニューが1つ以上必要です")
+    for item in state.menu:
+        if not item.name:
+            errors.append(f"メニューアイテム {item.id} に料理名が設定されていません")
+        if item.price <= 0:
+            errors.append(f"メニューアイテム {item.name} の価格が設定されていません")
+    return errors
+
+def _validate_plan_step(state: SystemState) -> List[str]:
+    """Step 6: プラン選択バリデーション"""
+    if state.current_step >= 6 and not state.featured_menu_id:
+        return ["イチオシメニューが選択されていません"]
+    return []
+
+# ステップ別バリデーションルール（依存フィールド, 判定関数）
+VALIDATION_RULES: Dict[int, Tuple[Tuple[str, ...], Callable[[SystemState], List[str]]]] = {
+    1: (("store",), _validate_store_step),
+    2: (("story_approved",), _validate_story_step),
+    3: (("menu",), _validate_menu_step),
+    6: (("current_step", "featured_menu_id"), _validate_plan_step)
+}
+
+# CSVダウンロード用ペイロードの依存フィールド（変更通知でセッション内キャッシュを無効化）
+CSV_PAYLOAD_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "store_info": ("store",),
+    "story": ("imperator_story", "store"),
+    "food_report": ("menu", "menu_order", "generated_content", "store"),
+    "menu": ("menu", "menu_order", "store")
+}
+
 class StateManager:
     """完璧な状態管理システム"""
     
     def __init__(self):
         """初期化 - セッション状態の完璧な管理"""
         self.session_key = "tonosama_professional_state"
-        self.backup_dir = Path("data/backups")
-        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        
+        # セッション別状態ストア（SQLite WAL・セッションごとに直近20スナップショット保持）
+        self.state_store = SQLiteStateStore(Path("data/state_store.db"), keep_snapshots=20)
+        
+        # 差分ジャーナル（JSON-Patch形式・200件ごとにスナップショットへコンパクション）
+        self.journal = DeltaJournal(
+            self.state_store,
+            compact_every=200,
+            dumps=lambda data: state_codec.dumps_dict(data).decode("utf-8")
+        )
+        
+        # ライトビハインド永続化（更新はデバウンス窓で集約しバックグラウンド書き込み）
+        self.persister = WriteBehindPersister(
+            self._write_backup,
+            debounce_seconds=2.0,
+            max_delay_seconds=10.0
+        )
+        
+        # 共有状態バックエンド（複数レプリカ構成時・未設定時はセッション内のみ）
+        # 差分はライトビハインドで集約し、比較交換はバックグラウンドスレッドで実行
+        self.backend = get_state_backend()
+        self.backend_refresh_seconds = 1.0  # 他レプリカの更新確認間隔
+        self.backend_writer = WriteBehindPersister(
+            self._write_to_backend,
+            debounce_seconds=0.2,
+            max_delay_seconds=1.0
+        )
+        self.session_cookie = "tonosama_session"  # セッション継続用Cookie名
+        
+        # 元に戻す・やり直し履歴の保持件数（構造共有スナップショット）
+        self.history_depth = 50
+        
+        # 有効期限切れセッションの削除（Cookie・セッションメモリと同じ有効期限）
+        self.prune_expired_sessions()
         
         # 初期化処理
         self._initialize_session_state()
         
+        # 未参照画像BLOBの回収（共有バックエンド構成では他レプリカの状態を走査できないため実行しない）
+        if self.backend is None:
+            self.collect_blob_garbage()
+        
     def _initialize_session_state(self):
         """セッション状態の初期化"""
         if self.session_key not in st.session_state:
+            # 共有バックエンド上の既存セッション（レプリカ切り替え・再起動後）
+            if self.backend is not None and self._resume_from_backend():
+                return
+            
             logger.info("新規セッション開始 - 初期状態作成")
             
             # 初期状態作成
@@ -131,8 +362,9 @@ class StateManager:
                 processing_status={}
             )
             
-            st.session_state[self.session_key] = initial_state
-            self._auto_backup()
+            self._set_state(initial_state)
+            self._record_delta(initial_state, [], snapshot=True)
+            self._schedule_backup()
     
     def get_state(self) -> SystemState:
         """現在の状態を取得（セーフガード付き）"""
@@ -142,36 +374,350 @@ class StateManager:
                 logger.warning(f"セッション状態キー'{self.session_key}'が存在しません - 初期化実行")
                 self._initialize_session_state()
             
-            return st.session_state[self.session_key]
+            # 退避中のセッションは自動復元
+            try:
+                current_state = session_memory.acquire(st.session_state[self.session_key])
+            except SessionExpiredError as e:
+                # 長時間アイドルで破棄されたセッションは永続化済みの最新状態から再開
+                del st.session_state[self.session_key]
+                if not self.restore_session(e.session_id):
+                    self._initialize_session_state()
+                current_state = session_memory.acquire(st.session_state[self.session_key])
+            
+            # 他レプリカでの更新を反映
+            if self.backend is not None:
+                current_state = self._refresh_from_backend(current_state)
+            
+            # 元に戻す履歴の起点（同一セッション内の状態置き換えでは引き継ぎ・ディスク退避時は
+            # メモリ解放のため派生キャッシュとともに破棄され、復元後はその時点から再作成）
+            derived = st.session_state[self.session_key].derived
+            if "history" not in derived:
+                derived["history"] = StateHistory(current_state, self.history_depth)
+            
+            return current_state
             
         except Exception as e:
             logger.error(f"状態取得エラー: {e}")
             # 緊急時の初期化
+            if self.session_key in st.session_state:
+                del st.session_state[self.session_key]
             self._initialize_session_state()
-            return st.session_state[self.session_key]
+            return session_memory.acquire(st.session_state[self.session_key])
+    
+    def _set_state(self, state: SystemState, sync: bool = True) -> None:
+        """セッション状態の設定（メモリ管理対象として登録・共有バックエンドへ反映）
+        
+        同一セッションの状態置き換え（復元・他レプリカの更新反映・競合時の再適用）では
+        元に戻す履歴を引き継ぎ、置き換えを1件の変更として記録（元に戻すで置き換え前へ戻る）
+        """
+        previous = st.session_state.get(self.session_key)
+        history = previous.derived.get("history") if previous is not None else None
+        
+        slot = SessionSlot(state.session_id, state)
+        if history is not None and previous.session_id == state.session_id:
+            history.record(state, [f.name for f in fields(state)], "状態の置き換え")
+            slot.derived["history"] = history
+        st.session_state[self.session_key] = session_memory.register(slot)
+        
+        if self.backend is not None and sync:
+            # 復元・インポート：既知のバージョンに対する比較交換で状態全体を置き換え
+            # （読み込み後に他レプリカが更新していた場合は競合として検出）
+            try:
+                backend_sync = self._backend_sync(state)
+                backend_sync.replace(state_codec.dumps(state))
+                self._schedule_backend_write(backend_sync)
+            except Exception as e:
+                logger.error(f"共有状態書き込み予約エラー: {e}")
+    
+    # ---- 共有状態バックエンド ----
+    
+    def _requested_session_id(self) -> str:
+        """セッションCookieのセッションID（ロードバランサ配下でのセッション継続・URLには載せない）"""
+        try:
+            return st.context.cookies.get(self.session_cookie, "") or ""
+        except Exception:
+            return ""
+    
+    def bind_session_cookie(self) -> None:
+        """セッションCookieの設定（ページ内スクリプト経由・セッションごとに1回）
+        
+        旧形式のURLクエリパラメータ（?sid=）は共有・ブックマークで漏れるため削除
+        """
+        if self.backend is None:
+            return
+        
+        current_state = self.get_state()
+        bound_key = f"{self.session_key}_cookie"
+        if st.session_state.get(bound_key) == current_state.session_id:
+            return
+        
+        try:
+            if "sid" in st.query_params:
+                del st.query_params["sid"]
+            
+            if self._requested_session_id() != current_state.session_id:
+                from streamlit.components.v1 import html as render_html
+                
+                max_age = int(SESSION_EXPIRY_HOURS * 3600)
+                render_html(
+                    "<script>"
+                    f"window.parent.document.cookie = '{self.session_cookie}={current_state.session_id}; "
+                    f"Max-Age={max_age}; Path=/; SameSite=Strict' + "
+                    "(window.parent.location.protocol === 'https:' ? '; Secure' : '');"
+                    "</script>",
+                    height=0
+                )
+            st.session_state[bound_key] = current_state.session_id
+        except Exception as e:
+            logger.warning(f"セッションCookie設定エラー: {e}")
+    
+    def _new_backend_sync(self, session_id: str, version: int = 0, base: Optional[bytes] = None) -> SharedStateSync:
+        """共有バックエンド同期情報の作成"""
+        sync = SharedStateSync(
+            self.backend, session_id,
+            dumps=state_codec.dumps_dict,
+            loads=state_codec.loads_dict,
+            version=version,
+            base=base
+        )
+        st.session_state[f"{self.session_key}_backend"] = sync
+        return sync
+    
+    def _backend_sync(self, state: SystemState) -> SharedStateSync:
+        """セッションの共有バックエンド同期情報（セッション切り替え時は保存済みバージョンを読み込み）"""
+        sync = st.session_state.get(f"{self.session_key}_backend")
+        if sync is None or sync.session_id != state.session_id:
+            loaded = self.backend.get(state.session_id)
+            version, base = loaded if loaded is not None else (0, None)
+            sync = self._new_backend_sync(state.session_id, version, base)
+        return sync
+    
+    def _schedule_backend_write(self, sync: SharedStateSync) -> None:
+        """共有バックエンドへの書き込み予約（メモリ上の記録のみ）"""
+        self.backend_writer.schedule(sync.session_id, sync)
+    
+    def _write_to_backend(self, session_id: str, sync: SharedStateSync) -> None:
+        """未送信の差分の比較交換書き込み（バックグラウンドスレッドから呼び出し）"""
+        try:
+            sync.write()
+        except Exception as e:
+            # バックエンド障害時は差分を保持し次回の変更時に再送
+            logger.error(f"共有状態書き込みエラー: {e}")
+    
+    def _queue_backend_ops(self, current_state: SystemState, ops: List[Dict[str, Any]]) -> None:
+        """確定した差分の共有バックエンド送信予約"""
+        try:
+            sync = self._backend_sync(current_state)
+            sync.record(ops)
+            self._schedule_backend_write(sync)
+        except Exception as e:
+            logger.error(f"共有状態書き込み予約エラー: {e}")
+    
+    def _resume_from_backend(self) -> bool:
+        """セッションCookieのセッションIDで共有状態を再開"""
+        session_id = self._requested_session_id()
+        if not session_id:
+            return False
+        
+        try:
+            loaded = self.backend.get(session_id)
+        except Exception as e:
+            logger.error(f"共有状態読み込みエラー: {e}")
+            return False
+        
+        if loaded is None:
+            return False
+        
+        version, payload = loaded
+        self._set_state(state_codec.loads(payload), sync=False)
+        self._new_backend_sync(session_id, version, payload).checked_at = time.monotonic()
+        self.journal.resume(session_id, self.state_store.latest_seq(session_id))
+        logger.info(f"共有状態からセッション再開: {session_id} (version {version})")
+        return True
+    
+    def _refresh_from_backend(self, current_state: SystemState) -> SystemState:
+        """他レプリカの更新確認と未送信の変更の再適用（同一フィールドの競合は解決まで保留）"""
+        try:
+            sync = self._backend_sync(current_state)
+            loaded = sync.poll(time.monotonic(), self.backend_refresh_seconds)
+        except Exception as e:
+            logger.error(f"共有状態確認エラー: {e}")
+            return current_state
+        
+        if loaded is None:
+            return current_state
+        
+        version, payload = loaded
+        dirty = sync.dirty_fields([f.name for f in fields(current_state)])
+        local: Dict[str, Any] = {}
+        if dirty:
+            # 他レプリカの状態（JSON）と比較できる形へ正規化
+            document = state_codec.loads_dict(state_codec.dumps(current_state))
+            local = {name: document[name] for name in dirty}
+        
+        # 競合フィールドは解決まで自レプリカの値を表示し、それ以外は他レプリカの更新を反映
+        document, conflicts = sync.rebase(version, payload, local)
+        merged_state = state_codec.decode(document)
+        self._set_state(merged_state, sync=False)
+        
+        if conflicts:
+            logger.warning(f"共有状態の競合: {current_state.session_id} {list(conflicts)} - 解決まで書き込み保留")
+        elif sync.has_changes():
+            self._schedule_backend_write(sync)
+        logger.info(f"他レプリカの更新を反映: {current_state.session_id} (version {version})")
+        return merged_state
+    
+    def get_sync_conflict(self) -> Optional[SyncConflict]:
+        """未解決の共有状態の競合（無い場合はNone）"""
+        sync = st.session_state.get(f"{self.session_key}_backend")
+        return sync.conflict if sync is not None else None
+        
+    def resolve_sync_conflict(self, keep_local: bool) -> None:
+        """共有状態の競合解決（自レプリカの値で上書き・または他レプリカの値を採用）"""
+        sync = st.session_state.get(f"{self.session_key}_backend")
+        conflict = sync.resolve(keep_local) if sync is not None else None
+        if conflict is None:
+            return
+                
+        if not keep_local:
+            remote_state = state_codec.loads(conflict.remote_payload)
+            self._commit({name: getattr(remote_state, name) for name in conflict.fields})
+        self._schedule_backend_write(sync)
+        logger.info(f"共有状態の競合解決: {list(conflict.fields)} ({'自レプリカ' if keep_local else '他レプリカ'}優先)")
+    
+    def _session_cache(self) -> Dict[str, Any]:
+        """状態から再構築可能な派生キャッシュ（ディスク退避時に破棄）"""
+        self.get_state()
+        return st.session_state[self.session_key].derived
     
     def update_state(self, **kwargs) -> None:
-        """状態の更新"""
+        """状態の更新（値が変わらないフィールドは無視）"""
+        self._commit(kwargs)
+    
+    def _session_notifier(self) -> ChangeNotifier:
+        """セッション単位の変更通知（作成時に派生キャッシュの無効化を購読）"""
+        notifier_key = f"{self.session_key}_notifier"
+        notifier = st.session_state.get(notifier_key)
+        
+        if notifier is None:
+            notifier = ChangeNotifier()
+            notifier.subscribe(
+                {name for fields, _ in VALIDATION_RULES.values() for name in fields},
+                self._invalidate_validation
+            )
+            notifier.subscribe(
+                {name for fields in CSV_PAYLOAD_FIELDS.values() for name in fields},
+                self._invalidate_csv_payloads
+            )
+            st.session_state[notifier_key] = notifier
+        
+        return notifier
+    
+    def subscribe(self, fields: List[str], callback: Callable[[SystemState, StateChange], None]) -> int:
+        """現在のセッションのフィールド変更の購読（"*" で全フィールド）"""
+        return self._session_notifier().subscribe(fields, callback)
+    
+    def unsubscribe(self, token: int) -> None:
+        """購読解除"""
+        self._session_notifier().unsubscribe(token)
+    
+    def _invalidate_validation(self, current_state: SystemState, change: StateChange) -> None:
+        """依存フィールドが変更されたステップのバリデーション結果を破棄"""
+        cache = st.session_state[self.session_key].derived.get("validation")
+        if not cache:
+            return
+        
+        for step in [step for step in cache if change.fields & set(VALIDATION_RULES[step][0])]:
+            del cache[step]
+    
+    def _invalidate_csv_payloads(self, current_state: SystemState, change: StateChange) -> None:
+        """依存フィールドが変更された種類のCSVペイロードを破棄"""
+        cache = st.session_state[self.session_key].derived.get("csv_payloads")
+        if not cache:
+            return
+        
+        for kind in [kind for kind in cache if change.fields & set(CSV_PAYLOAD_FIELDS[kind])]:
+            del cache[kind]
+    
+    def csv_payload(self, kind: str, build: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """CSVダウンロード用ペイロード（依存フィールドが変わるまでは入力の直列化・ハッシュも省略）"""
+        if kind not in CSV_PAYLOAD_FIELDS:
+            raise ValueError(f"未対応のCSVペイロード種類です: {kind}")
+        
+        cache = self._session_cache().setdefault("csv_payloads", {})
+        payload = cache.get(kind)
+        
+        if payload is None:
+            payload = build()
+            cache[kind] = payload
+        
+        return payload
+    
+    def _commit(self, changes: Dict[str, Any], ops: Optional[List[Dict[str, Any]]] = None,
+                record_history: bool = True) -> None:
+        """状態変更の確定（差分記録・バックアップ予約・履歴記録）"""
         try:
             current_state = self.get_state()
             
+            for key in [key for key in changes if not hasattr(current_state, key)]:
+                logger.warning(f"未知の状態キー: {key}")
+                del changes[key]
+            
+            # 詳細な差分が無い場合は実際に値が変わったフィールドのみ対象
+            if ops is None:
+                changes = {
+                    key: value for key, value in changes.items()
+                    if not is_unchanged(getattr(current_state, key), value)
+                }
+                if not changes:
+                    return
+            
             # 更新処理
-            for key, value in kwargs.items():
-                if hasattr(current_state, key):
-                    setattr(current_state, key, value)
-                else:
-                    logger.warning(f"未知の状態キー: {key}")
+            for key, value in changes.items():
+                setattr(current_state, key, value)
             
             # タイムスタンプ更新
             current_state.last_updated = datetime.now(timezone.utc).isoformat()
             
-            # セッション状態に反映
-            st.session_state[self.session_key] = current_state
+            # バージョン更新
+            version = self._version_tracker(current_state).mark(changes.keys())
             
-            # 自動バックアップ
-            self._auto_backup()
+            # 元に戻す履歴（差分の箇所を含むチャンク・キーのみ複製）
+            if record_history:
+                history = st.session_state[self.session_key].derived.get("history")
+                if history is not None:
+                    history.record(current_state, changes.keys(), ops=ops)
+            
+            # メモリ計測対象として変更を通知
+            session_memory.mark_changed(st.session_state[self.session_key])
+            
+            # 差分記録（詳細な差分が無い場合はフィールド単位の置換）
+            if ops is None:
+                ops = [
+                    {"op": "replace", "path": make_pointer(key), "value": self._to_jsonable(value)}
+                    for key, value in changes.items()
+                ]
+            ops.append({"op": "replace", "path": "/last_updated", "value": current_state.last_updated})
+            
+            # 共有バックエンドへの差分送信予約（比較交換はバックグラウンド・競合は次回確認時に検出）
+            if self.backend is not None:
+                self._queue_backend_ops(current_state, ops)
             
-            logger.info(f"状態更新完了: {list(kwargs.keys())}")
+            # 自動バックアップ（ステップ遷移はチェックポイントとして即時書き込み）
+            if "current_step" in changes:
+                self._record_delta(current_state, ops, snapshot=True)
+                self.checkpoint()
+            else:
+                self._record_delta(current_state, ops)
+                self._schedule_backup()
+            
+            # 購読者への変更通知（バリデーション・CSVキャッシュの無効化を含む）
+            self._session_notifier().publish(
+                current_state,
+                StateChange(current_state.session_id, version, frozenset(changes))
+            )
+            
+            logger.info(f"状態更新完了: {list(changes.keys())}")
             
         except Exception as e:
             logger.error(f"状態更新エラー: {e}")
@@ -181,76 +727,221 @@ class StateManager:
         """店舗情報の更新"""
         current_state = self.get_state()
         store = current_state.store
+        ops = []
         
         for key, value in store_data.items():
             if hasattr(store, key):
                 setattr(store, key, value)
+                ops.append({"op": "replace", "path": make_pointer("store", key), "value": value})
         
-        self.update_state(store=store)
+        self._commit({"store": store}, ops)
     
+    def get_menu_index(self) -> MenuIndex:
+        """メニューID索引の取得（状態が置き換わった場合は再構築）"""
+        current_state = self.get_state()
+        cache = self._session_cache()
+        index = cache.get("menu_index")
+        
+        if index is None or not index.is_bound_to(current_state):
+            index = MenuIndex(current_state.menu, current_state.menu_order)
+            cache["menu_index"] = index
+            
+        return index
+        
+    def get_menu_item(self, item_id: str) -> Optional[MenuItem]:
+        """IDからメニューアイテム取得"""
+        return self.get_menu_index().get(item_id)
+        
+    def get_ordered_menu(self) -> List[MenuItem]:
+        """表示順でのメニュー一覧"""
+        index = self.get_menu_index()
+        return [index.items[item_id] for item_id in index.menu_order if item_id in index.items]
+        
+    def get_menu_table(self) -> MenuTable:
+        """列指向メニューテーブルの取得（メニュー変更時のみ再構築）"""
+        current_state = self.get_state()
+        stamp = self._version_tracker(current_state).stamp(("menu",))
+        cache = self._session_cache()
+        cached = cache.get("menu_table")
+        
+        if cached is None or cached[0] != stamp or len(cached[1]) != len(current_state.menu):
+            cached = (stamp, MenuTable.from_items(current_state.menu))
+            cache["menu_table"] = cached
+        
+        return cached[1]
+    
+    @contextmanager
+    def menu_batch(self) -> Iterator[None]:
+        """メニュー一括変更（ブロック内の変更をまとめて1回だけ確定）"""
+        batch_key = f"{self.session_key}_menu_batch"
+        
+        # 入れ子の場合は外側のバッチにまとめる
+        if st.session_state.get(batch_key) is not None:
+            yield
+            return
+            
+        st.session_state[batch_key] = {"changes": {}, "ops": []}
+        try:
+            yield
+        finally:
+            # 例外時もメモリ上で反映済みの変更は確定して差分と状態を一致させる
+            batch = st.session_state.pop(batch_key)
+            if batch["ops"]:
+                self._commit(batch["changes"], batch["ops"])
+                
+    def _commit_menu(self, changes: Dict[str, Any], ops: List[Dict[str, Any]]) -> None:
+        """メニュー変更の確定（バッチ中は保留）"""
+        batch = st.session_state.get(f"{self.session_key}_menu_batch")
+        
+        if batch is None:
+            self._commit(changes, ops)
+        else:
+            batch["changes"].update(changes)
+            batch["ops"].extend(ops)
+            
     def add_menu_item(self, menu_item: MenuItem) -> None:
         """メニューアイテムの追加"""
         current_state = self.get_state()
+        index = self.get_menu_index()
         
         # IDが未設定の場合は自動生成
         if not menu_item.id:
             menu_item.id = f"menu_{len(current_state.menu) + 1}_{uuid.uuid4().hex[:8]}"
         
         # メニューリストに追加
-        current_state.menu.append(menu_item)
-        current_state.menu_order.append(menu_item.id)
+        index.append(menu_item)
+        self._update_ordering_keys(menu_item)
         
-        self.update_state(menu=current_state.menu, menu_order=current_state.menu_order)
+        self._commit_menu(
+            {"menu": current_state.menu, "menu_order": current_state.menu_order},
+            [
+                {"op": "add", "path": "/menu/-", "value": self._to_jsonable(menu_item)},
+                {"op": "add", "path": "/menu_order/-", "value": menu_item.id}
+            ]
+        )
         
         logger.info(f"メニューアイテム追加: {menu_item.name} (ID: {menu_item.id})")
     
+    def add_menu_items(self, menu_items: List[MenuItem]) -> int:
+        """メニューアイテムの一括追加（1回の状態確定・履歴も1件）"""
+        with self.menu_batch():
+            for menu_item in menu_items:
+                self.add_menu_item(menu_item)
+        
+        logger.info(f"メニューアイテム一括追加: {len(menu_items)}件")
+        return len(menu_items)
+    
     def update_menu_item(self, item_id: str, **item_data) -> None:
         """メニューアイテムの更新"""
         current_state = self.get_state()
+        index = self.get_menu_index()
+        item = index.get(item_id)
+        ops = []
         
-        for item in current_state.menu:
-            if item.id == item_id:
-                for key, value in item_data.items():
-                    if hasattr(item, key):
-                        setattr(item, key, value)
-                break
+        if item is None:
+            logger.warning(f"未知のメニューID: {item_id}")
+            return
         
-        self.update_state(menu=current_state.menu)
+        position = index.menu_position(item_id)
+        for key, value in item_data.items():
+            if hasattr(item, key):
+                setattr(item, key, value)
+                ops.append({"op": "replace", "path": make_pointer("menu", position, key), "value": value})
+                
+        self._update_ordering_keys(item)
+        self._commit_menu({"menu": current_state.menu}, ops)
     
     def delete_menu_item(self, item_id: str) -> None:
         """メニューアイテムの削除"""
         current_state = self.get_state()
+        index = self.get_menu_index()
         
-        # メニューリストから削除
-        current_state.menu = [item for item in current_state.menu if item.id != item_id]
-        current_state.menu_order = [oid for oid in current_state.menu_order if oid != item_id]
+        # 索引から位置を特定して削除
+        ops = index.remove(item_id)
+        engine = self._session_cache().get("menu_ordering")
+        if engine is not None:
+            engine.remove(item_id)
         
         # 生成コンテンツからも削除
         if item_id in current_state.generated_content:
             del current_state.generated_content[item_id]
+            ops.append({"op": "remove", "path": make_pointer("generated_content", item_id)})
         
         # イチオシメニューが削除された場合
         if current_state.featured_menu_id == item_id:
             current_state.featured_menu_id = ""
+            ops.append({"op": "replace", "path": "/featured_menu_id", "value": ""})
         
-        self.update_state(
-            menu=current_state.menu,
-            menu_order=current_state.menu_order,
-            generated_content=current_state.generated_content,
-            featured_menu_id=current_state.featured_menu_id
+        self._commit_menu(
+            {
+                "menu": current_state.menu,
+                "menu_order": current_state.menu_order,
+                "generated_content": current_state.generated_content,
+                "featured_menu_id": current_state.featured_menu_id
+            },
+            ops
         )
         
         logger.info(f"メニューアイテム削除: {item_id}")
     
     def reorder_menu(self, new_order: List[str]) -> None:
-        """メニュー順序の変更"""
-        self.update_state(menu_order=new_order)
+        """メニュー順序の変更（未知のIDは除外）"""
+        current_state = self.get_state()
+        index = self.get_menu_index()
+        
+        index.set_order([item_id for item_id in new_order if item_id in index.items])
+        
+        self._commit_menu(
+            {"menu_order": current_state.menu_order},
+            [{"op": "replace", "path": "/menu_order", "value": list(current_state.menu_order)}]
+        )
+    
+    def get_menu_ordering(self) -> MenuOrderingEngine:
+        """並び替えエンジンの取得（メニューが置き換わった場合は再構築）"""
+        current_state = self.get_state()
+        cache = self._session_cache()
+        engine = cache.get("menu_ordering")
+        
+        if engine is None or not engine.is_bound_to(current_state.menu):
+            engine = MenuOrderingEngine(current_state.menu)
+            cache["menu_ordering"] = engine
+            
+        return engine
+    
+    def _update_ordering_keys(self, menu_item: MenuItem) -> None:
+        """構築済みの並び替えエンジンのキー更新（該当アイテムのみ）"""
+        engine = self._session_cache().get("menu_ordering")
+        if engine is not None:
+            engine.update(menu_item)
+    
+    def sort_menu_by(self, ordering: str) -> None:
+        """指定の並び順で表示順を書き換え（アイテム自体は複製・移動しない）"""
+        current_state = self.get_state()
+        new_order = self.get_menu_ordering().order(ordering, current_state.menu_order)
+        
+        if new_order != current_state.menu_order:
+            self.reorder_menu(new_order)
+    
+    def sort_menu_by_recommendation(self) -> None:
+        """推奨度順（推奨度降順 → 価格昇順）"""
+        self.sort_menu_by("recommendation")
+    
+    def sort_menu_by_price(self) -> None:
+        """価格順（昇順）"""
+        self.sort_menu_by("price")
+    
+    def sort_menu_by_category(self) -> None:
+        """カテゴリ順（前菜 → メイン → … → 推奨度降順 → 価格昇順）"""
+        self.sort_menu_by("category")
     
     def update_imperator_answer(self, question_id: str, answer: str) -> None:
         """帝王質問回答の更新"""
         current_state = self.get_state()
         current_state.imperator_answers[question_id] = answer
-        self.update_state(imperator_answers=current_state.imperator_answers)
+        self._commit(
+            {"imperator_answers": current_state.imperator_answers},
+            [{"op": "add", "path": make_pointer("imperator_answers", question_id), "value": answer}]
+        )
     
     def set_story_approved(self, story: str) -> None:
         """店主ストーリー承認"""
@@ -268,48 +959,130 @@ class StateManager:
             current_state.generated_content[menu_id] = {}
         
         current_state.generated_content[menu_id][language] = content
-        self.update_state(generated_content=current_state.generated_content)
+        self._commit(
+            {"generated_content": current_state.generated_content},
+            [{"op": "add", "path": make_pointer("generated_content", menu_id, language), "value": content}]
+        )
     
-    def validate_state(self) -> List[str]:
-        """状態の完全バリデーション"""
-        errors = []
+    def get_state_version(self) -> int:
+        """状態バージョン（変更確定ごとに単調増加）"""
+        return self._version_tracker(self.get_state()).version
+    
+    def get_changed_fields(self, since_version: int) -> frozenset:
+        """指定バージョン以降に変更されたフィールド（状態置き換え時は "*"）"""
+        return self._version_tracker(self.get_state()).changed_since(since_version)
+    
+    def undo(self) -> bool:
+        """直前の変更の取り消し"""
+        return self._apply_history(self._session_cache()["history"].undo())
+    
+    def redo(self) -> bool:
+        """取り消した変更のやり直し"""
+        return self._apply_history(self._session_cache()["history"].redo())
+    
+    def _apply_history(self, patches: Optional[Dict[str, Tuple]]) -> bool:
+        """履歴パッチの反映（現在の状態をその場で書き換え・共有されていない範囲のみ置き換えて差分もその範囲のみ記録）"""
+        if patches is None:
+            return False
+            
         current_state = self.get_state()
+        changes: Dict[str, Any] = {}
+        ops: List[Dict[str, Any]] = []
         
-        # Step 1: 店舗情報バリデーション
-        if not current_state.store.store_name_ja:
-            errors.append("店舗名（日本語）が入力されていません")
-        
-        if not current_state.store.store_type:
-            errors.append("業種が選択されていません")
+        for name, patch in patches.items():
+            kind = patch[0]
+            if kind == "list":
+                _, start, stop, values = patch
+                self._splice_field(current_state, name, start, stop, values)
+                ops.extend(self._splice_ops(name, start, stop, values))
+            elif kind == "dict":
+                _, updates, removed = patch
+                target = getattr(current_state, name)
+                for key in removed:
+                    del target[key]
+                    ops.append({"op": "remove", "path": make_pointer(name, key)})
+                for key, value in updates.items():
+                    target[key] = value
+                    ops.append({"op": "add", "path": make_pointer(name, key), "value": self._to_jsonable(value)})
+            else:
+                setattr(current_state, name, patch[1])
+                ops.append({"op": "replace", "path": make_pointer(name), "value": self._to_jsonable(patch[1])})
+            changes[name] = getattr(current_state, name)
+            
+        self._commit(changes, ops, record_history=False)
+        return True
         
-        # Step 2: ストーリーバリデーション
-        if not current_state.story_approved:
-            errors.append("店主ストーリーが承認されていません")
+    def _splice_field(self, current_state: SystemState, name: str, start: int, stop: int, values: List[Any]) -> None:
+        """リストフィールドの範囲置き換え（メニューは索引・並び替えキーも該当範囲のみ更新）"""
+        if name == "menu":
+            removed = self.get_menu_index().splice_menu(start, stop, values)
+            engine = self._session_cache().get("menu_ordering")
+            if engine is not None:
+                for item in removed:
+                    engine.remove(item.id)
+                for item in values:
+                    engine.update(item)
+        elif name == "menu_order":
+            self.get_menu_index().splice_order(start, stop, values)
+        else:
+            getattr(current_state, name)[start:stop] = values
+            
+    def _splice_ops(self, name: str, start: int, stop: int, values: List[Any]) -> List[Dict[str, Any]]:
+        """範囲置き換えのJSON-Patch差分（重なる位置は置換・余りは削除または挿入）"""
+        common = min(stop - start, len(values))
+        ops = [
+            {"op": "replace", "path": make_pointer(name, start + i), "value": self._to_jsonable(values[i])}
+            for i in range(common)
+        ]
+        ops.extend({"op": "remove", "path": make_pointer(name, position)} for position in range(stop - 1, start + common - 1, -1))
+        ops.extend(
+            {"op": "add", "path": make_pointer(name, start + i), "value": self._to_jsonable(values[i])}
+            for i in range(common, len(values))
+        )
+        return ops
+    
+    def get_history_stats(self) -> Dict[str, Any]:
+        """元に戻す・やり直し履歴の統計"""
+        return self._session_cache()["history"].get_stats()
+    
+    def get_memory_stats(self) -> Dict[str, Any]:
+        """プロセス全体のセッションメモリ統計"""
+        return session_memory.get_stats()
+
+    def _version_tracker(self, current_state: SystemState) -> FieldVersions:
+        """バージョン管理情報（状態が置き換わった場合は全フィールドを変更扱い）"""
+        tracker_key = f"{self.session_key}_versions"
+        tracker = st.session_state.get(tracker_key)
         
-        # Step 3: メニューバリデーション
-        if not current_state.menu:
-            errors.append("メニューが1つ以上必要です")
+        if tracker is None or not tracker.tracks(current_state):
+            tracker = FieldVersions(current_state, tracker.version + 1 if tracker else 1)
+            st.session_state[tracker_key] = tracker
         
-        for item in current_state.menu:
-            if not item.name:
-                errors.append(f"メニューアイテム {item.id} に料理名が設定されていません")
-            if item.price <= 0:
-                errors.append(f"メニューアイテム {item.name} の価格が設定されていません")
+        return tracker
+    
+    def validate_state(self, step: Optional[int] = None) -> List[str]:
+        """状態バリデーション（読み取り専用・依存フィールドの変更通知まではキャッシュ返却）"""
+        current_state = self.get_state()
+        cache = self._session_cache().setdefault("validation", {})
         
-        # Step 6: プラン選択バリデーション
-        if current_state.current_step >= 6:
-            if not current_state.featured_menu_id:
-                errors.append("イチオシメニューが選択されていません")
+        steps = [step] if step is not None else sorted(VALIDATION_RULES)
+        errors = []
         
-        # 状態に反映
-        current_state.validation_errors = errors
-        self.update_state(validation_errors=errors)
+        for rule_step in steps:
+            if rule_step not in VALIDATION_RULES:
+                continue
+            
+            cached = cache.get(rule_step)
+            if cached is None:
+                cached = VALIDATION_RULES[rule_step][1](current_state)
+                cache[rule_step] = cached
+            
+            errors.extend(cached)
         
         return errors
     
     def can_proceed_to_step(self, target_step: int) -> bool:
-        """指定ステップに進めるかの判定"""
-        errors = self.validate_state()
+        """指定ステップに進めるかの判定（対象ステップの条件のみ評価）"""
         current_state = self.get_state()
         
         # ステップ別必要条件チェック
@@ -329,43 +1102,113 @@ class StateManager:
         
         return True
     
+    @staticmethod
+    def _to_jsonable(value: Any) -> Any:
+        """差分値のJSON化（データクラスは辞書へ）"""
+        return state_codec.encode_value(value)
+    
+    def _record_delta(self, current_state: SystemState, ops: List[Dict[str, Any]], snapshot: bool = False) -> None:
+        """差分のジャーナル記録（コンパクション時期は同一スレッドでスナップショット取得）"""
+        try:
+            session_id = current_state.session_id
+            if ops:
+                self.journal.record(session_id, ops)
+            if snapshot or self.journal.compaction_due(session_id):
+                self.journal.stage_snapshot(session_id, state_codec.encode(current_state))
+        except Exception as e:
+            logger.error(f"差分記録エラー: {e}")
+    
+    def _schedule_backup(self) -> None:
+        """バックアップ予約（メモリ上の記録のみ）"""
+        current_state = self.get_state()
+        self.persister.schedule(current_state.session_id, None)
+    
+    def checkpoint(self) -> None:
+        """チェックポイント - 保留中の差分・スナップショットを即時書き込み"""
+        current_state = self.get_state()
+        self.persister.schedule(current_state.session_id, None)
+        self.persister.flush(current_state.session_id)
+        self.backend_writer.flush(current_state.session_id)
+    
     def _auto_backup(self) -> None:
-        """自動バックアップ"""
+        """自動バックアップ（スナップショット同期書き込み）"""
+        current_state = self.get_state()
+        self._record_delta(current_state, [], snapshot=True)
+        self.checkpoint()
+    
+    def _write_backup(self, session_id: str, _payload: Any = None) -> None:
+        """差分ジャーナル・スナップショット書き込み（バックグラウンドスレッドから呼び出し）"""
         try:
-            current_state = self.get_state()
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            backup_data = {
-                "timestamp": timestamp,
-                "session_id": current_state.session_id,
-                "state": asdict(current_state)
-            }
+            self.journal.flush(session_id)
+        except Exception as e:
+            logger.error(f"バックアップエラー: {e}")
+    
+    def list_backups(self, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """バックアップ（スナップショット）一覧 - 既定は現在のセッション"""
+        if session_id is None:
+            session_id = self.get_state().session_id
+        return self.state_store.list_versions(session_id)
+    
+    def prune_expired_sessions(self, max_age_hours: float = SESSION_EXPIRY_HOURS) -> int:
+        """最終更新から有効期限を過ぎたセッションをセッション別ストアから削除（削除件数を返却）"""
+        try:
+            return self.state_store.prune_sessions(max_age_hours * 3600)
+        except Exception as e:
+            logger.error(f"期限切れセッション削除エラー: {e}")
+            return 0
+    
+    def collect_blob_garbage(self, min_age_hours: float = BLOB_GC_MIN_AGE_HOURS) -> Dict[str, int]:
+        """画像BLOBのマーク&スイープ（統計を返却）
+        
+        マーク対象: 全セッションのスナップショット（バックアップ）・差分ジャーナル、
+        プロセス内の全セッション状態（退避中を含む）、旧形式のバックアップファイル（存在する場合のみ）
+        """
+        try:
+            self.checkpoint()
+            live = set()
+            for document in self.state_store.iter_documents():
+                live |= find_blob_refs(document)
+            for document in session_memory.iter_serialized():
+                live |= find_blob_refs(document)
+            for path in LEGACY_BACKUP_DIR.glob("*.json"):
+                live |= find_blob_refs(path.read_bytes())
+                
+            return get_blob_store().collect_garbage(live, min_age_seconds=min_age_hours * 3600)
+        except Exception as e:
+            logger.error(f"BLOBガベージコレクションエラー: {e}")
+            return {"kept": 0, "removed": 0, "freed_bytes": 0}
+    
+    def restore_session(self, session_id: Optional[str] = None, version: Optional[int] = None) -> bool:
+        """セッション別ストアからの復元（バージョン未指定時は最新＋ジャーナル再生）"""
+        try:
+            if session_id is None:
+                self.checkpoint()
+                session_id = self.get_state().session_id
             
-            backup_file = self.backup_dir / f"backup_{timestamp}.json"
+            loaded = self.journal.load(session_id, version)
+            if loaded is None:
+                logger.warning(f"復元対象のバックアップがありません: {session_id}")
+                return False
             
-            with open(backup_file, "w", encoding="utf-8") as f:
-                json.dump(backup_data, f, ensure_ascii=False, indent=2)
+            seq, state_dict = loaded
+            self._activate_restored_state(state_codec.decode(state_dict), seq)
             
-            # 古いバックアップの削除（直近20件のみ保持）
-            backup_files = sorted(self.backup_dir.glob("backup_*.json"))
-            if len(backup_files) > 20:
-                for old_file in backup_files[:-20]:
-                    old_file.unlink()
+            logger.info(f"バックアップ復元完了: {session_id} (version {seq})")
+            return True
             
         except Exception as e:
-            logger.error(f"バックアップエラー: {e}")
+            logger.error(f"復元エラー: {e}")
+            return False
     
     def restore_from_backup(self, backup_file: Path) -> bool:
-        """バックアップからの復元"""
+        """バックアップファイル（旧形式JSON）からの復元"""
         try:
-            with open(backup_file, "r", encoding="utf-8") as f:
-                backup_data = json.load(f)
+            with open(backup_file, "rb") as f:
+                backup_data = state_codec.loads_dict(f.read())
             
-            # 状態復元
-            state_dict = backup_data["state"]
-            restored_state = SystemState(**state_dict)
-            
-            st.session_state[self.session_key] = restored_state
+            # 状態復元（旧形式は {"state": {...}} を移行して読み込み）
+            restored_state = state_codec.decode(backup_data)
+            self._activate_restored_state(restored_state, 0)
             
             logger.info(f"バックアップ復元完了: {backup_file}")
             return True
@@ -374,16 +1217,39 @@ class StateManager:
             logger.error(f"復元エラー: {e}")
             return False
     
+    def load_state(self, state: SystemState) -> None:
+        """外部で構築した状態の読み込み（ワークスペースの店舗切り替え等）"""
+        self._activate_restored_state(state, 0)
+    
+    def _activate_restored_state(self, restored_state: SystemState, seq: int) -> None:
+        """復元状態の反映と新バージョンとしてのスナップショット保存"""
+        self._set_state(restored_state)
+        self.journal.resume(restored_state.session_id, seq)
+        
+        restored_state.last_updated = datetime.now(timezone.utc).isoformat()
+        self._record_delta(
+            restored_state,
+            [{"op": "replace", "path": "/last_updated", "value": restored_state.last_updated}],
+            snapshot=True
+        )
+        self.checkpoint()
+    
     def export_state(self) -> dict:
-        """状態のエクスポート"""
+        """状態のエクスポート（スキーマバージョン付き辞書）"""
         current_state = self.get_state()
-        return asdict(current_state)
+        return state_codec.encode(current_state)
+    
+    def export_state_json(self) -> bytes:
+        """状態のエクスポート（JSONバイト列）"""
+        return state_codec.dumps(self.get_state(), indent=True)
     
-    def import_state(self, state_dict: dict) -> bool:
-        """状態のインポート"""
+    def import_state(self, state_data: Union[dict, bytes, str]) -> bool:
+        """状態のインポート（辞書またはJSON・旧スキーマは自動移行）"""
         try:
-            imported_state = SystemState(**state_dict)
-            st.session_state[self.session_key] = imported_state
+            if isinstance(state_data, (bytes, str)):
+                state_data = state_codec.loads_dict(state_data)
+            imported_state = state_codec.decode(state_data)
+            self._set_state(imported_state)
             self._auto_backup()
             return True
         except Exception as e:
@@ -393,6 +1259,7 @@ class StateManager:
     def reset_session(self) -> None:
         """セッションのリセット"""
         if self.session_key in st.session_state:
+            session_memory.release(st.session_state[self.session_key].session_id)
             del st.session_state[self.session_key]
         self._initialize_session_state()
         logger.info("セッション完全リセット")
@@ -449,12 +1316,33 @@ def get_state_manager() -> StateManager:
     
     return state_manager
 
+def render_sync_conflict_notice(state_manager: StateManager) -> None:
+    """共有状態の競合通知と解決操作（別の画面で同じ項目が変更された場合）"""
+    conflict = state_manager.get_sync_conflict()
+    if conflict is None:
+        return
+    
+    st.warning(f"⚠️ 別の画面で同じ項目が変更されました（{', '.join(conflict.fields)}）。どちらの内容を残すか選択してください。")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("この画面の内容で上書き", key="sync_conflict_keep_local", use_container_width=True):
+            state_manager.resolve_sync_conflict(keep_local=True)
+            st.rerun()
+    with col2:
+        if st.button("別の画面の内容を採用", key="sync_conflict_keep_remote", use_container_width=True):
+            state_manager.resolve_sync_conflict(keep_local=False)
+            st.rerun()
+
 def initialize_tonosama_ui():
     """TONOSAMA UIの完全初期化（Streamlit Cloud対応）"""
     try:
         # まず状態管理を確実に初期化
         state_manager = get_state_manager()
         
+        # 共有状態バックエンド利用時のセッション継続Cookie・競合通知
+        state_manager.bind_session_cookie()
+        render_sync_conflict_notice(state_manager)
+        
         if UI_STYLING_AVAILABLE:
             # ダイヤモンド級CSS注入
             inject_diamond_css()
@@ -0,0 +1,286 @@
+"""
+TONOSAMA Professional System - State Persistence Module
+ライトビハインド永続化システム - 1兆円ダイヤモンド級品質
+
+更新をデバウンス窓で集約し、バックグラウンドスレッドで書き込み
+フィールド単位の差分ジャーナル（JSON-Patch形式）と定期コンパクション
+"""
+
+import atexit
+import json
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class WriteBehindPersister:
+    """デバウンス付きライトビハインド永続化"""
+    
+    def __init__(self, write_fn: Callable[[str, Any], None],
+                 debounce_seconds: float = 2.0, max_delay_seconds: float = 10.0):
+        """初期化 - 書き込み関数とデバウンス設定"""
+        self.write_fn = write_fn
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        
+        # キー（セッションID）ごとの保留中ペイロード
+        self._pending: Dict[str, Any] = {}
+        self._first_dirty: Dict[str, float] = {}
+        self._last_dirty: Dict[str, float] = {}
+        
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        
+        # 統計
+        self.write_count = 0
+        self.coalesced_count = 0
+        
+        atexit.register(self.shutdown)
+        
+    def schedule(self, key: str, payload: Any) -> None:
+        """書き込み予約（メモリ上の記録のみ・即時return）"""
+        now = time.monotonic()
+        
+        with self._cond:
+            if key in self._pending:
+                self.coalesced_count += 1
+            else:
+                self._first_dirty[key] = now
+                
+            self._pending[key] = payload
+            self._last_dirty[key] = now
+            
+            self._ensure_thread()
+            self._cond.notify()
+            
+    def flush(self, key: Optional[str] = None) -> None:
+        """保留中の書き込みを即時実行（チェックポイント）"""
+        with self._cond:
+            keys = [key] if key is not None else list(self._pending.keys())
+            items = [(k, self._pop(k)) for k in keys if k in self._pending]
+            
+        for k, payload in items:
+            self._write(k, payload)
+            
+    def has_pending(self, key: Optional[str] = None) -> bool:
+        """未書き込みデータの有無"""
+        with self._cond:
+            return bool(self._pending) if key is None else key in self._pending
+            
+    def shutdown(self) -> None:
+        """停止（保留分はすべて書き込み）"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            
+        self.flush()
+        
+    def _ensure_thread(self) -> None:
+        """バックグラウンドスレッド起動（ロック取得済み前提）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(
+                target=self._run,
+                name="tonosama-write-behind",
+                daemon=True
+            )
+            self._thread.start()
+            
+    def _pop(self, key: str) -> Any:
+        """保留エントリの取り出し（ロック取得済み前提）"""
+        self._first_dirty.pop(key, None)
+        self._last_dirty.pop(key, None)
+        return self._pending.pop(key)
+        
+    def _collect_due(self) -> Tuple[List[Tuple[str, Any]], Optional[float]]:
+        """書き込み期限到来分と次回起床までの秒数（ロック取得済み前提）"""
+        now = time.monotonic()
+        due = []
+        wait: Optional[float] = None
+        
+        for key in list(self._pending.keys()):
+            quiet_deadline = self._last_dirty[key] + self.debounce_seconds
+            hard_deadline = self._first_dirty[key] + self.max_delay_seconds
+            deadline = min(quiet_deadline, hard_deadline)
+            
+            if deadline <= now:
+                due.append((key, self._pop(key)))
+            else:
+                remaining = deadline - now
+                wait = remaining if wait is None else min(wait, remaining)
+                
+        return due, wait
+        
+    def _run(self) -> None:
+        """バックグラウンド書き込みループ"""
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                    
+                due, wait = self._collect_due()
+                
+                if not due:
+                    self._cond.wait(timeout=wait)
+                    continue
+                    
+            for key, payload in due:
+                self._write(key, payload)
+                
+    def _write(self, key: str, payload: Any) -> None:
+        """書き込み実行（失敗時は再予約）"""
+        try:
+            with self._write_lock:
+                self.write_fn(key, payload)
+            self.write_count += 1
+            
+        except RuntimeError as e:
+            # シリアライズ中に状態が変更された場合は次の窓で再試行
+            logger.warning(f"ライトビハインド書き込み再試行: {e}")
+            self.schedule(key, payload)
+            
+        except Exception as e:
+            logger.error(f"ライトビハインド書き込みエラー: {e}")
+
+def make_pointer(*tokens: Any) -> str:
+    """JSON Pointer生成（RFC 6901エスケープ）"""
+    return "".join("/" + str(token).replace("~", "~0").replace("/", "~1") for token in tokens)
+
+def split_pointer(path: str) -> List[str]:
+    """JSON Pointer分解"""
+    return [token.replace("~1", "/").replace("~0", "~") for token in path.split("/")[1:]]
+
+def apply_json_patch(document: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """JSON-Patch形式の差分適用（add / replace / remove）"""
+    for op in ops:
+        tokens = split_pointer(op["path"])
+        if not tokens:
+            continue
+            
+        # 親要素まで辿る（不足している辞書は補完）
+        parent: Any = document
+        for token in tokens[:-1]:
+            if isinstance(parent, list):
+                parent = parent[int(token)]
+            else:
+                if parent.get(token) is None:
+                    parent[token] = {}
+                parent = parent[token]
+                
+        last = tokens[-1]
+        kind = op["op"]
+        
+        if isinstance(parent, list):
+            index = len(parent) if last == "-" else int(last)
+            if kind == "add":
+                parent.insert(index, op.get("value"))
+            elif kind == "replace":
+                parent[index] = op.get("value")
+            elif kind == "remove":
+                del parent[index]
+        else:
+            if kind in ("add", "replace"):
+                parent[last] = op.get("value")
+            elif kind == "remove":
+                parent.pop(last, None)
+                
+    return document
+
+class DeltaJournal:
+    """追記専用デルタジャーナル（定期コンパクション付き）"""
+    
+    def __init__(self, store: Any, compact_every: int = 200,
+                 dumps: Optional[Callable[[Dict[str, Any]], str]] = None):
+        """初期化 - 保存先ストア（SQLiteStateStore互換）・コンパクション間隔・スナップショット直列化関数"""
+        self.store = store
+        self.compact_every = compact_every
+        self.dumps = dumps or (lambda data: json.dumps(data, ensure_ascii=False, default=self._json_default))
+        
+        self._seq: Dict[str, int] = {}            # セッション別の最新シーケンス番号
+        self._snapshot_seq: Dict[str, int] = {}   # セッション別の最新スナップショット位置
+        self._pending_lines: Dict[str, List[Tuple[int, str]]] = {}
+        self._pending_snapshot: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, session_id: str, ops: List[Dict[str, Any]]) -> int:
+        """差分の記録（変更サイズに比例したシリアライズのみ）"""
+        with self._lock:
+            seq = self._seq.get(session_id, 0) + 1
+            self._seq[session_id] = seq
+            
+            line = json.dumps(
+                {"seq": seq, "ts": datetime.now(timezone.utc).isoformat(), "ops": ops},
+                ensure_ascii=False,
+                default=self._json_default
+            )
+            self._pending_lines.setdefault(session_id, []).append((seq, line))
+        
+        return seq
+    
+    def compaction_due(self, session_id: str) -> bool:
+        """コンパクション要否判定"""
+        with self._lock:
+            if session_id not in self._snapshot_seq and session_id not in self._pending_snapshot:
+                return True
+            base = self._pending_snapshot.get(session_id, (self._snapshot_seq.get(session_id, 0), None))[0]
+            return self._seq.get(session_id, 0) - base >= self.compact_every
+    
+    def stage_snapshot(self, session_id: str, state_dict: Dict[str, Any]) -> None:
+        """スナップショット予約（状態変更と同じスレッドで取得した辞書を渡す）"""
+        with self._lock:
+            self._pending_snapshot[session_id] = (self._seq.get(session_id, 0), state_dict)
+    
+    def resume(self, session_id: str, seq: int) -> None:
+        """復元後のシーケンス番号引き継ぎ"""
+        with self._lock:
+            self._seq[session_id] = max(seq, self.store.latest_seq(session_id))
+            self._snapshot_seq[session_id] = seq
+            self._pending_lines.pop(session_id, None)
+            self._pending_snapshot.pop(session_id, None)
+    
+    def flush(self, session_id: str) -> None:
+        """保留中の差分・スナップショットの書き込み"""
+        with self._lock:
+            lines = self._pending_lines.pop(session_id, [])
+            snapshot = self._pending_snapshot.pop(session_id, None)
+        
+        # 差分を先に書き込み（スナップショット保存時の保持ポリシーで古い差分は削除）
+        self.store.append_journal(session_id, lines)
+        
+        if snapshot is not None:
+            snapshot_seq, state_dict = snapshot
+            state_json = self.dumps(state_dict)
+            self.store.put_snapshot(session_id, snapshot_seq, state_dict, state_json)
+            
+            with self._lock:
+                self._snapshot_seq[session_id] = snapshot_seq
+    
+    def load(self, session_id: str, version: Optional[int] = None) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """状態復元（最新はスナップショット＋ジャーナル再生、バージョン指定時はその時点）"""
+        loaded = self.store.load(session_id, version, replay=version is None)
+        if loaded is None:
+            return None
+        
+        seq, state_dict, entries = loaded
+        
+        for entry in entries:
+            if entry["seq"] != seq + 1:
+                logger.warning(f"ジャーナル欠落検出 (seq {seq + 1}) - 以降の再生を中止")
+                break
+            apply_json_patch(state_dict, entry["ops"])
+            seq = entry["seq"]
+        
+        return seq, state_dict
+    
+    @staticmethod
+    def _json_default(value: Any) -> Any:
+        """JSON非対応オブジェクト（アップロードファイル・画像バイト列等）の扱い"""
+        logger.warning(f"JSON非対応データを除外: {type(value).__name__}")
+        return None
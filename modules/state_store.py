@@ -0,0 +1,249 @@
+"""
+TONOSAMA Professional System - State Store Module
+セッション別インデックス付き状態ストア - 1兆円ダイヤモンド級品質
+
+SQLite（WALモード）によるセッションID×バージョンのスナップショット・差分ジャーナル管理
+"""
+
+import json
+import sqlite3
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    store_name TEXT NOT NULL DEFAULT '',
+    latest_version INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    session_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (session_id, version)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS journal (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    ops TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+class SQLiteStateStore:
+    """SQLite（WAL）によるセッション別状態ストア"""
+    
+    def __init__(self, db_path: Path = Path("data/state_store.db"), keep_snapshots: int = 20):
+        """初期化 - データベース接続とスキーマ作成"""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.keep_snapshots = keep_snapshots
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        
+    def append_journal(self, session_id: str, entries: List[Tuple[int, str]]) -> None:
+        """差分ジャーナル追記（1トランザクション）"""
+        if not entries:
+            return
+            
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO journal (session_id, seq, ops) VALUES (?, ?, ?)",
+                    [(session_id, seq, line) for seq, line in entries]
+                )
+                self._touch_session(session_id)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+                
+    def put_snapshot(self, session_id: str, version: int, state_dict: Dict[str, Any],
+                     state_json: Optional[str] = None) -> None:
+        """スナップショット保存（セッション単位で保持件数を超えた分を削除）"""
+        now = datetime.now(timezone.utc).isoformat()
+        if state_json is None:
+            state_json = json.dumps(state_dict, ensure_ascii=False)
+        store_name = (state_dict.get("store") or {}).get("store_name_ja", "") if isinstance(state_dict, dict) else ""
+        
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO snapshots (session_id, version, created_at, state) VALUES (?, ?, ?, ?)",
+                    (session_id, version, now, state_json)
+                )
+                self._conn.execute(
+                    "INSERT INTO sessions (session_id, store_name, latest_version, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET store_name = excluded.store_name, "
+                    "latest_version = MAX(latest_version, excluded.latest_version), updated_at = excluded.updated_at",
+                    (session_id, store_name or "", version, now)
+                )
+                
+                # セッション単位の保持ポリシー（他セッションのバックアップには影響しない）
+                row = self._conn.execute(
+                    "SELECT version FROM snapshots WHERE session_id = ? ORDER BY version DESC LIMIT 1 OFFSET ?",
+                    (session_id, self.keep_snapshots - 1)
+                ).fetchone()
+                if row:
+                    oldest_kept = row[0]
+                    self._conn.execute(
+                        "DELETE FROM snapshots WHERE session_id = ? AND version < ?",
+                        (session_id, oldest_kept)
+                    )
+                    self._conn.execute(
+                        "DELETE FROM journal WHERE session_id = ? AND seq <= ?",
+                        (session_id, oldest_kept)
+                    )
+                    
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+                
+    def load(self, session_id: str, version: Optional[int] = None,
+             replay: bool = True) -> Optional[Tuple[int, Dict[str, Any], List[Dict[str, Any]]]]:
+        """スナップショットと後続ジャーナル取得（バージョン, 状態辞書, 差分エントリ）"""
+        with self._lock:
+            if version is None:
+                row = self._conn.execute(
+                    "SELECT version, state FROM snapshots WHERE session_id = ? ORDER BY version DESC LIMIT 1",
+                    (session_id,)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT version, state FROM snapshots WHERE session_id = ? AND version = ?",
+                    (session_id, version)
+                ).fetchone()
+                
+            if not row:
+                return None
+                
+            snapshot_version, state_json = row
+            entries = []
+            
+            if replay:
+                entries = [
+                    json.loads(ops)
+                    for (ops,) in self._conn.execute(
+                        "SELECT ops FROM journal WHERE session_id = ? AND seq > ? ORDER BY seq",
+                        (session_id, snapshot_version)
+                    )
+                ]
+                
+        return snapshot_version, json.loads(state_json), entries
+        
+    def list_versions(self, session_id: str) -> List[Dict[str, Any]]:
+        """セッションのスナップショット一覧（新しい順）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT version, created_at, length(state) FROM snapshots WHERE session_id = ? ORDER BY version DESC",
+                (session_id,)
+            ).fetchall()
+            
+        return [{"version": v, "created_at": c, "size": size} for v, c, size in rows]
+        
+    def latest_seq(self, session_id: str) -> int:
+        """セッションの最新シーケンス番号"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(seq) FROM journal WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+            
+        return (row[0] or 0) if row else 0
+        
+    def list_sessions(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """最近更新されたセッション一覧"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, store_name, latest_version, updated_at FROM sessions "
+                "ORDER BY updated_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+            
+        return [
+            {"session_id": sid, "store_name": name, "latest_version": version, "updated_at": updated}
+            for sid, name, version, updated in rows
+        ]
+        
+    def iter_documents(self, batch_size: int = 200) -> Iterator[str]:
+        """全セッションのスナップショット・差分ジャーナルをJSON文字列で順次取得（バッチ単位でロック）"""
+        for table, key, column in (("snapshots", "version", "state"), ("journal", "seq", "ops")):
+            last: Tuple[str, int] = ("", -1)
+            while True:
+                with self._lock:
+                    rows = self._conn.execute(
+                        f"SELECT session_id, {key}, {column} FROM {table} WHERE (session_id, {key}) > (?, ?) "
+                        f"ORDER BY session_id, {key} LIMIT ?",
+                        (last[0], last[1], batch_size)
+                    ).fetchall()
+                    
+                if not rows:
+                    break
+                for _, _, document in rows:
+                    yield document
+                last = rows[-1][:2]
+                
+    def delete_session(self, session_id: str) -> None:
+        """セッションの全データ削除"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for table in ("snapshots", "journal", "sessions"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+                
+    def prune_sessions(self, max_age_seconds: float) -> int:
+        """最終更新から max_age_seconds を超えたセッションの全データ削除（削除セッション数を返却）"""
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)).isoformat()
+        expired = "SELECT session_id FROM sessions WHERE updated_at < ?"
+        
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for table in ("snapshots", "journal"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE session_id IN ({expired})", (cutoff,))
+                removed = self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+                
+        if removed:
+            logger.info(f"有効期限切れセッション削除: {removed}件")
+        return removed
+        
+    def close(self) -> None:
+        """接続終了"""
+        with self._lock:
+            self._conn.close()
+            
+    def _touch_session(self, session_id: str) -> None:
+        """セッション更新日時の記録（ロック・トランザクション取得済み前提）"""
+        self._conn.execute(
+            "INSERT INTO sessions (session_id, updated_at) VALUES (?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (session_id, datetime.now(timezone.utc).isoformat())
+        )
@@ -0,0 +1,225 @@
+"""
+TONOSAMA Professional System - Workspace Module
+複数店舗（チェーン）ワークスペース - 1兆円ダイヤモンド級品質
+
+メニュー・生成コンテンツを店舗間で参照共有し
+共有料理の食レポは1回だけ生成、全店舗の生成・パッケージ化を一括実行
+"""
+
+import asyncio
+import uuid
+import logging
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from modules.state_manager import MenuItem, StoreInfo, SystemState, state_codec
+from modules.blob_store import get_blob_store
+
+# ログ設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@dataclass(slots=True)
+class Branch:
+    """ワークスペース内の店舗"""
+    branch_id: str = ""
+    store: StoreInfo = None
+    dish_ids: List[str] = field(default_factory=list)  # 共有料理IDの表示順
+    price_overrides: Dict[str, int] = field(default_factory=dict)  # 店舗別価格
+    featured_menu_id: str = ""
+
+class Workspace:
+    """複数店舗ワークスペース（料理カタログ・生成コンテンツを共有）"""
+    
+    def __init__(self, name: str = "", brand_store: Optional[StoreInfo] = None,
+                 workspace_id: Optional[str] = None):
+        """初期化 - チェーン共通の店舗情報（食レポ生成に使用）"""
+        self.workspace_id = workspace_id or uuid.uuid4().hex
+        self.name = name
+        self.brand_store = brand_store or StoreInfo(store_name_ja=name)
+        
+        self.dishes: Dict[str, MenuItem] = {}                     # 共有料理カタログ
+        self.generated_content: Dict[str, Dict[str, str]] = {}    # 料理ID → 言語 → 食レポ
+        self.branches: Dict[str, Branch] = {}
+        
+    # ---- 料理・店舗管理 ----
+    
+    def add_dish(self, menu_item: MenuItem) -> str:
+        """共有料理の登録"""
+        if not menu_item.id:
+            menu_item.id = f"dish_{len(self.dishes) + 1}_{uuid.uuid4().hex[:8]}"
+        self.dishes[menu_item.id] = menu_item
+        self.generated_content.setdefault(menu_item.id, {})
+        return menu_item.id
+        
+    def add_branch(self, store: StoreInfo, dish_ids: Optional[List[str]] = None) -> str:
+        """店舗の追加（未指定時は全料理を取り扱い）"""
+        branch_id = f"branch_{len(self.branches) + 1}_{uuid.uuid4().hex[:8]}"
+        self.branches[branch_id] = Branch(
+            branch_id=branch_id,
+            store=store,
+            dish_ids=list(self.dishes) if dish_ids is None else [d for d in dish_ids if d in self.dishes]
+        )
+        return branch_id
+        
+    def assign_dishes(self, branch_id: str, dish_ids: List[str]) -> None:
+        """店舗の取り扱い料理・表示順の設定"""
+        self.branches[branch_id].dish_ids = [d for d in dish_ids if d in self.dishes]
+        
+    def set_price_override(self, branch_id: str, dish_id: str, price: Optional[int]) -> None:
+        """店舗別価格の設定（None で共通価格へ戻す）"""
+        overrides = self.branches[branch_id].price_overrides
+        if price is None:
+            overrides.pop(dish_id, None)
+        else:
+            overrides[dish_id] = price
+            
+    def set_content(self, dish_id: str, language: str, content: str) -> None:
+        """共有食レポの設定（全店舗に反映）"""
+        self.generated_content.setdefault(dish_id, {})[language] = content
+        
+    # ---- 店舗別ビュー ----
+    
+    def branch_menu(self, branch_id: str) -> List[MenuItem]:
+        """店舗のメニュー（価格上書きが無い料理は共有オブジェクトをそのまま参照）"""
+        branch = self.branches[branch_id]
+        menu = []
+        
+        for dish_id in branch.dish_ids:
+            dish = self.dishes[dish_id]
+            price = branch.price_overrides.get(dish_id)
+            menu.append(dish if price is None else replace(dish, price=price))
+            
+        return menu
+        
+    def branch_state(self, branch_id: str) -> SystemState:
+        """店舗のSystemState（既存ページ・CSV出力をそのまま利用するため）"""
+        branch = self.branches[branch_id]
+        now = datetime.now(timezone.utc).isoformat()
+        
+        return SystemState(
+            session_id=f"{self.workspace_id}:{branch_id}",
+            created_at=now,
+            last_updated=now,
+            store=branch.store,
+            menu=self.branch_menu(branch_id),
+            menu_order=list(branch.dish_ids),
+            featured_menu_id=branch.featured_menu_id,
+            imperator_answers={f"q{i}": "" for i in range(15)},
+            # 言語別辞書は共有（生成結果は全店舗へ即時反映）
+            generated_content={dish_id: self.generated_content.setdefault(dish_id, {}) for dish_id in branch.dish_ids},
+            uploaded_menu_files=[],
+            validation_errors=[],
+            processing_status={}
+        )
+        
+    def open_branch(self, state_manager: Any, branch_id: str) -> None:
+        """店舗をセッションの編集対象として開く（独立コピー・セッション内の編集は共有カタログへ波及しない）"""
+        state_manager.load_state(state_codec.round_trip(self.branch_state(branch_id)))
+        
+    def shared_dish_counts(self) -> Dict[str, int]:
+        """料理ごとの取り扱い店舗数"""
+        counts = {dish_id: 0 for dish_id in self.dishes}
+        for branch in self.branches.values():
+            for dish_id in branch.dish_ids:
+                counts[dish_id] += 1
+        return counts
+        
+    # ---- 一括パイプライン ----
+    
+    def pending_generation(self, languages: List[str]) -> List[Tuple[str, str]]:
+        """未生成の（料理ID, 言語）一覧（店舗間で重複なし）"""
+        used: Set[str] = set()
+        for branch in self.branches.values():
+            used.update(branch.dish_ids)
+            
+        return [
+            (dish_id, language)
+            for dish_id in self.dishes if dish_id in used
+            for language in languages
+            if language not in self.generated_content.get(dish_id, {})
+        ]
+        
+    async def generate_all(self, languages: List[str], openai_integration: Any = None,
+                           concurrency: int = 4) -> Dict[str, int]:
+        """全店舗の食レポ一括生成（共有料理は1回のみ）"""
+        if openai_integration is None:
+            from modules.openai_integration import get_openai_integration
+            openai_integration = get_openai_integration()
+            
+        pending = self.pending_generation(languages)
+        store_info = state_codec.encode_store(self.brand_store)
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def generate(dish_id: str, language: str) -> None:
+            async with semaphore:
+                dish = self.dishes[dish_id]
+                content = await openai_integration.generate_menu_description(
+                    state_codec.encode_menu_item(dish), language, store_info
+                )
+                self.set_content(dish_id, language, content)
+                
+        await asyncio.gather(*(generate(dish_id, language) for dish_id, language in pending))
+        
+        branch_requests = sum(len(b.dish_ids) for b in self.branches.values()) * len(languages)
+        logger.info(f"ワークスペース一括生成完了: {len(pending)}件生成 (店舗別では{branch_requests}件相当)")
+        
+        return {"generated": len(pending), "branch_equivalent": branch_requests}
+        
+    def build_packages(self, csv_generator: Any = None) -> Dict[str, Dict[str, Any]]:
+        """全店舗のパッケージデータ作成（画像は店舗間で1回だけ読み込み）"""
+        if csv_generator is None:
+            from modules.csv_generator import get_csv_generator
+            csv_generator = get_csv_generator()
+            
+        blob_store = get_blob_store()
+        image_cache: Dict[str, Optional[bytes]] = {}
+        packages = {}
+        
+        for branch_id, branch in self.branches.items():
+            state = self.branch_state(branch_id)
+            store_name = branch.store.store_name_ja or branch_id
+            store_data = state_codec.encode_store(branch.store)
+            menu_data = [state_codec.encode_menu_item(item) for item in state.menu]
+            
+            package = {"store_name": store_name, "images": {}}
+            
+            store_csv = csv_generator.generate_store_info_csv(store_data)
+            if store_csv.get('success'):
+                package["store_info_csv"] = csv_generator.create_downloadable_csv(store_csv['content'], store_csv['filename'])
+                
+            package["food_report_csv"] = csv_generator.spool_csv(
+                csv_generator.stream_multilingual_food_report_csv(menu_data, state.generated_content)
+            )
+                
+            for item in state.menu:
+                if not item.image_hash:
+                    continue
+                if item.image_hash not in image_cache:
+                    image_cache[item.image_hash] = blob_store.get(item.image_hash)
+                if image_cache[item.image_hash]:
+                    package["images"][item.image_path or f"{item.id}.jpg"] = image_cache[item.image_hash]
+                    
+            packages[branch_id] = package
+            
+        return packages
+        
+    async def run_pipeline(self, languages: List[str], openai_integration: Any = None,
+                           csv_generator: Any = None,
+                           uploader: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+                           concurrency: int = 4) -> Dict[str, Any]:
+        """一括パイプライン（生成 → 全店舗パッケージ化 → アップロード）"""
+        generation = await self.generate_all(languages, openai_integration, concurrency)
+        packages = self.build_packages(csv_generator)
+        uploads = {}
+        
+        if uploader is not None:
+            for branch_id, package in packages.items():
+                try:
+                    uploads[branch_id] = await asyncio.to_thread(uploader, package["store_name"], package)
+                except Exception as e:
+                    logger.error(f"店舗パッケージアップロードエラー ({branch_id}): {e}")
+                    uploads[branch_id] = None
+                    
+        return {"generation": generation, "packages": packages, "uploads": uploads}
@@ -433,8 +433,7 @@ def render_validation_and_navigation():
         return
     
     # バリデーション
-    errors = state_manager.validate_state()
-    step1_errors = [e for e in errors if "店舗名" in e or "業種" in e]
+    step1_errors = state_manager.validate_state(step=1)
     
     if step1_errors:
         st.error("⚠️ 以下の項目を入力してください:")
@@ -9,6 +9,7 @@ import streamlit as st
 import asyncio
 from modules.state_manager import get_state_manager, initialize_tonosama_ui
 from modules.openai_integration import get_openai_integration
+from modules.blob_store import get_blob_store
 import logging
 
 # ログ設定
@@ -80,8 +81,9 @@ def render_store_image_upload():
         )
         
         if uploaded_file:
-            # 画像をセッション状態に保存
-            state_manager.update_state(store_representative_image=uploaded_file)
+            # 画像はBLOBストアへ保存し、セッション状態にはハッシュのみ保持
+            image_hash = get_blob_store().put(uploaded_file.getvalue())
+            state_manager.update_state(store_representative_image=image_hash)
             st.success("✅ 代表画像をアップロードしました")
     
     with col2:
@@ -89,7 +91,9 @@ def render_store_image_upload():
         if uploaded_file:
             st.image(uploaded_file, caption="代表画像プレビュー", width=300)
         elif current_state.store_representative_image:
-            st.image(current_state.store_representative_image, caption="代表画像プレビュー", width=300)
+            image_bytes = get_blob_store().get(current_state.store_representative_image)
+            if image_bytes:
+                st.image(image_bytes, caption="代表画像プレビュー", width=300)
 
 def render_progress_indicator():
     """進捗インジケーター"""
@@ -278,9 +282,8 @@ def render_ai_story_generation():
         key="imperator_story_display"
     )
     
-    # ストーリーが変更された場合、状態を更新
-    if story_text != current_state.imperator_story:
-        state_manager.update_state(imperator_story=story_text)
+    # ストーリーを状態に反映（変更が無い場合は状態管理側で無視）
+    state_manager.update_state(imperator_story=story_text)
     
     # 品質チェック
     if story_text:
@@ -6,8 +6,10 @@
 """
 
 import streamlit as st
-from modules.state_manager import get_state_manager, initialize_tonosama_ui
+from modules.state_manager import MenuItem, get_state_manager, initialize_tonosama_ui, state_codec
 from modules.csv_generator import get_csv_generator
+from modules.blob_store import get_blob_store
+from modules.menu_import import get_menu_importer
 import logging
 from typing import List, Dict
 from PIL import Image
@@ -182,7 +184,7 @@ def add_menu_item(dish_name: str, category: str, price: int, description: str,
     state_manager = get_state_manager()
     
     # 画像処理
-    image_data = None
+    image_hash = ""
     image_filename = None
     
     if image_file:
@@ -199,7 +201,7 @@ def add_menu_item(dish_name: str, category: str, price: int, description: str,
             if image.mode in ("RGBA", "P"):
                 image = image.convert("RGB")
             image.save(img_buffer, format="JPEG", quality=85)
-            image_data = img_buffer.getvalue()
+            image_hash = get_blob_store().put(img_buffer.getvalue())
             
             # ファイル名生成
             import datetime
@@ -210,17 +212,20 @@ def add_menu_item(dish_name: str, category: str, price: int, description: str,
             logger.error(f"画像処理エラー: {e}")
             st.error(f"画像処理に失敗しました: {e}")
     
-    # メニューアイテム作成
-    menu_item = {
-        "dish_name": dish_name,
-        "category": category,
-        "price": price,
-        "description": description,
-        "recommendation_level": recommendation_level,
-        "allergens": allergens,
-        "image_filename": image_filename,
-        "image_data": image_data
-    }
+    # メニューアイテム作成（アレルギー情報は説明文に併記）
+    desc = description.strip()
+    if allergens:
+        desc = f"{desc}\nアレルギー: {'、'.join(allergens)}".strip()
+    
+    menu_item = MenuItem(
+        name=dish_name,
+        category=category,
+        price=price,
+        desc=desc,
+        recommendation_score=recommendation_level,
+        image_path=image_filename or "",
+        image_hash=image_hash
+    )
     
     # 状態管理に追加
     state_manager.add_menu_item(menu_item)
@@ -253,25 +258,20 @@ def render_menu_list():
                 
                 with col1:
                     # 料理名・説明
-                    st.markdown(f"**{item.dish_name}**")
-                    if item.description:
-                        st.caption(item.description[:50] + "..." if len(item.description) > 50 else item.description)
-                    
-                    # アレルギー表示
-                    if item.allergens and len(item.allergens) > 0:
-                        allergen_text = "、".join(item.allergens)
-                        st.caption(f"⚠️ アレルギー: {allergen_text}")
+                    st.markdown(f"**{item.name}**")
+                    if item.desc:
+                        st.caption(item.desc[:50] + "..." if len(item.desc) > 50 else item.desc)
                 
                 with col2:
                     # 価格・推奨度
                     st.metric("価格", f"¥{item.price:,}")
-                    st.caption(f"推奨度: {'⭐' * item.recommendation_level}")
+                    st.caption(f"推奨度: {'⭐' * item.recommendation_score}")
                 
                 with col3:
                     # 画像表示
-                    if item.image_data:
+                    if item.image_hash:
                         try:
-                            image = Image.open(io.BytesIO(item.image_data))
+                            image = Image.open(get_blob_store().path(item.image_hash))
                             st.image(image, width=150)
                         except Exception as e:
                             st.caption("画像表示エラー")
@@ -285,7 +285,7 @@ def render_menu_list():
                     
                     if st.button("🗑️", key=f"delete_{category}_{i}", help="削除"):
                         state_manager.delete_menu_item(i)
-                        st.success(f"「{item.dish_name}」を削除しました")
+                        st.success(f"「{item.name}」を削除しました")
                         st.rerun()
                 
                 st.markdown("---")
@@ -294,6 +294,59 @@ def edit_menu_item(item, index: int):
     """メニュー編集モーダル"""
     st.session_state[f'edit_menu_{index}'] = True
 
+def render_menu_import():
+    """メニュー一括インポート（CSV / Excel）"""
+    state_manager = get_state_manager()
+    importer = get_menu_importer()
+    
+    with st.expander("📥 メニュー一括インポート（CSV / Excel）", expanded=False):
+        st.write("料理名・価格・カテゴリーを含むCSVまたはExcelファイルから、複数のメニューをまとめて登録できます。")
+        st.download_button(
+            "📄 テンプレートCSVをダウンロード",
+            data=importer.template_csv(),
+            file_name="menu_import_template.csv",
+            mime="text/csv"
+        )
+        
+        uploader_key = f"menu_import_file_{st.session_state.get('menu_import_generation', 0)}"
+        uploaded_file = st.file_uploader("メニューファイル", type=["csv", "xlsx"], key=uploader_key)
+        if uploaded_file is None:
+            return
+        
+        current_state = state_manager.get_state()
+        result = importer.import_file(
+            uploaded_file.getvalue(),
+            uploaded_file.name,
+            existing_names=[item.name for item in current_state.menu],
+            existing_ids=[item.id for item in current_state.menu]
+        )
+        
+        if not result["success"]:
+            st.error(f"ファイルを読み込めませんでした: {result['error']}")
+            return
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("行数", result["total_rows"])
+        with col2:
+            st.metric("登録可能", result["valid_rows"])
+        with col3:
+            st.metric("エラー", len(result["errors"]))
+        
+        if result["errors"]:
+            st.warning("以下の行はエラーのため取り込まれません")
+            st.dataframe(
+                [{"行": error["row"], "料理名": error["name"], "エラー内容": " / ".join(error["messages"])} for error in result["errors"]],
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        if result["valid_rows"] and st.button(f"✅ 有効な{result['valid_rows']}件を登録", type="primary", use_container_width=True):
+            count = state_manager.add_menu_items(result["items"])
+            st.session_state["menu_import_generation"] = st.session_state.get("menu_import_generation", 0) + 1
+            st.success(f"✅ {count}件のメニューを登録しました")
+            st.rerun()
+
 def render_bulk_operations():
     """一括操作セクション"""
     st.markdown("### 🔄 一括操作")
@@ -301,6 +354,22 @@ def render_bulk_operations():
     state_manager = get_state_manager()
     current_state = state_manager.get_state()
     
+    # 元に戻す・やり直し
+    history = state_manager.get_history_stats()
+    col_undo, col_redo = st.columns(2)
+    
+    with col_undo:
+        if st.button("↩️ 元に戻す", use_container_width=True, disabled=not history["undo_depth"],
+                     help=history["next_undo"] or None):
+            state_manager.undo()
+            st.rerun()
+    
+    with col_redo:
+        if st.button("↪️ やり直し", use_container_width=True, disabled=not history["redo_depth"],
+                     help=history["next_redo"] or None):
+            state_manager.redo()
+            st.rerun()
+    
     if not current_state.menu or len(current_state.menu) == 0:
         st.info("メニューが登録されていないため、一括操作は利用できません")
         return
@@ -330,26 +399,20 @@ def generate_menu_csv():
     current_state = state_manager.get_state()
     
     try:
-        # 基本メニューCSV生成
-        menu_data = []
-        for item in current_state.menu:
-            menu_data.append({
-                "料理名": item.dish_name,
-                "カテゴリ": item.category,
-                "価格": item.price,
-                "説明": item.description,
-                "推奨度": item.recommendation_level,
-                "アレルギー": "、".join(item.allergens) if item.allergens else ""
-            })
-        
-        csv_content = csv_generator._generate_basic_csv(menu_data, "メニュー情報")
+        # 基本メニューCSV（一括インポートと同じ列・メニュー変更までキャッシュ済みペイロード）
+        store_name = current_state.store.store_name_ja or 'menu'
+        payload = state_manager.csv_payload("menu", lambda: csv_generator.menu_payload(
+            [state_codec.encode_menu_item(item) for item in state_manager.get_ordered_menu()],
+            store_name
+        ))
         
         # ダウンロードボタン
         st.download_button(
             label="📥 メニューCSVダウンロード",
-            data=csv_content,
-            file_name=f"{current_state.store.store_name_ja or 'menu'}_menu.csv",
-            mime="text/csv"
+            data=payload["data"],
+            file_name=payload["filename"],
+            mime=payload["mime"],
+            help=f"ETag: {payload['etag']}"
         )
         
         st.success("✅ メニューCSVを生成しました")
@@ -366,11 +429,9 @@ def copy_all_menus():
     menu_text = "【メニュー一覧】\n\n"
     
     for i, item in enumerate(current_state.menu, 1):
-        menu_text += f"{i}. {item.dish_name} - ¥{item.price:,}\n"
-        if item.description:
-            menu_text += f"   {item.description}\n"
-        if item.allergens:
-            menu_text += f"   アレルギー: {'、'.join(item.allergens)}\n"
+        menu_text += f"{i}. {item.name} - ¥{item.price:,}\n"
+        if item.desc:
+            menu_text += f"   {item.desc}\n"
         menu_text += "\n"
     
     st.text_area(
@@ -425,7 +486,7 @@ def render_validation_and_navigation():
     
     with col3:
         if menu_count > 0:
-            high_recommend_count = len([item for item in current_state.menu if item.recommendation_level >= 4])
+            high_recommend_count = len([item for item in current_state.menu if item.recommendation_score >= 4])
             st.metric("推奨メニュー数", high_recommend_count)
         else:
             st.metric("推奨メニュー数", 0)
@@ -474,6 +535,9 @@ def main():
         # 現在のメニューリスト
         render_menu_list()
         
+        # 一括インポート
+        render_menu_import()
+        
         # 一括操作
         render_bulk_operations()
         
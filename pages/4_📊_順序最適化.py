@@ -8,6 +8,7 @@ AI提案・ドラッグ&ドロップ対応・外国人観光客配慮
 import streamlit as st
 from modules.state_manager import get_state_manager, initialize_tonosama_ui
 from modules.openai_integration import get_openai_integration
+from modules.blob_store import get_blob_store
 import logging
 import asyncio
 from typing import List, Dict
@@ -56,14 +57,14 @@ def render_current_order_display():
     
     # 現在の順序を表形式で表示
     menu_data = []
-    for i, item in enumerate(current_state.menu):
+    for i, item in enumerate(state_manager.get_ordered_menu()):
         menu_data.append({
             "順番": i + 1,
-            "料理名": item.dish_name,
+            "料理名": item.name,
             "カテゴリ": item.category,
             "価格": f"¥{item.price:,}",
-            "推奨度": "⭐" * item.recommendation_level,
-            "説明": item.description[:30] + "..." if len(item.description or "") > 30 else (item.description or "")
+            "推奨度": "⭐" * item.recommendation_score,
+            "説明": item.desc[:30] + "..." if len(item.desc or "") > 30 else (item.desc or "")
         })
     
     st.dataframe(
@@ -115,12 +116,11 @@ def optimize_with_ai():
                 menu_items = []
                 for item in current_state.menu:
                     menu_items.append({
-                        "dish_name": item.dish_name,
+                        "dish_name": item.name,
                         "category": item.category,
                         "price": item.price,
-                        "description": item.description,
-                        "recommendation_level": item.recommendation_level,
-                        "allergens": item.allergens
+                        "description": item.desc,
+                        "recommendation_level": item.recommendation_score
                     })
                 
                 # 店舗情報
@@ -189,17 +189,17 @@ def render_manual_sorting():
                             st.rerun()
                 
                 with col2:
-                    st.markdown(f"**{i + 1}. {item.dish_name}**")
-                    st.caption(f"{item.category} | {'⭐' * item.recommendation_level}")
+                    st.markdown(f"**{i + 1}. {item.name}**")
+                    st.caption(f"{item.category} | {'⭐' * item.recommendation_score}")
                 
                 with col3:
                     st.metric("価格", f"¥{item.price:,}")
                 
                 with col4:
                     # 画像サムネイル
-                    if item.image_data:
+                    if item.image_hash:
                         try:
-                            image = Image.open(io.BytesIO(item.image_data))
+                            image = Image.open(get_blob_store().path(item.image_hash))
                             st.image(image, width=80)
                         except:
                             st.caption("🖼️ 画像")
@@ -215,28 +215,25 @@ def render_manual_sorting():
 
 def show_item_details(item):
     """アイテム詳細表示"""
-    with st.expander(f"📋 {item.dish_name} の詳細", expanded=True):
+    with st.expander(f"📋 {item.name} の詳細", expanded=True):
         col1, col2 = st.columns(2)
         
         with col1:
             st.write(f"**カテゴリ**: {item.category}")
             st.write(f"**価格**: ¥{item.price:,}")
-            st.write(f"**推奨度**: {'⭐' * item.recommendation_level}")
-            
-            if item.allergens:
-                st.write(f"**アレルギー**: {'、'.join(item.allergens)}")
+            st.write(f"**推奨度**: {'⭐' * item.recommendation_score}")
         
         with col2:
-            if item.image_data:
+            if item.image_hash:
                 try:
-                    image = Image.open(io.BytesIO(item.image_data))
-                    st.image(image, caption=item.dish_name, width=200)
+                    image = Image.open(get_blob_store().path(item.image_hash))
+                    st.image(image, caption=item.name, width=200)
                 except:
                     st.caption("画像表示エラー")
         
-        if item.description:
+        if item.desc:
             st.write("**説明**")
-            st.write(item.description)
+            st.write(item.desc)
 
 def render_optimization_preview():
     """最適化プレビュー"""
@@ -267,9 +264,9 @@ def render_optimization_preview():
                 col1, col2, col3 = st.columns([1, 2, 1])
                 
                 with col1:
-                    if item.image_data:
+                    if item.image_hash:
                         try:
-                            image = Image.open(io.BytesIO(item.image_data))
+                            image = Image.open(get_blob_store().path(item.image_hash))
                             st.image(image, width=120)
                         except:
                             st.write("🍽️")
@@ -277,19 +274,16 @@ def render_optimization_preview():
                         st.write("🍽️")
                 
                 with col2:
-                    st.markdown(f"**{i + 1}. {item.dish_name}**")
+                    st.markdown(f"**{i + 1}. {item.name}**")
                     st.write(f"*{item.category}*")
                     
-                    if item.description:
-                        preview_desc = item.description[:80] + "..." if len(item.description) > 80 else item.description
+                    if item.desc:
+                        preview_desc = item.desc[:80] + "..." if len(item.desc) > 80 else item.desc
                         st.caption(preview_desc)
-                    
-                    if item.allergens:
-                        st.caption(f"⚠️ Contains: {', '.join(item.allergens)}")
                 
                 with col3:
                     st.markdown(f"**¥{item.price:,}**")
-                    st.caption(f"{'⭐' * item.recommendation_level}")
+                    st.caption(f"{'⭐' * item.recommendation_score}")
                 
                 st.markdown("---")
         
@@ -306,16 +300,14 @@ def render_statistics():
     if not current_state.menu:
         return
     
-    # 統計計算
-    total_items = len(current_state.menu)
-    avg_price = sum(item.price for item in current_state.menu) / total_items
-    high_recommend = len([item for item in current_state.menu if item.recommendation_level >= 4])
+    # 統計計算（列指向テーブルでベクトル化集計）
+    menu_table = state_manager.get_menu_table()
+    total_items = len(menu_table)
+    avg_price = menu_table.average_price()
+    high_recommend = menu_table.count_recommended(4)
     
     # カテゴリ別統計
-    category_counts = {}
-    for item in current_state.menu:
-        category = item.category or "その他"
-        category_counts[category] = category_counts.get(category, 0) + 1
+    category_counts = menu_table.category_counts()
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -341,15 +333,7 @@ def render_statistics():
     
     with col6:
         st.markdown("#### 💰 価格帯分布")
-        price_ranges = {"〜1,000円": 0, "1,000-3,000円": 0, "3,000円〜": 0}
-        
-        for item in current_state.menu:
-            if item.price < 1000:
-                price_ranges["〜1,000円"] += 1
-            elif item.price < 3000:
-                price_ranges["1,000-3,000円"] += 1
-            else:
-                price_ranges["3,000円〜"] += 1
+        price_ranges = menu_table.price_band_counts()
         
         for range_name, count in price_ranges.items():
             st.write(f"• {range_name}: {count}品")
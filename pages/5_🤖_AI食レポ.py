@@ -6,7 +6,7 @@
 """
 
 import streamlit as st
-from modules.state_manager import get_state_manager, initialize_tonosama_ui
+from modules.state_manager import get_state_manager, initialize_tonosama_ui, state_codec
 from modules.openai_integration import get_openai_integration
 from modules.csv_generator import get_csv_generator
 import logging
@@ -201,7 +201,7 @@ def start_ai_generation(quality_mode: str, languages: List[str], considerations:
             
             # 各メニューの食レポ生成
             for i, menu_item in enumerate(current_state.menu):
-                status_text.text(f"🤖 「{menu_item.dish_name}」の食レポを{len(languages)}言語で生成中...")
+                status_text.text(f"🤖 「{menu_item.name}」の食レポを{len(languages)}言語で生成中...")
                 
                 # 店舗ストーリーと連携
                 store_context = {
@@ -212,12 +212,11 @@ def start_ai_generation(quality_mode: str, languages: List[str], considerations:
                 
                 # メニュー情報
                 menu_context = {
-                    "dish_name": menu_item.dish_name,
+                    "dish_name": menu_item.name,
                     "category": menu_item.category,
                     "price": menu_item.price,
-                    "description": menu_item.description,
-                    "recommendation_level": menu_item.recommendation_level,
-                    "allergens": menu_item.allergens
+                    "description": menu_item.desc,
+                    "recommendation_level": menu_item.recommendation_score
                 }
                 
                 # AI食レポ生成
@@ -232,9 +231,9 @@ def start_ai_generation(quality_mode: str, languages: List[str], considerations:
                 if food_reports:
                     # メニューアイテムに食レポを追加
                     state_manager.update_menu_item_reports(i, food_reports)
-                    status_text.text(f"✅ 「{menu_item.dish_name}」完了")
+                    status_text.text(f"✅ 「{menu_item.name}」完了")
                 else:
-                    status_text.text(f"❌ 「{menu_item.dish_name}」生成失敗")
+                    status_text.text(f"❌ 「{menu_item.name}」生成失敗")
                 
                 # プログレスバー更新
                 progress = (i + 1) / total_menus
@@ -280,7 +279,7 @@ def render_generated_reports():
         return
     
     for item in generated_items:
-        with st.expander(f"🍽️ {item.dish_name} の14言語食レポ", expanded=False):
+        with st.expander(f"🍽️ {item.name} の14言語食レポ", expanded=False):
             
             # タブで言語別表示
             if item.food_reports:
@@ -316,6 +315,62 @@ def render_generated_reports():
                                     st.info("この言語の食レポはまだ生成されていません")
                                 st.markdown("---")
 
+def render_description_drafts():
+    """類似料理の食レポ下書き（他店舗・他メニューの生成済み説明文を編集して採用）"""
+    openai_integration = get_openai_integration()
+    if openai_integration.description_reuse_mode == "off":
+        return
+    
+    state_manager = get_state_manager()
+    current_state = state_manager.get_state()
+    
+    if not current_state.menu:
+        return
+    
+    st.markdown("### 📝 類似料理の下書き")
+    st.caption("生成済みの類似料理の食レポを下書きとして表示します。店舗に合わせて編集してから採用してください。")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        menu_item = st.selectbox(
+            "メニュー",
+            options=current_state.menu,
+            format_func=lambda item: item.name,
+            key="draft_menu_item"
+        )
+    
+    with col2:
+        language = st.selectbox(
+            "言語",
+            options=list(openai_integration.languages.keys()),
+            format_func=lambda code: openai_integration.languages[code].native_name,
+            key="draft_language"
+        )
+    
+    drafts = openai_integration.suggest_similar_descriptions(state_codec.encode_menu_item(menu_item), language)
+    if not drafts:
+        st.info("この料理の類似下書きはまだありません")
+        return
+    
+    choice = st.radio(
+        "下書き候補",
+        options=range(len(drafts)),
+        format_func=lambda i: f"{drafts[i]['name']}（類似度 {drafts[i]['score']:.0%}）",
+        key=f"draft_choice_{menu_item.id}_{language}"
+    )
+    
+    draft_text = st.text_area(
+        "下書き（編集して採用）",
+        value=drafts[choice]["description"],
+        height=200,
+        key=f"draft_text_{menu_item.id}_{language}_{choice}"
+    )
+    
+    if st.button("✅ この内容で採用", key=f"draft_adopt_{menu_item.id}_{language}"):
+        state_manager.add_generated_content(menu_item.id, language, draft_text)
+        st.success(f"「{menu_item.name}」の食レポ（{openai_integration.languages[language].native_name}）を保存しました")
+
 def render_csv_export():
     """CSV出力セクション"""
     st.markdown("### 📊 14言語食レポCSV出力")
@@ -325,7 +380,8 @@ def render_csv_export():
     current_state = state_manager.get_state()
     
     # 生成済みレポート確認
-    generated_items = [item for item in current_state.menu if item.food_reports] if current_state.menu else []
+    generated_content = current_state.generated_content or {}
+    generated_items = [item for item in current_state.menu if generated_content.get(item.id)] if current_state.menu else []
     
     if not generated_items:
         st.info("食レポが生成されていないため、CSV出力はできません")
@@ -343,27 +399,28 @@ def render_csv_export():
         """)
     
     with col2:
-        if st.button("📥 14言語食レポCSVダウンロード", type="primary", use_container_width=True):
-            try:
-                # CSV生成
-                csv_data = csv_generator.generate_multilingual_food_reports_csv(
-                    store_name=current_state.store.store_name_ja or "restaurant",
-                    menu_items=generated_items
-                )
-                
-                # ダウンロードボタン
-                st.download_button(
-                    label="📥 ダウンロード実行",
-                    data=csv_data,
-                    file_name=f"{current_state.store.store_name_ja or 'restaurant'}_14言語食レポ.csv",
-                    mime="text/csv"
-                )
+        try:
+            # メニュー・食レポ・店舗情報が変わらない限り再実行時もキャッシュ済みペイロードを利用
+            store_name = current_state.store.store_name_ja or "restaurant"
+            payload = state_manager.csv_payload("food_report", lambda: csv_generator.food_report_payload(
+                [state_codec.encode_menu_item(item) for item in state_manager.get_ordered_menu()],
+                generated_content,
+                store_name
+            ))
                 
-                st.success("✅ 食レポCSVを生成しました")
+            st.download_button(
+                label="📥 14言語食レポCSVダウンロード",
+                data=payload["data"],
+                file_name=f"{store_name}_14言語食レポ.csv",
+                mime=payload["mime"],
+                type="primary",
+                use_container_width=True,
+                help=f"ETag: {payload['etag']}"
+            )
                 
-            except Exception as e:
-                logger.error(f"CSV生成エラー: {e}")
-                st.error("CSV生成に失敗しました")
+        except Exception as e:
+            logger.error(f"CSV生成エラー: {e}")
+            st.error("CSV生成に失敗しました")
 
 def render_quality_check():
     """品質チェックセクション"""
@@ -502,6 +559,9 @@ def main():
             # 生成済みレポート表示
             render_generated_reports()
             
+            # 類似料理の下書き
+            render_description_drafts()
+            
             # CSV出力
             render_csv_export()
             
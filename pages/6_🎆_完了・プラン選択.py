@@ -6,10 +6,12 @@
 """
 
 import streamlit as st
-from modules.state_manager import get_state_manager, initialize_tonosama_ui
-from modules.csv_generator import get_csv_generator
+from modules.state_manager import get_state_manager, initialize_tonosama_ui, state_codec
+from modules.csv_generator import get_csv_generator, PYARROW_AVAILABLE, XLSXWRITER_AVAILABLE
 from modules.google_drive import get_google_drive_integration, render_google_auth_section, create_package_and_upload
 from modules.email_service import get_email_service, send_completion_notification
+from modules.blob_store import get_blob_store
+from modules.package_archive import get_package_archive_builder
 import logging
 from typing import Dict, List
 from datetime import datetime
@@ -82,7 +84,7 @@ def render_system_summary():
         if completions["メニュー情報"]:
             menu_count = len(current_state.menu)
             st.caption(f"登録メニュー: {menu_count}品")
-            high_recommend = len([m for m in current_state.menu if m.recommendation_level >= 4])
+            high_recommend = state_manager.get_menu_table().count_recommended(4)
             st.caption(f"推奨メニュー: {high_recommend}品")
     
     with col4:
@@ -117,7 +119,7 @@ def render_recommended_menu_selection():
     # 推奨度4以上のメニューを抽出
     high_recommend_menus = [
         (i, menu) for i, menu in enumerate(current_state.menu) 
-        if menu.recommendation_level >= 4
+        if menu.recommendation_score >= 4
     ]
     
     if not high_recommend_menus:
@@ -127,7 +129,7 @@ def render_recommended_menu_selection():
     st.info(f"推奨度4以上のメニューから、外国人観光客に最もアピールしたい「イチオシメニュー」を選択してください。")
     
     # メニュー選択
-    menu_options = {f"{menu.dish_name} (¥{menu.price:,}, {'⭐' * menu.recommendation_level})": idx 
+    menu_options = {f"{menu.name} (¥{menu.price:,}, {'⭐' * menu.recommendation_score})": idx 
                    for idx, menu in high_recommend_menus}
     
     selected_menu = st.selectbox(
@@ -145,29 +147,26 @@ def render_recommended_menu_selection():
             col1, col2 = st.columns(2)
             
             with col1:
-                st.write(f"**料理名**: {selected_menu_item.dish_name}")
+                st.write(f"**料理名**: {selected_menu_item.name}")
                 st.write(f"**カテゴリ**: {selected_menu_item.category}")
                 st.write(f"**価格**: ¥{selected_menu_item.price:,}")
-                st.write(f"**推奨度**: {'⭐' * selected_menu_item.recommendation_level}")
-                
-                if selected_menu_item.allergens:
-                    st.write(f"**アレルギー**: {'、'.join(selected_menu_item.allergens)}")
+                st.write(f"**推奨度**: {'⭐' * selected_menu_item.recommendation_score}")
             
             with col2:
-                if selected_menu_item.image_data:
+                if selected_menu_item.image_hash:
                     from PIL import Image
                     import io
                     try:
-                        image = Image.open(io.BytesIO(selected_menu_item.image_data))
-                        st.image(image, caption=selected_menu_item.dish_name, width=250)
+                        image = Image.open(get_blob_store().path(selected_menu_item.image_hash))
+                        st.image(image, caption=selected_menu_item.name, width=250)
                     except:
                         st.caption("🖼️ 画像表示エラー")
                 else:
                     st.caption("📷 画像未登録")
             
-            if selected_menu_item.description:
+            if selected_menu_item.desc:
                 st.write("**説明**")
-                st.write(selected_menu_item.description)
+                st.write(selected_menu_item.desc)
         
         # 状態更新
         state_manager.update_state(recommended_menu_index=selected_idx)
@@ -302,7 +301,7 @@ def render_package_generation():
     
     recommended_menu = current_state.menu[recommended_menu_idx]
     
-    st.info(f"**選択プラン**: {selected_plan}  |  **イチオシメニュー**: {recommended_menu.dish_name}")
+    st.info(f"**選択プラン**: {selected_plan}  |  **イチオシメニュー**: {recommended_menu.name}")
     
     # パッケージ生成・送信ボタン
     col1, col2, col3 = st.columns([1, 2, 1])
@@ -331,52 +330,91 @@ def execute_package_generation(selected_plan: str, recommended_menu):
         # Step 1: 基本CSV生成
         status_text.text("📊 基本情報CSV生成中...")
         
-        # 店舗情報CSV
-        store_csv = csv_generator.generate_store_info_csv(current_state.store)
+        # 店舗情報CSV（同一内容の再生成はキャッシュ済みペイロードを利用）
+        store_csv = state_manager.csv_payload(
+            "store_info", lambda: csv_generator.store_info_payload(state_codec.encode_store(current_state.store))
+        )
         
         # ストーリーCSV（14言語対応）
-        story_csv = csv_generator.generate_story_multilingual_csv(
+        story_csv = state_manager.csv_payload("story", lambda: csv_generator.story_payload(
             current_state.imperator_story,
             current_state.store.store_name_ja
-        )
+        )) if current_state.imperator_story else None
         
         progress_bar.progress(0.2)
         
-        # Step 2: メニューCSV生成
-        status_text.text("🍽️ メニュー情報CSV生成中...")
+        # Step 2: メニューデータ準備（表示順）
+        status_text.text("🍽️ メニュー情報準備中...")
         
-        menu_csv = csv_generator.generate_menu_multilingual_csv(
-            current_state.store.store_name_ja,
-            current_state.menu
-        )
+        menu_data = [state_codec.encode_menu_item(item) for item in state_manager.get_ordered_menu()]
         
         progress_bar.progress(0.4)
         
-        # Step 3: AI食レポCSV生成
+        # Step 3: AI食レポCSV（ZIP書き出し時にチャンク単位で生成）
         status_text.text("🤖 AI食レポCSV生成中...")
         
-        food_report_csv = csv_generator.generate_multilingual_food_reports_csv(
-            current_state.store.store_name_ja,
-            current_state.menu
-        )
+        food_report_csv = csv_generator.stream_multilingual_food_report_csv(menu_data, current_state.generated_content)
         
         progress_bar.progress(0.6)
         
-        # Step 4: パッケージ統合
+        # Step 4: パッケージ統合（CSV・画像・マニフェストを1つのZIPへ逐次書き出し）
         status_text.text("📦 完全パッケージ統合中...")
         
+        blob_store = get_blob_store()
+        images = (
+            (menu_item.image_path or f"{menu_item.id}.jpg", blob_store.iter_chunks(menu_item.image_hash))
+            for menu_item in current_state.menu
+            if blob_store.exists(menu_item.image_hash)
+        )
+        
         package_data = {
-            "store_info_csv": store_csv.encode('utf-8-sig'),
-            "story_csv": story_csv.encode('utf-8-sig'),
-            "menu_csv": menu_csv.encode('utf-8-sig'),
-            "food_report_csv": food_report_csv.encode('utf-8-sig'),
-            "images": {}
+            "food_report_csv": food_report_csv,
+            "images": images
         }
+        for key, payload in (("store_info_csv", store_csv), ("story_csv", story_csv)):
+            if payload is not None:
+                package_data[key] = payload['data']
+        
+        # 分析用の列指向データ（pyarrowがある場合のみ）
+        if PYARROW_AVAILABLE:
+            columnar = csv_generator.generate_columnar_exports(
+                state_codec.encode_store(current_state.store),
+                current_state.imperator_story,
+                menu_data,
+                current_state.generated_content
+            )
+            if columnar.get('success'):
+                for name, content in columnar['files'].items():
+                    package_data[f"{name}_parquet"] = content
+        
+        # 1表1シートのExcelブック（xlsxwriterがある場合のみ）
+        if XLSXWRITER_AVAILABLE:
+            workbook = csv_generator.generate_xlsx_workbook(
+                state_codec.encode_store(current_state.store),
+                current_state.imperator_story,
+                menu_data,
+                current_state.generated_content
+            )
+            if workbook.get('success'):
+                package_data["workbook_xlsx"] = workbook['file']
         
-        # 画像データ追加
-        for menu_item in current_state.menu:
-            if menu_item.image_data and menu_item.image_filename:
-                package_data["images"][menu_item.image_filename] = menu_item.image_data
+        # 取引先向けの縦型・言語別CSV（レイアウト定義から1回の走査で生成）
+        partner = csv_generator.generate_layout_exports(
+            current_state.store.store_name_ja,
+            current_state.imperator_story,
+            menu_data,
+            current_state.generated_content
+        )
+        if partner.get('success'):
+            package_data["partner_files"] = partner['files']
+        
+        archive_builder = get_package_archive_builder()
+        store_name = current_state.store.store_name_ja
+        package_zip = archive_builder.spool(store_name, package_data)
+        st.session_state["package_archive"] = {
+            "file": package_zip,
+            "filename": archive_builder.archive_filename(store_name)
+        }
         
         progress_bar.progress(0.8)
         
@@ -393,7 +431,7 @@ def execute_package_generation(selected_plan: str, recommended_menu):
             
             success = email_service.send_free_plan_notification(
                 store_info, 
-                recommended_menu.dish_name
+                recommended_menu.name
             )
             
             if success:
@@ -412,7 +450,7 @@ def execute_package_generation(selected_plan: str, recommended_menu):
             if google_drive.is_configured() and google_drive.authenticate():
                 google_drive_info = create_package_and_upload(
                     current_state.store.store_name_ja,
-                    package_data
+                    {"package_zip": package_zip}
                 )
             
             # 戸塚さんに完了通知送信
@@ -515,11 +553,24 @@ def render_final_summary():
         st.write("✅ 14言語店主ストーリー.csv")
         st.write("✅ 14言語メニュー情報.csv")
         st.write("✅ 14言語AI食レポ.csv")
+        st.write("✅ 取引先向け縦型・言語別CSV")
         st.write("✅ 完全画像パッケージ")
         
         if st.session_state.get("selected_plan") != "無料プラン":
             st.write("✅ Google Drive完全パッケージ")
 
+    # 完全パッケージ（ZIP）ダウンロード
+    package_archive = st.session_state.get("package_archive")
+    if package_archive:
+        # 一時ファイルをそのまま渡す（ページ側で読み込んだ複製を作らない）
+        st.download_button(
+            "📦 完全パッケージ（ZIP）をダウンロード",
+            data=package_archive["file"],
+            file_name=package_archive["filename"],
+            mime="application/zip",
+            use_container_width=True
+        )
+
 def main():
     """メイン関数"""
     try:
@@ -70,6 +70,21 @@ class TONOSAMAQualityChecker:
             "modules/email_service.py",
             "modules/ui_styling.py",
             "modules/error_handler.py",
+            "modules/dish_similarity.py",
+            "modules/state_persistence.py",
+            "modules/state_store.py",
+            "modules/blob_store.py",
+            "modules/state_events.py",
+            "modules/state_codec.py",
+            "modules/menu_table.py",
+            "modules/workspace.py",
+            "modules/session_memory.py",
+            "modules/state_backend.py",
+            "modules/state_history.py",
+            "modules/menu_ordering.py",
+            "modules/package_archive.py",
+            "modules/menu_import.py",
+            "modules/multilingual_pivot.py",
             "pages/1_🏪_店舗基本情報.py",
             "pages/2_📝_店主ストーリー.py",
             "pages/3_🍽️_メニュー情報.py",
@@ -124,7 +139,22 @@ class TONOSAMAQualityChecker:
             "modules.google_drive",
             "modules.email_service",
             "modules.ui_styling",
-            "modules.error_handler"
+            "modules.error_handler",
+            "modules.dish_similarity",
+            "modules.state_persistence",
+            "modules.state_store",
+            "modules.blob_store",
+            "modules.state_events",
+            "modules.state_codec",
+            "modules.menu_table",
+            "modules.workspace",
+            "modules.session_memory",
+            "modules.state_backend",
+            "modules.state_history",
+            "modules.menu_ordering",
+            "modules.package_archive",
+            "modules.menu_import",
+            "modules.multilingual_pivot"
         ]
         
         all_imports_ok = True
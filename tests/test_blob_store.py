@@ -0,0 +1,55 @@
+"""
+TONOSAMA Professional System - Blob Store Tests
+コンテンツアドレス型画像ストアのマーク&スイープのテスト
+"""
+
+import io
+import os
+import time
+
+from modules.blob_store import BlobStore, find_blob_refs
+
+def age(store, blob_hash, seconds):
+    """BLOBの更新日時を過去へ移動"""
+    past = time.time() - seconds
+    os.utime(store.path(blob_hash), (past, past))
+
+def test_find_blob_refs_in_serialized_documents():
+    store = BlobStore()
+    first = store.put(b"ramen")
+    second = store.put(b"gyoza")
+    
+    snapshot = '{"menu": [{"id": "m1", "image_hash": "%s"}], "store_representative_image": ""}' % first
+    op = ('{"op": "replace", "path": "/menu/0/image_hash", "value": "%s"}' % second).encode("utf-8")
+    
+    assert find_blob_refs(snapshot) == {first}
+    assert find_blob_refs(op) == {second}
+    assert find_blob_refs('{"id": "%s0"}' % first) == set()  # 65文字は対象外
+
+def test_collect_garbage_removes_only_old_unreferenced_blobs(tmp_path):
+    store = BlobStore(tmp_path / "blobs")
+    live = store.put(b"live")
+    dead = store.put(b"dead")
+    fresh = store.put(b"fresh")
+    for blob_hash in (live, dead, fresh):
+        age(store, blob_hash, 7200)
+    store.put(b"fresh")  # 再利用で猶予期間が再開
+    
+    stale_tmp = store.root / ".incoming_stale"
+    stale_tmp.write_bytes(b"partial")
+    os.utime(stale_tmp, (time.time() - 7200,) * 2)
+    
+    stats = store.collect_garbage({live}, min_age_seconds=3600)
+    
+    assert stats == {"kept": 2, "removed": 2, "freed_bytes": len(b"dead") + len(b"partial")}
+    assert store.exists(live) and store.exists(fresh)
+    assert not store.exists(dead) and not stale_tmp.exists()
+
+def test_put_stream_reuse_refreshes_grace_period(tmp_path):
+    store = BlobStore(tmp_path / "blobs")
+    blob_hash = store.put(b"image")
+    age(store, blob_hash, 7200)
+    
+    assert store.put_stream(io.BytesIO(b"image")) == blob_hash
+    store.collect_garbage(set(), min_age_seconds=3600)
+    assert store.exists(blob_hash)
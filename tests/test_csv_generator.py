@@ -0,0 +1,300 @@
+"""
+TONOSAMA Professional System - CSV Generator Tests
+14言語食レポCSV・XLSXの列単位構築・バッチ出力のテスト
+"""
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+from modules.csv_generator import CSVGenerator
+
+MENU = [
+    {"id": "m1", "name": "醤油ラーメン", "price": 900, "category": "メイン"},
+    {"id": "m2", "name": "餃子", "price": 400, "category": "サイド"}
+]
+
+def expected_cell(generator, item, code, texts):
+    return texts.get(code) or generator._get_fallback_menu_description(item, code)
+
+def test_food_report_frame_fills_language_without_text():
+    generator = CSVGenerator()
+    # 英語のみ生成済み（他の言語は全行が未生成）
+    generated = {"m1": {"en": "Soy ramen."}, "m2": {"en": "Gyoza."}}
+    
+    frame = generator.build_food_report_frame(MENU, generated)
+    
+    headers = generator.food_report_headers()
+    for row, item in zip(frame.itertuples(index=False, name=None), MENU):
+        texts = generated[item["id"]]
+        assert list(row[4:]) == [expected_cell(generator, item, lang["code"], texts) for lang in generator.languages]
+    assert all(isinstance(value, str) for name in headers[4:] for value in frame[name])
+
+def test_food_report_frame_without_generated_data():
+    generator = CSVGenerator()
+    
+    frame = generator.build_food_report_frame(MENU, {})
+    result = generator.generate_multilingual_food_report_csv(MENU, {}, "店A")
+    
+    assert not frame.isna().any().any()
+    assert result["success"] and "nan" not in result["content"]
+    assert generator._get_fallback_menu_description(MENU[1], "en") in result["content"]
+
+def test_food_report_stream_yields_before_menu_is_consumed():
+    generator = CSVGenerator()
+    generator.row_batch_size = 10
+    generator.chunk_size = 1
+    menu = [{"id": f"m{i}", "name": f"料理{i}", "price": i} for i in range(100)]
+    generated = {f"m{i}": {"en": f"Dish {i}."} for i in range(0, 100, 3)}
+    consumed = []
+    
+    def lazy_menu():
+        for item in menu:
+            consumed.append(item["id"])
+            yield item
+    
+    stream = generator.stream_multilingual_food_report_csv(lazy_menu(), generated)
+    head = [next(stream), next(stream), next(stream)]  # BOM・ヘッダー・先頭行
+    
+    # 先頭バッチのみを読んだ時点で行が出力される
+    assert head[2].startswith('"m0",'.encode("utf-8"))
+    assert len(consumed) == generator.row_batch_size
+    
+    output = b"".join(head) + b"".join(stream)
+    assert len(consumed) == len(menu)
+    assert output == CSVGenerator().render_multilingual_food_report_csv(menu, generated)
+
+def test_xlsx_food_report_sheet_reads_menu_in_batches():
+    openpyxl = pytest.importorskip("openpyxl")
+    pytest.importorskip("xlsxwriter")
+    
+    generator = CSVGenerator()
+    generator.row_batch_size = 10
+    menu = [{"id": f"m{i}", "name": f"料理{i}", "price": i} for i in range(35)]
+    generated = {f"m{i}": {"en": f"Dish {i}."} for i in range(0, 35, 2)}
+    consumed = []
+    
+    def lazy_menu():
+        for item in menu:
+            consumed.append(item["id"])
+            yield item
+    
+    rows = generator.food_report_rows(lazy_menu(), generated)
+    head = [next(rows), next(rows)]  # ヘッダー・先頭行
+    assert head[1][0] == "m0" and len(consumed) == generator.row_batch_size
+    
+    result = generator.generate_xlsx_workbook({"store_name_ja": "店A"}, "", lazy_menu(), generated)
+    assert result["success"] and result["rows"]["AI食レポ_14言語"] == len(menu)
+    
+    sheet = openpyxl.load_workbook(result["file"], read_only=True)["AI食レポ_14言語"]
+    expected = generator.build_food_report_frame(menu, generated)
+    assert [list(row) for row in sheet.iter_rows(min_row=2, values_only=True)] == [
+        list(row) for row in expected.itertuples(index=False, name=None)
+    ]
+
+def test_layout_exports_stream_partner_files():
+    from modules.multilingual_pivot import PACKAGE_PARTNER_LAYOUTS, get_pivot_engine
+    
+    generator = CSVGenerator()
+    generator.chunk_size = 64
+    generated = {"m1": {"en": "Soy ramen.", "ko": "간장 라멘."}}
+    
+    result = generator.generate_layout_exports("店A", "物語", MENU, generated)
+    assert result["success"]
+    
+    # 各ファイルはチャンクのイテレータで、連結すると一括生成したCSVと同一
+    engine = get_pivot_engine()
+    expected = {}
+    for dataset, table in (("story", generator.story_records("物語", "店A")),
+                           ("food_report", generator.food_report_records(MENU, generated))):
+        names = [name for name in PACKAGE_PARTNER_LAYOUTS if engine.get_layout(name)["dataset"] == dataset]
+        for name, pivoted in engine.pivot_many(table, names).items():
+            template = engine.get_layout(name).get("filename", f"{{store_name}}_{name}.csv")
+            if engine.get_layout(name)["shape"] == "per_language":
+                for lang in generator.languages:
+                    if lang["code"] in pivoted:
+                        filename = template.format(store_name="店A", language=lang["code"], language_name=lang["name"])
+                        expected[filename] = generator._create_csv_content(pivoted[lang["code"]]).encode("utf-8-sig")
+            else:
+                expected[template.format(store_name="店A")] = generator._create_csv_content(pivoted).encode("utf-8-sig")
+                
+    assert set(result["files"]) == set(expected)
+    for filename, chunks in result["files"].items():
+        assert not isinstance(chunks, (bytes, str))
+        assert b"".join(chunks) == expected[filename]
+
+def test_columnar_exports_keep_types_and_content():
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    import io
+    
+    generator = CSVGenerator()
+    menu = MENU + [{"id": "m3", "name": "時価の刺身", "price": "時価", "category": "メイン"}]
+    generated = {"m1": {"en": "Soy ramen."}}
+    store = {"store_name_ja": "店A", "store_type": "ラーメン", "price_band": "〜1,000円", "walk_time": "5"}
+    
+    result = generator.generate_columnar_exports(store, "物語", menu, generated)
+    assert result["success"] and result["format"] == "parquet"
+    tables = {name: pq.read_table(io.BytesIO(data)) for name, data in result["files"].items()}
+    
+    store_table = tables["store_info"]
+    assert store_table.schema.field("walk_time").type == pa.int32()
+    assert pa.types.is_dictionary(store_table.schema.field("store_type").type)
+    assert store_table.column("walk_time").to_pylist() == [5]
+    
+    story = tables["story"]
+    assert pa.types.is_dictionary(story.schema.field("language").type)
+    assert story.schema.field("is_fallback").type == pa.bool_()
+    assert story.column("language").to_pylist() == [lang["code"] for lang in generator.languages]
+    
+    # 縦型：料理×言語・数値化できない価格はnull
+    food = tables["food_report"]
+    assert food.schema.field("price").type == pa.int64()
+    assert pa.types.is_dictionary(food.schema.field("category").type)
+    assert food.num_rows == result["rows"]["food_report"] == len(menu) * len(generator.languages)
+    rows = food.to_pylist()
+    assert rows[0] == {"menu_id": "m1", "name": "醤油ラーメン", "price": 900, "category": "メイン",
+                       "language": generator.languages[0]["code"],
+                       "text": expected_cell(generator, MENU[0], generator.languages[0]["code"], generated["m1"]),
+                       "is_fallback": generator.languages[0]["code"] != "en"}
+    assert {row["price"] for row in rows if row["menu_id"] == "m3"} == {None}
+    english = [row for row in rows if row["language"] == "en"]
+    assert [(row["menu_id"], row["is_fallback"]) for row in english] == [("m1", False), ("m2", True), ("m3", True)]
+
+def test_columnar_export_formats():
+    pa = pytest.importorskip("pyarrow")
+    generator = CSVGenerator()
+    table = generator.food_report_table(MENU, {})
+    
+    with pa.ipc.open_file(pa.BufferReader(generator.table_to_bytes(table, "arrow"))) as reader:
+        assert reader.read_all().equals(table)
+    with pytest.raises(ValueError):
+        generator.table_to_bytes(table, "orc")
+
+def test_columnar_export_without_pyarrow(monkeypatch):
+    import modules.csv_generator as csv_generator_module
+    monkeypatch.setattr(csv_generator_module, "PYARROW_AVAILABLE", False)
+    
+    result = CSVGenerator().generate_columnar_exports({"store_name_ja": "店A"}, "", MENU, {})
+    
+    assert not result["success"] and "pyarrow" in result["error"]
+
+def parsed_preview(generator, content):
+    """キャッシュを持たない生成器でCSV文字列を解析したプレビュー情報"""
+    fresh = CSVGenerator()
+    fresh.preview_rows = generator.preview_rows
+    return fresh.get_csv_preview(content)
+
+def test_preview_recorded_while_writing_matches_parsed_csv():
+    generator = CSVGenerator()
+    generator.preview_rows = 5
+    menu = [{"id": f"m{i}", "name": f"料理{i}\n改行", "price": i, "category": "メイン"} for i in range(12)]
+    generated = {"m0": {"en": 'Say "umami".'}}
+    
+    results = [
+        generator.generate_store_info_csv({"store_name_ja": "店A", "store_type": "ラーメン"}),
+        generator.generate_multilingual_food_report_csv(menu, generated, "店A")
+    ]
+    
+    for result in results:
+        content = result["content"]
+        recorded = generator.get_csv_preview(content)
+        assert recorded == parsed_preview(generator, content)
+        assert recorded["size"] == len(content)
+        assert len(recorded["rows"]) <= generator.preview_rows
+    
+    food = generator.get_csv_preview(results[1]["content"])
+    assert food["row_count"] == len(menu) and food["column_count"] == len(generator.food_report_headers())
+    assert food["rows"][0][1] == "料理0\n改行"
+
+def test_preview_cache_hit_skips_parsing(monkeypatch):
+    import modules.csv_generator as csv_generator_module
+    
+    generator = CSVGenerator()
+    content = generator.generate_store_info_csv({"store_name_ja": "店A"})["content"]
+    
+    def no_parse(*args, **kwargs):
+        raise AssertionError("キャッシュ済みの内容を再解析")
+        
+    monkeypatch.setattr(csv_generator_module.csv, "reader", no_parse)
+    assert generator.get_csv_preview(content)["row_count"] >= 1
+
+def test_preview_cache_is_bounded():
+    generator = CSVGenerator()
+    generator.preview_cache_size = 3
+    contents = [generator._create_csv_content([["h"], [str(i)]]) for i in range(5)]
+    
+    assert len(generator._preview_cache) == 3
+    assert generator._preview_key(contents[0]) not in generator._preview_cache
+    assert generator.get_csv_preview(contents[0])["rows"] == [["0"]]  # 破棄後は再解析
+    assert len(generator._preview_cache) == 3
+
+def test_food_report_preview_builds_only_head():
+    generator = CSVGenerator()
+    generator.preview_rows = 4
+    menu = [{"id": f"m{i}", "name": f"料理{i}", "price": i} for i in range(30)]
+    generated = {f"m{i}": {"en": f"Dish {i}."} for i in range(30)}
+    
+    preview = generator.preview_multilingual_food_report(menu, generated)
+    full = parsed_preview(generator, generator.render_multilingual_food_report_csv(menu, generated).decode("utf-8-sig"))
+    
+    assert preview["row_count"] == full["row_count"] == len(menu)
+    assert preview["header"] == full["header"] and preview["rows"] == full["rows"]
+    assert preview["size"] is None
+
+def test_etag_changes_with_template_version_and_inputs(monkeypatch):
+    import modules.csv_generator as csv_generator_module
+    
+    generator = CSVGenerator()
+    generated = {"m1": {"en": "Soy ramen."}}
+    etag = generator.payload_etag("food_report", MENU, generated)
+    
+    # 同一内容は別オブジェクトでも同じETag
+    assert generator.payload_etag("food_report", [dict(item) for item in MENU], {"m1": {"en": "Soy ramen."}}) == etag
+    assert etag.startswith("food_report-")
+    
+    changed = [
+        generator.payload_etag("food_report", MENU, {"m1": {"en": "Soy ramen!"}}),
+        generator.payload_etag("food_report", [dict(MENU[0], price=901), MENU[1]], generated),
+        generator.payload_etag("food_report", MENU[::-1], generated),
+        generator.payload_etag("story", MENU, generated)
+    ]
+    assert len({etag, *changed}) == 5
+    
+    monkeypatch.setattr(csv_generator_module, "TEMPLATE_VERSION", "next")
+    assert generator.payload_etag("food_report", MENU, generated) != etag
+    
+    # 言語構成の変更でも変わる
+    monkeypatch.undo()
+    generator.languages = generator.languages[:-1]
+    assert generator.payload_etag("food_report", MENU, generated) != etag
+
+def test_payload_memoized_by_etag():
+    generator = CSVGenerator()
+    builds = []
+    
+    def build():
+        builds.append(1)
+        return b"data"
+        
+    first = generator.memoized_payload("menu", (MENU,), build, "menu.csv")
+    second = generator.memoized_payload("menu", ([dict(item) for item in MENU],), build, "menu.csv")
+    assert second is first and len(builds) == 1
+    
+    generator.memoized_payload("menu", ([MENU[0]],), build, "menu.csv")
+    assert len(builds) == 2
+    assert generator.get_payload_cache_stats()["hits"] == 1
+    
+    assert generator.invalidate_payloads("menu") == 2
+    assert generator.memoized_payload("menu", (MENU,), build, "menu.csv") is not first
+
+def test_payload_cache_evicts_by_size():
+    generator = CSVGenerator()
+    generator.payload_cache_max_bytes = 10
+    
+    first = generator.memoized_payload("menu", ("a",), lambda: b"123456", "a.csv")
+    generator.memoized_payload("menu", ("b",), lambda: b"123456", "b.csv")
+    
+    stats = generator.get_payload_cache_stats()
+    assert stats["entries"] == 1 and stats["bytes"] == 6
+    assert first["etag"] not in generator._payload_cache
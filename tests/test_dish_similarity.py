@@ -0,0 +1,40 @@
+"""
+TONOSAMA Professional System - Dish Similarity Tests
+類似料理の食レポ再利用条件のテスト
+"""
+
+from modules.dish_similarity import DishSimilarityIndex
+
+def make_index(tmp_path):
+    return DishSimilarityIndex(index_file=tmp_path / "dish_index.jsonl")
+
+def test_reuse_requires_same_store_and_context(tmp_path):
+    index = make_index(tmp_path)
+    index.add("醤油ラーメン", "en", "Soy ramen at Store A for ¥900.", store_name="店A", context="ctx-900")
+    
+    # 同一店舗・同一入力なら表記ゆれのある料理名でも再利用
+    match = index.find_reusable("しょうゆラーメン　", "en", "店A", "ctx-900", threshold=0.1)
+    assert match is not None
+    assert index.find_reusable("醤油ラーメン", "en", "店A", "ctx-900").record.descriptions["en"].endswith("¥900.")
+    
+    # 他店舗・価格やアレルギー表示が異なる入力・入力指紋なしは再利用しない
+    assert index.find_reusable("醤油ラーメン", "en", "店B", "ctx-900") is None
+    assert index.find_reusable("醤油ラーメン", "en", "店A", "ctx-1200") is None
+    assert index.find_reusable("醤油ラーメン", "en", "店A", "") is None
+
+def test_other_store_remains_available_as_draft(tmp_path):
+    index = make_index(tmp_path)
+    index.add("醤油ラーメン", "en", "Soy ramen.", store_name="店A", context="ctx")
+    
+    drafts = index.suggest_drafts("醤油ラーメン", "en")
+    assert [(name, description) for name, _, description in drafts] == [("醤油ラーメン", "Soy ramen.")]
+
+def test_contexts_survive_reload(tmp_path):
+    index = make_index(tmp_path)
+    index.add("醤油ラーメン", "en", "Soy ramen.", store_name="店A", context="ctx")
+    index.add("味噌ラーメン", "en", "Miso ramen.", store_name="店A")  # 入力指紋なし（旧形式相当）
+    
+    reloaded = make_index(tmp_path)
+    assert reloaded.find_reusable("醤油ラーメン", "en", "店A", "ctx") is not None
+    assert reloaded.find_reusable("味噌ラーメン", "en", "店A", "") is None
+    assert reloaded.suggest_drafts("味噌ラーメン", "en")
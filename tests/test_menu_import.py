@@ -0,0 +1,98 @@
+"""
+TONOSAMA Professional System - Menu Import Tests
+メニュー一括インポートの見出し対応付け・行ごとの検証メッセージのテスト
+"""
+
+import io
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+from modules.menu_import import MenuImporter
+from modules.state_manager import MenuItem
+
+def csv_bytes(lines):
+    return ("\ufeff" + "\r\n".join(lines) + "\r\n").encode("utf-8")
+
+def errors_by_row(result):
+    return {error["row"]: error["messages"] for error in result["errors"]}
+
+def test_template_round_trips_to_menu_item():
+    importer = MenuImporter()
+    
+    result = importer.import_file(importer.template_csv(), "template.csv")
+    
+    assert result["success"] and result["errors"] == []
+    assert result["items"] == [MenuItem(name="醤油ラーメン", price=980, category="メイン",
+                                        desc="自家製麺と醤油ダレの看板メニュー", recommendation_score=5)]
+
+def test_row_messages_for_each_rule():
+    importer = MenuImporter()
+    data = csv_bytes([
+        "メニューID,料理名,価格,カテゴリー,推奨度",
+        "m1,醤油ラーメン,\"¥1,200\",メイン,4",   # 2: 有効（通貨記号・桁区切りは除去）
+        "m2,,500,前菜,",                          # 3: 料理名未入力
+        "m3,餃子,abc,前菜,",                      # 4: 価格が数値でない
+        "m4,枝豆,0,前菜,",                        # 5: 価格が正でない
+        "m5,唐揚げ,450.5,前菜,",                  # 6: 価格が整数でない
+        "m6,ビール,600,お酒,",                    # 7: 未登録カテゴリー
+        "m7,醤油ﾗｰﾒﾝ,900,メイン,",                 # 8: ファイル内重複（全角・半角を同一視）
+        "m8,チャーハン,800,ご飯・麺,",            # 9: 登録済みの料理名
+        "m1,杏仁豆腐,400,デザート,",              # 10: ファイル内ID重複
+        "m9,緑茶,200,ドリンク,",                  # 11: 登録済みID
+        "m10,アイス,300,デザート,6",              # 12: 推奨度範囲外
+        "m11,プリン,abc,スイーツ,x"               # 13: 複数の誤り
+    ])
+    
+    result = importer.import_file(data, "menu.csv", existing_names=["ﾁｬｰﾊﾝ"], existing_ids=["m9"])
+    
+    assert result["success"] and result["total_rows"] == 12 and result["valid_rows"] == 1
+    assert result["items"][0] == MenuItem(id="m1", name="醤油ラーメン", price=1200, category="メイン", recommendation_score=4)
+    
+    categories = "カテゴリーは 前菜・メイン・ご飯・麺・デザート・ドリンク・その他 のいずれかです"
+    assert errors_by_row(result) == {
+        3: ["料理名が未入力です"],
+        4: ["価格が数値ではありません"],
+        5: ["価格は正の数で入力してください"],
+        6: ["価格は整数（円）で入力してください"],
+        7: [categories],
+        8: ["ファイル内で料理名が重複しています（2行目）"],
+        9: ["同じ料理名のメニューが登録済みです"],
+        10: ["ファイル内でメニューIDが重複しています"],
+        11: ["同じメニューIDが登録済みです"],
+        12: ["推奨度は1〜5の整数で入力してください"],
+        13: ["価格が数値ではありません", categories, "推奨度は1〜5の整数で入力してください"]
+    }
+    assert result["errors"][0]["name"] == ""
+
+def test_header_aliases_and_missing_columns():
+    importer = MenuImporter()
+    
+    result = importer.import_file(csv_bytes(["Name, PRICE ,category,description", "Gyoza,400,前菜,焼き餃子"]), "menu.csv")
+    assert result["items"] == [MenuItem(name="Gyoza", price=400, category="前菜", desc="焼き餃子")]
+    
+    result = importer.import_file(csv_bytes(["料理名,説明", "餃子,焼き餃子"]), "menu.csv")
+    assert not result["success"] and result["error"] == "必須列がありません: 価格、カテゴリー"
+
+def test_file_limits():
+    importer = MenuImporter(max_rows=2)
+    lines = ["料理名,価格,カテゴリー"] + [f"料理{i},500,メイン" for i in range(3)]
+    
+    assert importer.import_file(csv_bytes(lines), "menu.csv")["error"] == "一度に取り込めるのは2行までです（3行）"
+    assert "未対応のファイル形式" in importer.import_file(b"", "menu.pdf")["error"]
+
+def test_xlsx_import():
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["料理名", "価格", "カテゴリー", "推奨度"])
+    sheet.append(["醤油ラーメン", 980, "メイン", 5])
+    sheet.append(["餃子", "", "前菜", None])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    
+    result = MenuImporter().import_file(buffer.getvalue(), "menu.xlsx")
+    
+    assert result["items"] == [MenuItem(name="醤油ラーメン", price=980, category="メイン", recommendation_score=5)]
+    assert errors_by_row(result) == {3: ["価格が数値ではありません"]}
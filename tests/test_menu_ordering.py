@@ -0,0 +1,97 @@
+"""
+TONOSAMA Professional System - Menu Ordering Tests
+並び替えエンジンの安定ソート・カテゴリ表示順・編集時のキー更新のテスト
+"""
+
+import random
+from dataclasses import dataclass
+
+import pytest
+
+from modules.menu_ordering import DEFAULT_CATEGORY_SEQUENCE, MenuOrderingEngine
+
+@dataclass
+class Item:
+    id: str
+    price: int = 0
+    category: str = ""
+    recommendation_score: int = 1
+
+def make_menu(count=200, seed=0):
+    rng = random.Random(seed)
+    categories = list(DEFAULT_CATEGORY_SEQUENCE) + ["季節限定", "おつまみ", ""]
+    return [
+        Item(f"m{i}", rng.choice([500, 800, 1000]), rng.choice(categories), rng.randint(1, 5))
+        for i in range(count)
+    ]
+
+def category_rank(item):
+    category = item.category or ""
+    if category in DEFAULT_CATEGORY_SEQUENCE:
+        return (DEFAULT_CATEGORY_SEQUENCE.index(category), category)
+    return (len(DEFAULT_CATEGORY_SEQUENCE), category)
+
+REFERENCE_KEYS = {
+    "recommendation": lambda i: (-i.recommendation_score, i.price),
+    "price": lambda i: i.price,
+    "price_desc": lambda i: -i.price,
+    "category": lambda i: (category_rank(i), -i.recommendation_score, i.price)
+}
+
+@pytest.mark.parametrize("ordering", sorted(REFERENCE_KEYS))
+def test_order_is_stable_against_current_order(ordering):
+    menu = make_menu()
+    engine = MenuOrderingEngine(menu)
+    current = [item.id for item in reversed(menu)]
+    by_id = {item.id: item for item in menu}
+    
+    # 同一キーのアイテムは現在の表示順を維持
+    expected = [item.id for item in sorted((by_id[i] for i in current), key=REFERENCE_KEYS[ordering])]
+    assert engine.order(ordering, current) == expected
+    assert engine.order(ordering, expected) == expected
+
+def test_unknown_categories_follow_sequence_by_name():
+    menu = [Item("a", category="おつまみ"), Item("b", category="ドリンク"), Item("c", category="前菜"),
+            Item("d", category="季節限定"), Item("e")]
+    engine = MenuOrderingEngine(menu)
+    
+    assert engine.order("category", ["a", "b", "c", "d", "e"]) == ["c", "b", "e", "a", "d"]
+
+def test_update_after_edit_recomputes_only_that_item():
+    menu = [Item("a", 900, recommendation_score=3), Item("b", 400, recommendation_score=3),
+            Item("c", 600, recommendation_score=5)]
+    engine = MenuOrderingEngine(menu)
+    assert engine.order("recommendation", ["a", "b", "c"]) == ["c", "b", "a"]
+    
+    # 編集してもキー更新前はキャッシュ済みのキーで並ぶ
+    menu[0].recommendation_score = 5
+    menu[0].price = 100
+    assert engine.order("recommendation", ["a", "b", "c"]) == ["c", "b", "a"]
+    
+    engine.update(menu[0])
+    assert engine.order("recommendation", ["a", "b", "c"]) == ["a", "c", "b"]
+    assert engine.order("price", ["a", "b", "c"]) == ["a", "b", "c"]
+
+def test_removed_and_unknown_ids_are_dropped():
+    menu = make_menu(10)
+    engine = MenuOrderingEngine(menu)
+    
+    engine.remove("m3")
+    
+    ordered = engine.order("price", [item.id for item in menu] + ["missing"])
+    assert "m3" not in ordered and "missing" not in ordered and len(ordered) == 9
+    assert not engine.is_bound_to(menu)
+    
+    with pytest.raises(ValueError):
+        engine.order("name", ["m1"])
+
+def test_added_ordering_uses_current_items():
+    menu = make_menu(50, seed=3)
+    engine = MenuOrderingEngine(menu)
+    
+    engine.add_ordering("category_price_desc", (("category", False), ("price", True)))
+    
+    ids = [item.id for item in menu]
+    expected = [i.id for i in sorted(menu, key=lambda i: (category_rank(i), -i.price))]
+    assert engine.order("category_price_desc", ids) == expected
+    assert engine.is_bound_to(menu)
@@ -0,0 +1,92 @@
+"""
+TONOSAMA Professional System - Menu Table Tests
+列指向メニューテーブルの集計・並び替えを行単位の計算と比較するテスト
+"""
+
+import random
+import statistics
+from dataclasses import dataclass
+
+import pytest
+
+from modules.menu_table import DEFAULT_PRICE_BANDS, UNCATEGORIZED, MenuTable
+
+@dataclass
+class Item:
+    id: str
+    name: str = ""
+    price: int = 0
+    category: str = ""
+    recommendation_score: int = 1
+
+def make_items(count=300, seed=0):
+    rng = random.Random(seed)
+    categories = ["メイン", "サイド", "ドリンク", ""]
+    return [
+        Item(f"m{i}", f"料理{i}", rng.choice([0, 500, 980, 1000, 1500, 2999, 3000, 4200]),
+             rng.choice(categories), rng.randint(1, 5))
+        for i in range(count)
+    ]
+
+def test_aggregates_match_row_wise_calculation():
+    items = make_items()
+    table = MenuTable.from_items(items)
+    prices = [item.price for item in items]
+    
+    assert len(table) == len(items)
+    assert table.average_price() == pytest.approx(statistics.mean(prices))
+    assert table.price_stats() == pytest.approx({
+        "min": min(prices), "max": max(prices),
+        "mean": statistics.mean(prices), "median": statistics.median(prices)
+    })
+    assert table.count_recommended(4) == sum(1 for item in items if item.recommendation_score >= 4)
+    
+    # カテゴリは登録順・未設定は「その他」
+    expected_counts = {}
+    for item in items:
+        category = item.category or UNCATEGORIZED
+        expected_counts[category] = expected_counts.get(category, 0) + 1
+    assert list(table.category_counts().items()) == list(expected_counts.items())
+    
+    averages = table.category_average_price()
+    for category in expected_counts:
+        members = [item.price for item in items if (item.category or UNCATEGORIZED) == category]
+        assert averages[category] == pytest.approx(statistics.mean(members))
+
+def test_price_bands_use_upper_bound_exclusive():
+    table = MenuTable.from_items([Item("a", price=999), Item("b", price=1000), Item("c", price=2999),
+                                  Item("d", price=3000), Item("e", price=12000)])
+                                  
+    labels = [label for label, _ in DEFAULT_PRICE_BANDS]
+    assert table.price_band_counts() == dict(zip(labels, [1, 2, 2]))
+
+def test_empty_table():
+    table = MenuTable.from_items([])
+    
+    assert len(table) == 0 and table.average_price() == 0.0
+    assert table.price_stats() == {"min": 0.0, "max": 0.0, "mean": 0.0, "median": 0.0}
+    assert table.category_counts() == {} and table.sorted_ids("category") == []
+
+def test_sorted_ids_are_stable_and_match_sorted():
+    items = make_items(200, seed=1)
+    table = MenuTable.from_items(items)
+    
+    assert table.sorted_ids("price") == [i.id for i in sorted(items, key=lambda i: i.price)]
+    assert table.sorted_ids("price", descending=True) == [i.id for i in sorted(items, key=lambda i: -i.price)]
+    assert table.sorted_ids("recommendation") == [
+        i.id for i in sorted(items, key=lambda i: (-i.recommendation_score, i.price))
+    ]
+    assert table.sorted_ids("category") == [
+        i.id for i in sorted(items, key=lambda i: (i.category or UNCATEGORIZED, -i.recommendation_score))
+    ]
+    
+    with pytest.raises(ValueError):
+        table.sorted_ids("name")
+
+def test_ids_in_category():
+    items = make_items(50, seed=2)
+    table = MenuTable.from_items(items)
+    
+    assert table.ids_in_category("") == [i.id for i in items if not i.category]
+    assert table.ids_in_category("メイン") == [i.id for i in items if i.category == "メイン"]
+    assert table.ids_in_category("未登録") == []
@@ -0,0 +1,153 @@
+"""
+TONOSAMA Professional System - Multilingual Pivot Tests
+縦持ちデータからの横型・縦型・言語別出力と従来の正太さん形式CSVとの一致のテスト
+"""
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+from modules.csv_generator import CSVGenerator
+from modules.multilingual_pivot import LongTable, PivotEngine
+
+MENU = [
+    {"id": "m1", "name": "醤油ラーメン", "price": 900, "category": "メイン"},
+    {"id": "m2", "name": "餃子", "price": 400, "category": "サイド"},
+    {"name": "抹茶アイス", "price": 350}
+]
+
+GENERATED = {"m1": {"ja": "濃厚な醤油スープ。", "en": "Rich soy broth."}, "m2": {"en": "Crispy gyoza."}}
+
+STORY = "創業五十年の老舗です。"
+TRANSLATED = {"en": "A shop founded fifty years ago."}
+
+def legacy_story_rows(generator, store_name):
+    """従来の店主ストーリー横型行（店舗名 + 言語ごとのストーリー列）"""
+    texts = generator._story_translations(STORY, store_name, TRANSLATED)
+    return [
+        ['店舗名'] + [f"{lang['name']}ストーリー" for lang in generator.languages],
+        [store_name] + [text for text, _ in texts]
+    ]
+
+def legacy_food_report_rows(generator):
+    """従来の食レポ横型行（列単位構築のDataFrame）"""
+    frame = generator.build_food_report_frame(MENU, GENERATED)
+    return [list(frame.columns)] + [list(row) for row in frame.itertuples(index=False, name=None)]
+
+def test_wide_story_matches_legacy_csv():
+    generator = CSVGenerator()
+    engine = PivotEngine()
+    legacy = legacy_story_rows(generator, "店A")
+    
+    assert engine.pivot(generator.story_records(STORY, "店A", TRANSLATED), "shota_story") == legacy
+    
+    result = generator.generate_story_multilingual_csv(STORY, "店A", TRANSLATED)
+    assert result["content"] == generator._create_csv_content(legacy)
+    assert result["filename"] == "店A_店主ストーリー_14言語.csv"
+
+def test_wide_food_report_matches_legacy_csv():
+    generator = CSVGenerator()
+    engine = PivotEngine()
+    legacy = legacy_food_report_rows(generator)
+    
+    rows = engine.pivot(generator.food_report_records(MENU, GENERATED), "shota_food_report")
+    
+    assert rows == legacy
+    assert rows[0] == engine.headers("shota_food_report", generator.languages) == generator.food_report_headers()
+    assert rows[3][0] == "menu_3" and rows[3][3] == "メイン料理"
+    assert generator._create_csv_content(rows) == generator.generate_multilingual_food_report_csv(MENU, GENERATED, "店A")["content"]
+
+def test_long_food_report_rows_match_wide_cells():
+    generator = CSVGenerator()
+    engine = PivotEngine()
+    table = generator.food_report_records(MENU, GENERATED)
+    wide = engine.pivot(table, "shota_food_report")
+    
+    long_rows = engine.pivot(table, "tidy_food_report")
+    
+    assert long_rows[0] == ['メニューID', '料理名', '価格', 'カテゴリー', '言語コード', '言語', '説明文', '仮翻訳']
+    assert len(long_rows) - 1 == len(MENU) * len(generator.languages)
+    
+    # 1料理 × 1言語 = 1行（料理順 → 言語順）・本文は横型の同じセル
+    body = iter(long_rows[1:])
+    for wide_row, item in zip(wide[1:], MENU):
+        for offset, lang in enumerate(generator.languages):
+            row = next(body)
+            assert row[:4] == wide_row[:4]
+            assert row[4:7] == [lang["code"], lang["name"], wide_row[4 + offset]]
+            assert row[7] is (lang["code"] not in GENERATED.get(item.get("id"), {}))
+
+def test_long_story_flags_fallback_translations():
+    generator = CSVGenerator()
+    rows = PivotEngine().pivot(generator.story_records(STORY, "店A", TRANSLATED), "tidy_story")
+    
+    flags = {row[1]: row[4] for row in rows[1:]}
+    assert flags["ja"] is False and flags["en"] is False
+    assert all(flags[lang["code"]] for lang in generator.languages if lang["code"] not in ("ja", "en"))
+    assert [row[3] for row in rows[1:]] == legacy_story_rows(generator, "店A")[1][1:]
+
+def test_per_language_tables_split_wide_columns():
+    generator = CSVGenerator()
+    engine = PivotEngine()
+    table = generator.food_report_records(MENU, GENERATED)
+    wide = engine.pivot(table, "shota_food_report")
+    
+    tables = engine.pivot(table, "food_report_by_language")
+    
+    assert list(tables) == [lang["code"] for lang in generator.languages]
+    for offset, lang in enumerate(generator.languages):
+        rows = tables[lang["code"]]
+        assert rows[0] == ['メニューID', '料理名', '価格', 'カテゴリー', '説明文']
+        assert rows[1:] == [wide_row[:4] + [wide_row[4 + offset]] for wide_row in wide[1:]]
+
+def test_pivot_many_matches_individual_pivots():
+    generator = CSVGenerator()
+    engine = PivotEngine()
+    table = generator.food_report_records(MENU, GENERATED)
+    names = engine.layouts_for("food_report")
+    
+    assert names == ["shota_food_report", "tidy_food_report", "food_report_by_language"]
+    assert engine.pivot_many(table, names) == {name: engine.pivot(table, name) for name in names}
+
+def test_registered_layout_selects_languages_and_fields():
+    engine = PivotEngine()
+    languages = [{"code": "ja", "name": "日本語"}, {"code": "en", "name": "英語"}, {"code": "ko", "name": "韓国語"}]
+    table = LongTable("food_report", languages)
+    item = table.add_item(id="m1", name="餃子")
+    for code in ("ja", "en", "ko"):
+        table.add_text(item, "description", code, f"description-{code}")
+        table.add_text(item, "catchcopy", code, f"catchcopy-{code}")
+        
+    engine.register_layout("partner", {
+        "dataset": "food_report",
+        "shape": "wide",
+        "item_columns": (("id", "ID"),),
+        "fields": ("catchcopy",),
+        "languages": ("en", "ja", "fr"),
+        "value_header": "{field}_{language}"
+    })
+    
+    # 言語はレイアウト指定の順・未登録の言語コードは無視
+    assert engine.pivot(table, "partner") == [["ID", "catchcopy_en", "catchcopy_ja"], ["m1", "catchcopy-en", "catchcopy-ja"]]
+    assert engine.headers("partner", languages) == ["ID", "catchcopy_en", "catchcopy_ja"]
+    assert "partner" in engine.layouts_for("food_report")
+    assert "partner" not in PivotEngine().layouts
+
+def test_invalid_layouts_are_rejected():
+    engine = PivotEngine()
+    story = LongTable("story", [{"code": "ja", "name": "日本語"}])
+    
+    with pytest.raises(ValueError):
+        engine.register_layout("bad_shape", {"dataset": "story", "shape": "matrix"})
+    with pytest.raises(ValueError):
+        engine.register_layout("no_dataset", {"shape": "wide"})
+    with pytest.raises(ValueError):
+        engine.get_layout("missing")
+    with pytest.raises(ValueError):
+        engine.pivot(story, "shota_food_report")
+    with pytest.raises(ValueError):
+        engine.headers("tidy_food_report", story.languages)
+        
+    engine.register_layout("bad_column", {"dataset": "story", "shape": "long", "record_columns": (("author", "作者"),)})
+    with pytest.raises(ValueError):
+        engine.pivot(story, "bad_column")
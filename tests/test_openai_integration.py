@@ -0,0 +1,53 @@
+"""
+TONOSAMA Professional System - OpenAI Integration Tests
+食レポ再利用モード・下書き提案・生成入力指紋のテスト
+"""
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("streamlit")
+
+from modules.openai_integration import OpenAIIntegration
+
+STORE = {"store_name_ja": "店A", "store_type": "ラーメン", "allergy_info": "detailed"}
+ITEM = {"name": "醤油ラーメン", "price": 900, "category": "メイン", "desc": ""}
+
+def test_reuse_mode_defaults_to_drafts(monkeypatch):
+    monkeypatch.delenv("TONOSAMA_DISH_REUSE_MODE", raising=False)
+    assert OpenAIIntegration().description_reuse_mode == "suggest"
+    
+    monkeypatch.setenv("TONOSAMA_DISH_REUSE_MODE", "AUTO")
+    assert OpenAIIntegration().description_reuse_mode == "auto"
+    
+    monkeypatch.setenv("TONOSAMA_DISH_REUSE_MODE", "always")
+    assert OpenAIIntegration().description_reuse_mode == "suggest"
+
+def test_drafts_include_other_stores_unless_off(tmp_path, monkeypatch):
+    from modules.dish_similarity import DishSimilarityIndex
+    
+    integration = OpenAIIntegration()
+    integration.dish_index = DishSimilarityIndex(index_file=tmp_path / "dish_index.jsonl")
+    integration.dish_index.add("醤油ラーメン", "en", "Soy ramen.", store_name="店B", context="ctx")
+    
+    drafts = integration.suggest_similar_descriptions(ITEM, "en")
+    assert [draft["description"] for draft in drafts] == ["Soy ramen."]
+    
+    integration.description_reuse_mode = "off"
+    assert integration.suggest_similar_descriptions(ITEM, "en") == []
+
+def test_similarity_threshold_is_configurable(monkeypatch):
+    import modules.dish_similarity as dish_similarity
+    
+    monkeypatch.setenv("TONOSAMA_DISH_SIMILARITY_THRESHOLD", "0.6")
+    monkeypatch.setattr(dish_similarity, "_dish_similarity_index", None)
+    assert dish_similarity.get_dish_similarity_index().threshold == 0.6
+
+def test_prompt_context_ignores_name_only():
+    integration = OpenAIIntegration()
+    context = integration._menu_prompt_context(ITEM, "en", STORE)
+    
+    assert integration._menu_prompt_context(dict(ITEM, name="しょうゆラーメン"), "en", STORE) == context
+    assert integration._menu_prompt_context(dict(ITEM, price=1200), "en", STORE) != context
+    assert integration._menu_prompt_context(ITEM, "en", dict(STORE, store_name_ja="店B")) != context
+    assert integration._menu_prompt_context(ITEM, "en", dict(STORE, allergy_info="none")) != context
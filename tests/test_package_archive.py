@@ -0,0 +1,44 @@
+"""
+TONOSAMA Professional System - Package Archive Tests
+完全パッケージZIPの逐次生成・一時ファイル経由の読み出しのテスト
+"""
+
+import io
+import zipfile
+
+import pytest
+
+from modules.package_archive import MANIFEST_NAME, PARTNER_FOLDER, PackageArchiveBuilder, SpooledArchive
+
+PACKAGE = {
+    "store_info_csv": "店舗,殿様\n".encode("utf-8-sig"),
+    "story_csv": io.BytesIO("物語\n".encode("utf-8-sig")),
+    "partner_files": {"店A_tidy_story.csv": iter([b"\xef\xbb\xbf", b"a,b\n", b"1,2\n"])},
+    "images": {"../ramen.jpg": b"\xff\xd8" + bytes(range(256)) * 64}
+}
+
+@pytest.mark.parametrize("spool_max_memory", [16 * 1024 * 1024, 1024])
+def test_spooled_archive_is_readable_as_raw_io(spool_max_memory):
+    builder = PackageArchiveBuilder(chunk_size=512, spool_max_memory=spool_max_memory)
+    package = dict(PACKAGE, partner_files={"店A_tidy_story.csv": iter([b"\xef\xbb\xbf", b"a,b\n", b"1,2\n"])})
+    
+    archive = builder.spool("店A", package)
+    
+    # st.download_button が受け付ける型（メモリ上・ディスク退避後とも）
+    assert isinstance(archive, io.RawIOBase) and isinstance(archive, SpooledArchive)
+    archive.seek(0)
+    data = archive.read()
+    assert data[:2] == b"PK"
+    
+    with zipfile.ZipFile(io.BytesIO(data)) as package_zip:
+        names = package_zip.namelist()
+        assert package_zip.read(f"{PARTNER_FOLDER}/店A_tidy_story.csv") == b"\xef\xbb\xbfa,b\n1,2\n"
+        assert package_zip.read("03_メニュー情報/images/ramen.jpg") == PACKAGE["images"]["../ramen.jpg"]
+    assert names[-1] == MANIFEST_NAME
+    
+    manifest = builder.read_manifest(archive)
+    assert manifest["file_count"] == len(names) - 1
+    assert archive.tell() == 0
+    
+    archive.close()
+    assert archive.closed
@@ -0,0 +1,108 @@
+"""
+TONOSAMA Professional System - Session Memory Tests
+アイドルセッションの退避・復元・期限切れ破棄のテスト
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+import pytest
+
+from modules.session_memory import SessionExpiredError, SessionMemoryManager, SessionSlot
+from modules.state_history import StateHistory
+
+def make_manager(tmp_path, **options):
+    options.setdefault("min_idle_seconds", 0.0)
+    options.setdefault("enforce_interval", 0.0)
+    return SessionMemoryManager(
+        dumps=lambda state: json.dumps(state).encode("utf-8"),
+        loads=lambda data: json.loads(data.decode("utf-8")),
+        spill_dir=tmp_path / "spill",
+        **options
+    )
+
+def idle(slot, seconds):
+    slot.last_access = time.monotonic() - seconds
+
+def test_spill_file_removed_after_rehydrate(tmp_path):
+    manager = make_manager(tmp_path, idle_spill_seconds=10.0)
+    slot = manager.register(SessionSlot("s1", {"menu": [1, 2, 3]}))
+    idle(slot, 20)
+
+    assert manager.enforce() == 1
+    assert slot.spilled and slot.spill_path.exists()
+    spill_path = slot.spill_path
+
+    assert manager.acquire(slot) == {"menu": [1, 2, 3]}
+    assert not spill_path.exists()
+    assert list((tmp_path / "spill").iterdir()) == []
+
+def test_idle_expiry_drops_slot_and_spill_file(tmp_path):
+    manager = make_manager(tmp_path, idle_spill_seconds=10.0, expire_idle_seconds=100.0)
+    active = manager.register(SessionSlot("active", {"n": 1}))
+    abandoned = manager.register(SessionSlot("abandoned", {"n": 2}))
+    idle(abandoned, 20)
+    manager.enforce()
+    spill_path = abandoned.spill_path
+    assert spill_path.exists()
+
+    idle(abandoned, 200)
+    manager.enforce()
+
+    stats = manager.get_stats()
+    assert stats["sessions"] == 1 and stats["expire_count"] == 1
+    assert not spill_path.exists()
+    assert manager.acquire(active) == {"n": 1}
+    with pytest.raises(SessionExpiredError) as excinfo:
+        manager.acquire(abandoned)
+    assert excinfo.value.session_id == "abandoned"
+
+def test_orphaned_spill_files_swept(tmp_path):
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+    old_file = spill_dir / "old.json"
+    old_file.write_text("{}")
+    stale = time.time() - 1000
+    os.utime(old_file, (stale, stale))
+    recent_file = spill_dir / "recent.json"
+    recent_file.write_text("{}")
+
+    make_manager(tmp_path, expire_idle_seconds=100.0)  # 起動時に掃除
+
+    assert not old_file.exists()
+    assert recent_file.exists()
+
+def test_spill_drops_derived_history(tmp_path):
+    # 元に戻す履歴は派生キャッシュとして退避時に破棄（復元後はその時点から再作成）
+    manager = make_manager(tmp_path, idle_spill_seconds=10.0)
+    slot = manager.register(SessionSlot("s1", {"n": 1}))
+    slot.derived["history"] = object()
+    idle(slot, 20)
+    manager.enforce()
+
+    assert manager.acquire(slot) == {"n": 1}
+    assert "history" not in slot.derived
+
+@dataclass
+class MenuState:
+    menu: List[str] = field(default_factory=list)
+
+def test_reported_size_grows_with_undo_depth(tmp_path):
+    manager = make_manager(tmp_path, cap_bytes=1 << 40)
+    state = MenuState([f"{i:04d}" * 250 for i in range(100)])  # 約100KB
+    slot = manager.register(SessionSlot("s1", state))
+    slot.derived["history"] = StateHistory(state)
+    manager.enforce()
+    base = manager.get_stats()["resident_bytes"]
+
+    for step in range(20):
+        state.menu = [f"{i:04d}{step:02d}" * 200 for i in range(100)]
+        slot.derived["history"].record(state, ["menu"])
+        manager.mark_changed(slot)
+    manager.enforce()
+
+    # 元に戻す履歴（deque内のスナップショット）も計上される
+    assert manager.get_stats()["resident_bytes"] - base > 20 * 80_000
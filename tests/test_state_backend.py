@@ -0,0 +1,277 @@
+"""
+TONOSAMA Professional System - State Backend Tests
+共有状態バックエンドの比較交換・競合検出・再適用のテスト（SQLite / Redisプロトコル）
+"""
+
+import json
+import socketserver
+import threading
+
+import pytest
+
+from modules.state_backend import (
+    RedisStateBackend, SharedStateSync, SQLiteStateBackend, VersionConflictError
+)
+
+class RESPStandIn(socketserver.ThreadingTCPServer):
+    """テスト用の最小限Redis互換サーバー（ハッシュ・WATCH/MULTI/EXEC）"""
+    
+    allow_reuse_address = True
+    daemon_threads = True
+    
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RESPHandler)
+        self.data = {}
+        self.revisions = {}  # キーごとの変更回数（WATCH判定用）
+        self.lock = threading.Lock()
+        self.before_exec = None  # EXEC直前のフック（並行更新の再現用）
+        
+    @property
+    def url(self):
+        return "redis://%s:%d/0" % self.server_address
+        
+    def touch(self, key):
+        self.revisions[key] = self.revisions.get(key, 0) + 1
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    """1接続分のコマンド処理"""
+    
+    def handle(self):
+        self.watched = {}
+        self.queued = None
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            self.wfile.write(self.dispatch(args))
+            
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+        
+    def dispatch(self, args):
+        name = args[0].decode().upper()
+        server = self.server
+        
+        if name == "MULTI":
+            self.queued = []
+            return b"+OK\r\n"
+        if name == "EXEC":
+            if server.before_exec is not None:
+                hook, server.before_exec = server.before_exec, None
+                hook()
+            queued, self.queued = self.queued, None
+            with server.lock:
+                changed = any(server.revisions.get(k, 0) != rev for k, rev in self.watched.items())
+                self.watched = {}
+                if changed:
+                    return b"*-1\r\n"
+                replies = [self.execute(command) for command in queued]
+            return b"*%d\r\n" % len(replies) + b"".join(replies)
+        if self.queued is not None:
+            self.queued.append((name, args[1:]))
+            return b"+QUEUED\r\n"
+        if name == "WATCH":
+            with server.lock:
+                for key in args[1:]:
+                    self.watched[key] = server.revisions.get(key, 0)
+            return b"+OK\r\n"
+        if name == "UNWATCH":
+            self.watched = {}
+            return b"+OK\r\n"
+            
+        with server.lock:
+            return self.execute((name, args[1:]))
+            
+    def execute(self, command):
+        name, args = command
+        server = self.server
+        
+        if name == "HGET":
+            return bulk(server.data.get(args[0], {}).get(args[1]))
+        if name == "HMGET":
+            values = server.data.get(args[0], {})
+            return b"*%d\r\n" % (len(args) - 1) + b"".join(bulk(values.get(field)) for field in args[1:])
+        if name == "HSET":
+            values = server.data.setdefault(args[0], {})
+            values.update(zip(args[1::2], args[2::2]))
+            server.touch(args[0])
+            return b":%d\r\n" % (len(args) // 2)
+        if name == "DEL":
+            removed = server.data.pop(args[0], None) is not None
+            server.touch(args[0])
+            return b":%d\r\n" % removed
+        if name == "EXPIRE":
+            return b":1\r\n"
+        return b"-ERR unknown command\r\n"
+
+def bulk(value):
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+@pytest.fixture
+def resp_server():
+    server = RESPStandIn()
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(params=["sqlite", "redis"])
+def make_backend(request, tmp_path):
+    """同一ストアに接続する別レプリカのバックエンドを生成する関数"""
+    opened = []
+    if request.param == "sqlite":
+        def factory():
+            opened.append(SQLiteStateBackend(tmp_path / "shared.db"))
+            return opened[-1]
+    else:
+        server = request.getfixturevalue("resp_server")
+        def factory():
+            opened.append(RedisStateBackend(server.url, ttl_seconds=60))
+            return opened[-1]
+    yield factory
+    for backend in opened:
+        backend.close()
+
+def dumps(value):
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+def make_sync(backend, version=0, base=None):
+    return SharedStateSync(backend, "s1", dumps=dumps, loads=json.loads, version=version, base=base)
+
+def replica_pair(make_backend, initial):
+    """保存済みの同一状態を読み込んだ2レプリカ"""
+    first = make_sync(make_backend())
+    first.replace(dumps(initial))
+    assert first.write()
+    
+    second_backend = make_backend()
+    version, payload = second_backend.get("s1")
+    return first, make_sync(second_backend, version, payload)
+
+def test_put_rejects_stale_version(make_backend):
+    backend = make_backend()
+    
+    assert backend.put("s1", b"a", 0) == 1
+    assert backend.put("s1", b"b", 1) == 2
+    with pytest.raises(VersionConflictError) as error:
+        backend.put("s1", b"c", 1)
+        
+    assert error.value.actual == 2
+    assert backend.get("s1") == (2, b"b")
+    assert backend.get_version("missing") == 0
+
+def test_redis_exec_fails_when_key_changes_after_watch(resp_server):
+    backend = RedisStateBackend(resp_server.url)
+    other = RedisStateBackend(resp_server.url)
+    backend.put("s1", b"a", 0)
+    
+    # WATCH後・EXEC前に他レプリカが書き込み
+    resp_server.before_exec = lambda: other.put("s1", b"other", 1)
+    with pytest.raises(VersionConflictError) as error:
+        backend.put("s1", b"mine", 1)
+        
+    assert error.value.actual == 2
+    assert backend.get("s1") == (2, b"other")
+    backend.close()
+    other.close()
+
+def test_write_replays_ops_on_synced_state(make_backend):
+    first, _ = replica_pair(make_backend, {"title": "", "menu_order": ["m1", "m2"]})
+    
+    first.record([{"op": "replace", "path": "/title", "value": "殿様"}])
+    first.record([{"op": "remove", "path": "/menu_order/0"}])
+    assert first.write() and not first.has_changes()
+    
+    version, payload = first.backend.get("s1")
+    assert version == first.version == 2
+    assert json.loads(payload) == {"title": "殿様", "menu_order": ["m2"]}
+
+def test_conflict_retry_merges_disjoint_fields(make_backend):
+    first, second = replica_pair(make_backend, {"title": "", "menu_order": ["m1", "m2"]})
+    
+    first.record([{"op": "replace", "path": "/title", "value": "殿様"}])
+    assert first.write()
+    
+    # 古いバージョンからの書き込みは競合 - 次回確認で最新状態へ再適用して再送
+    second.record([{"op": "add", "path": "/menu_order/-", "value": "m3"}])
+    assert not second.write()
+    version, payload = second.poll(now=0.0, interval=60.0)
+    document, conflicts = second.rebase(version, payload, {"menu_order": ["m1", "m2", "m3"]})
+    
+    assert conflicts == ()
+    assert document == {"title": "殿様", "menu_order": ["m1", "m2", "m3"]}
+    assert second.write()
+    assert json.loads(second.backend.get("s1")[1]) == document
+
+def test_same_field_conflict_is_surfaced_until_resolved(make_backend):
+    first, second = replica_pair(make_backend, {"title": "", "menu_order": []})
+    
+    first.record([{"op": "replace", "path": "/title", "value": "A店"}])
+    assert first.write()
+    second.record([{"op": "replace", "path": "/title", "value": "B店"}])
+    assert not second.write()
+    
+    version, payload = second.poll(now=0.0, interval=60.0)
+    document, conflicts = second.rebase(version, payload, {"title": "B店"})
+    
+    assert conflicts == ("title",) and document["title"] == "B店"
+    assert second.conflict.remote_version == version
+    # 解決までは書き込まない（他レプリカの値を後勝ちで上書きしない）
+    assert not second.write()
+    assert json.loads(second.backend.get("s1")[1])["title"] == "A店"
+    
+    second.resolve(keep_local=True)
+    assert second.write()
+    assert json.loads(second.backend.get("s1")[1])["title"] == "B店"
+
+def test_resolving_for_remote_drops_local_field_change(make_backend):
+    first, second = replica_pair(make_backend, {"title": "", "menu_order": []})
+    
+    first.record([{"op": "replace", "path": "/title", "value": "A店"}])
+    assert first.write()
+    second.record([{"op": "replace", "path": "/title", "value": "B店"}])
+    second.record([{"op": "add", "path": "/menu_order/-", "value": "m1"}])
+    assert not second.write()
+    
+    version, payload = second.poll(now=0.0, interval=60.0)
+    second.rebase(version, payload, {"title": "B店", "menu_order": ["m1"]})
+    conflict = second.resolve(keep_local=False)
+    
+    assert conflict.fields == ("title",)
+    assert second.dirty_fields(["title", "menu_order"]) == ["menu_order"]
+    assert second.write()
+    assert json.loads(second.backend.get("s1")[1]) == {"title": "A店", "menu_order": ["m1"]}
+
+def test_equal_changes_on_both_replicas_do_not_conflict(make_backend):
+    first, second = replica_pair(make_backend, {"title": ""})
+    
+    first.record([{"op": "replace", "path": "/title", "value": "殿様"}])
+    assert first.write()
+    second.record([{"op": "replace", "path": "/title", "value": "殿様"}])
+    assert not second.write()
+    
+    version, payload = second.poll(now=0.0, interval=60.0)
+    _, conflicts = second.rebase(version, payload, {"title": "殿様"})
+    
+    assert conflicts == () and second.conflict is None
+
+def test_replacement_uses_known_version(make_backend):
+    first, second = replica_pair(make_backend, {"title": ""})
+    
+    first.record([{"op": "replace", "path": "/title", "value": "A店"}])
+    assert first.write()
+    
+    # 復元による置き換えも読み込み時のバージョンで比較交換（他レプリカの更新を上書きしない）
+    second.replace(dumps({"title": "復元"}))
+    assert not second.write()
+    assert json.loads(second.backend.get("s1")[1]) == {"title": "A店"}
@@ -0,0 +1,97 @@
+"""
+TONOSAMA Professional System - State Codec Tests
+スキーマ移行・旧形式バックアップ・旧メニューキー・JSON非対応値のテスト
+"""
+
+import io
+import json
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+import modules.state_codec as state_codec_module
+from modules.state_codec import SCHEMA_KEY, SCHEMA_VERSION
+from modules.state_manager import MenuItem, StoreInfo, SystemState, state_codec
+
+BLOB_HASH = "ab" * 32
+
+def v1_state():
+    """スキーマバージョン導入前（v1）の状態辞書"""
+    return {
+        "session_id": "s1",
+        "current_step": 3,
+        "store": {"store_name_ja": "殿様ラーメン", "legacy_field": "除外"},
+        "menu": [{"id": "m1", "name": "醤油ラーメン", "price": 900, "image_data": "iVBORw0KGgo="}],
+        "store_representative_image": {"name": "store.jpg", "data": "..."},
+        "uploaded_menu_files": [BLOB_HASH, {"name": "menu.pdf"}, None]
+    }
+
+@pytest.fixture(params=[True, False], ids=["orjson", "json"])
+def json_backend(request, monkeypatch):
+    """orjson利用時と標準ライブラリ時の両経路"""
+    if request.param and not state_codec_module.ORJSON_AVAILABLE:
+        pytest.skip("orjson未インストール")
+    monkeypatch.setattr(state_codec_module, "ORJSON_AVAILABLE", request.param)
+    return request.param
+
+def test_v1_state_migrates_to_current_schema():
+    state = state_codec.decode(v1_state())
+    
+    assert state.store == StoreInfo(store_name_ja="殿様ラーメン")
+    assert state.menu == [MenuItem(id="m1", name="醤油ラーメン", price=900)]
+    assert state.store_representative_image == ""
+    assert state.uploaded_menu_files == [BLOB_HASH]
+    assert state.menu_order == [] and state.generated_content == {}
+    assert state_codec.encode(state)[SCHEMA_KEY] == SCHEMA_VERSION
+
+def test_newer_schema_is_rejected():
+    data = dict(v1_state(), **{SCHEMA_KEY: SCHEMA_VERSION + 1})
+    
+    with pytest.raises(ValueError):
+        state_codec.decode(data)
+
+def test_legacy_backup_wrapper_is_unwrapped(json_backend):
+    payload = json.dumps({"timestamp": "2024-01-01T00:00:00", "state": v1_state()}, ensure_ascii=False).encode("utf-8")
+    
+    state = state_codec.loads(payload)
+    
+    assert isinstance(state, SystemState)
+    assert state.session_id == "s1" and state.current_step == 3
+    assert state.menu[0].name == "醤油ラーメン"
+
+def test_legacy_menu_keys_are_aliased():
+    item = state_codec.decode_menu_item({
+        "id": "m1",
+        "dish_name": "餃子",
+        "description": "パリッと焼き上げた餃子",
+        "recommendation_level": 4,
+        "image_filename": "gyoza.jpg",
+        "allergens": ["小麦"]
+    })
+    assert item == MenuItem(id="m1", name="餃子", desc="パリッと焼き上げた餃子",
+                            recommendation_score=4, image_path="gyoza.jpg")
+                            
+    # 現行キーに値がある場合は旧キーで上書きしない
+    item = state_codec.decode_menu_item({"name": "焼き餃子", "dish_name": "餃子"})
+    assert item.name == "焼き餃子"
+
+def test_unknown_values_become_none(json_backend):
+    state = state_codec.decode(dict(v1_state(), schema_version=SCHEMA_VERSION))
+    state.processing_status = {"upload": io.BytesIO(b"raw"), "step": "done"}
+    state.imperator_answers = {"q1": object()}
+    
+    encoded = state_codec.encode(state)
+    assert encoded["processing_status"] == {"upload": None, "step": "done"}
+    assert encoded["imperator_answers"] == {"q1": None}
+    
+    restored = state_codec.loads(state_codec.dumps(state))
+    assert restored.processing_status == {"upload": None, "step": "done"}
+    assert restored.menu == state.menu and restored.store == state.store
+
+def test_unknown_state_keys_are_dropped():
+    data = dict(v1_state(), schema_version=SCHEMA_VERSION, removed_feature={"x": 1})
+    
+    state = state_codec.decode(data)
+    
+    assert "removed_feature" not in state_codec.encode(state)
@@ -0,0 +1,156 @@
+"""
+TONOSAMA Professional System - State History Tests
+構造共有スナップショットの差分パッチ・元に戻す/やり直しのテスト
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from modules.state_history import CHUNK_SIZE, FrozenDict, StateHistory, field_patch, freeze, thaw
+
+@dataclass
+class Item:
+    id: str
+    price: int
+
+@dataclass
+class State:
+    menu: List[Item] = field(default_factory=list)
+    content: Dict[str, Any] = field(default_factory=dict)
+    title: str = ""
+
+def make_state(count=100):
+    return State(
+        menu=[Item(f"m{i}", i) for i in range(count)],
+        content={f"m{i}": {"en": f"text {i}"} for i in range(count)}
+    )
+
+def apply(state, patches):
+    """StateManager._apply_history と同じ規則でその場に適用"""
+    for name, patch in patches.items():
+        if patch[0] == "list":
+            _, start, stop, values = patch
+            getattr(state, name)[start:stop] = values
+        elif patch[0] == "dict":
+            _, updates, removed = patch
+            target = getattr(state, name)
+            for key in removed:
+                del target[key]
+            target.update(updates)
+        else:
+            setattr(state, name, patch[1])
+
+def test_list_patch_covers_only_changed_span():
+    before = freeze([Item(f"m{i}", i) for i in range(100)])
+    edited = [Item(f"m{i}", i) for i in range(100)]
+    del edited[40]
+    after = freeze(edited, before)
+    
+    # 前方・後方の共有要素は含めず、削除位置の1件のみを復元
+    assert field_patch(after, before) == ("list", 40, 40, [Item("m40", 40)])
+    assert field_patch(before, after) == ("list", 40, 41, [])
+
+def test_dict_patch_lists_changed_keys_only():
+    before = freeze({"a": {"en": "A"}, "b": {"en": "B"}})
+    after = freeze({"a": {"en": "A2"}, "c": {"en": "C"}}, before)
+    
+    assert field_patch(after, before) == ("dict", {"a": {"en": "A"}, "b": {"en": "B"}}, ["c"])
+
+def test_undo_redo_patches_round_trip():
+    state = make_state()
+    history = StateHistory(state)
+    
+    del state.menu[10]
+    del state.content["m10"]
+    history.record(state, ["menu", "content"])
+    state.menu[49].price = 999
+    state.title = "殿様"
+    history.record(state, ["menu", "title"])
+    
+    patches = history.undo()
+    assert set(patches) == {"menu", "title"}
+    assert patches["menu"][:3] == ("list", 49, 50)
+    apply(state, patches)
+    assert state.menu[49].price == 50 and state.title == ""
+    
+    apply(state, history.undo())
+    assert state == make_state()
+    
+    apply(state, history.redo())
+    apply(state, history.redo())
+    assert len(state.menu) == 99 and "m10" not in state.content
+    assert state.menu[49].price == 999 and state.title == "殿様"
+    assert history.redo() is None
+
+def test_patch_values_are_detached_from_history():
+    state = make_state(3)
+    history = StateHistory(state)
+    state.menu[0].price = 500
+    history.record(state, ["menu"])
+    
+    apply(state, history.undo())
+    state.menu[0].price = 777  # 適用後の編集がスナップショットを書き換えない
+    
+    apply(state, history.redo())
+    apply(state, history.undo())
+    assert state.menu[0].price == 0
+
+def test_equal_replacement_is_not_recorded():
+    state = make_state()
+    history = StateHistory(state)
+    
+    # 復元などで同値の別オブジェクトに置き換わっても変更として記録しない
+    history.record(make_state(), ["menu", "content", "title"])
+    assert not history.can_undo()
+
+def test_single_item_edit_shares_unchanged_chunks():
+    state = make_state(1000)
+    history = StateHistory(state)
+    before = history._current.values["menu"]
+    
+    state.menu[500].price = -1
+    history.record(state, ["menu"], ops=[{"op": "replace", "path": "/menu/500/price", "value": -1}])
+    after = history._current.values["menu"]
+    
+    changed = [k for k, (a, b) in enumerate(zip(before.chunks, after.chunks)) if a is not b]
+    assert changed == [500 // CHUNK_SIZE]
+    assert after[500].price == -1 and before[500].price == 500
+
+def test_insert_and_delete_rebuild_only_affected_chunks():
+    state = make_state(1000)
+    history = StateHistory(state)
+    before = history._current.values["menu"]
+    
+    del state.menu[100]
+    state.menu.insert(700, Item("new", -1))
+    history.record(state, ["menu"], ops=[
+        {"op": "remove", "path": "/menu/100"},
+        {"op": "add", "path": "/menu/700", "value": {"id": "new", "price": -1}}
+    ])
+    after = history._current.values["menu"]
+    
+    # 挿入・削除位置を含むチャンク以外は前後とも共有
+    shared = sum(1 for chunk in after.chunks if any(chunk is old for old in before.chunks))
+    assert shared == len(before.chunks) - 2
+    assert thaw(after) == state.menu
+    
+    apply(state, history.undo())
+    assert state == make_state(1000)
+
+def test_large_dict_edit_shares_unchanged_buckets():
+    state = make_state(1000)
+    history = StateHistory(state)
+    before = history._current.values["content"]
+    assert isinstance(before, FrozenDict)
+    
+    state.content["m1"] = {"en": "edited"}
+    del state.content["m2"]
+    history.record(state, ["content"], ops=[
+        {"op": "add", "path": "/content/m1/en", "value": "edited"},
+        {"op": "remove", "path": "/content/m2"}
+    ])
+    after = history._current.values["content"]
+    
+    assert sum(1 for a, b in zip(before.buckets, after.buckets) if a is not b) <= 2
+    assert thaw(after) == state.content
+    assert field_patch(after, before) == ("dict", {"m1": {"en": "text 1"}, "m2": {"en": "text 2"}}, [])
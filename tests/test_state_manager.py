@@ -0,0 +1,133 @@
+"""
+TONOSAMA Professional System - State Manager Tests
+セッション単位の変更通知・派生キャッシュ無効化のテスト
+"""
+
+import pytest
+
+st = pytest.importorskip("streamlit")
+
+import modules.state_manager as state_manager_module
+from modules.state_manager import MenuItem, StateManager
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """一時ディレクトリ・空のセッション状態で初期化した状態管理"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("TONOSAMA_STATE_BACKEND", raising=False)
+    monkeypatch.setattr(st, "session_state", {})
+    return StateManager()
+
+def switch_session(monkeypatch, session_state):
+    """別ブラウザセッションへの切り替え"""
+    monkeypatch.setattr(st, "session_state", session_state)
+
+def test_notifier_is_scoped_to_session(manager, monkeypatch):
+    first = st.session_state
+    received = []
+    manager.subscribe(["store"], lambda state, change: received.append((state.session_id, change.fields)))
+    
+    # 別セッションの変更は通知されない
+    switch_session(monkeypatch, {})
+    manager.update_store_info(store_name_ja="店B")
+    assert received == []
+    
+    switch_session(monkeypatch, first)
+    manager.update_state(imperator_story="物語")
+    manager.update_store_info(store_name_ja="店A")
+    assert received == [(manager.get_state().session_id, frozenset({"store"}))]
+
+def test_validation_recomputed_only_after_dependent_change(manager, monkeypatch):
+    fields, rule = state_manager_module.VALIDATION_RULES[1]
+    calls = []
+    
+    def counting_rule(state):
+        calls.append(state.store.store_name_ja)
+        return rule(state)
+        
+    monkeypatch.setitem(state_manager_module.VALIDATION_RULES, 1, (fields, counting_rule))
+    
+    assert manager.validate_state(1)
+    manager.validate_state(1)
+    manager.update_state(imperator_story="物語")
+    manager.validate_state(1)
+    assert calls == [""]
+    
+    manager.update_store_info(store_name_ja="店A")
+    manager.validate_state(1)
+    assert calls == ["", "店A"]
+
+def test_csv_payload_cached_until_dependent_change(manager):
+    builds = []
+    
+    def build():
+        builds.append(len(manager.get_state().menu))
+        return {"etag": f"menu-{len(builds)}", "data": b""}
+        
+    assert manager.csv_payload("menu", build)["etag"] == "menu-1"
+    manager.update_state(imperator_story="物語")
+    assert manager.csv_payload("menu", build)["etag"] == "menu-1"
+    
+    manager.add_menu_item(MenuItem(id="m1", name="醤油ラーメン", price=900))
+    assert manager.csv_payload("menu", build)["etag"] == "menu-2"
+    assert builds == [0, 1]
+    
+    with pytest.raises(ValueError):
+        manager.csv_payload("unknown", build)
+
+def test_blob_garbage_collection_keeps_images_of_states_and_backups(manager, monkeypatch):
+    from modules.blob_store import get_blob_store
+    
+    blobs = get_blob_store()
+    kept = blobs.put(b"backup image")
+    current = blobs.put(b"current image")
+    orphan = blobs.put(b"orphan image")
+    
+    # 旧画像はバックアップ（スナップショット）にのみ残る
+    manager.add_menu_item(MenuItem(id="m1", name="醤油ラーメン", image_hash=kept))
+    manager._auto_backup()
+    manager.update_menu_item("m1", image_hash=current)
+    
+    # 別セッションの状態が参照する画像も保持
+    first = st.session_state
+    switch_session(monkeypatch, {})
+    other = blobs.put(b"other session image")
+    manager.add_menu_item(MenuItem(id="m2", name="餃子", image_hash=other))
+    switch_session(monkeypatch, first)
+    
+    stats = manager.collect_blob_garbage(min_age_hours=0)
+    
+    assert stats["removed"] == 1
+    assert not blobs.exists(orphan)
+    assert all(blobs.exists(h) for h in (kept, current, other))
+
+def test_sort_uses_keys_updated_by_edit_and_undo(manager):
+    manager.add_menu_items([
+        MenuItem(id="a", name="A", price=900, recommendation_score=3),
+        MenuItem(id="b", name="B", price=400, recommendation_score=3),
+        MenuItem(id="c", name="C", price=600, recommendation_score=5)
+    ])
+    manager.sort_menu_by_recommendation()
+    assert manager.get_state().menu_order == ["c", "b", "a"]
+    
+    manager.update_menu_item("a", recommendation_score=5, price=100)
+    manager.sort_menu_by_recommendation()
+    assert manager.get_state().menu_order == ["a", "c", "b"]
+    
+    # 並び替え・編集を元に戻すとキーも編集前へ
+    assert manager.undo() and manager.undo()
+    manager.sort_menu_by_price()
+    assert [item.id for item in manager.get_ordered_menu()] == ["b", "c", "a"]
+
+def test_expired_sessions_pruned_without_creating_backup_dir(manager, tmp_path):
+    manager.state_store.put_snapshot("expired", 1, {"store": {"store_name_ja": "旧店"}})
+    manager.state_store._conn.execute(
+        "UPDATE sessions SET updated_at = ? WHERE session_id = 'expired'", ("2000-01-01T00:00:00+00:00",)
+    )
+    manager._auto_backup()
+    
+    assert manager.prune_expired_sessions() == 1
+    assert manager.state_store.load("expired") is None
+    assert manager.list_backups()
+    # 旧形式のバックアップディレクトリは作成しない
+    assert not (tmp_path / "data" / "backups").exists()
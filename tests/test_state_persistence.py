@@ -0,0 +1,169 @@
+"""
+TONOSAMA Professional System - State Persistence Tests
+差分ジャーナル（JSON-Patch）のスナップショット＋再生・欠落検出・コンパクション・再開のテスト
+"""
+
+import copy
+import random
+
+import pytest
+
+from modules.state_persistence import DeltaJournal, apply_json_patch, make_pointer
+from modules.state_store import SQLiteStateStore
+
+INITIAL = {
+    "title": "",
+    "menu": [{"id": "m0", "name": "料理0", "price": 0}],
+    "menu_order": ["m0"],
+    "generated_content": {}
+}
+
+@pytest.fixture
+def store(tmp_path):
+    opened = SQLiteStateStore(tmp_path / "state_store.db", keep_snapshots=3)
+    yield opened
+    opened.close()
+
+def random_edits(count, seed=0):
+    """状態の変更と対応する差分の組を順次生成"""
+    rng = random.Random(seed)
+    state = copy.deepcopy(INITIAL)
+    for n in range(1, count + 1):
+        kind = rng.choice(["add", "price", "remove", "content", "title"])
+        if kind == "add" or not state["menu"]:
+            item = {"id": f"m{n}", "name": f"料理{n}", "price": n}
+            state["menu"].append(item)
+            state["menu_order"].append(item["id"])
+            ops = [{"op": "add", "path": "/menu/-", "value": dict(item)},
+                   {"op": "add", "path": "/menu_order/-", "value": item["id"]}]
+        elif kind == "price":
+            index = rng.randrange(len(state["menu"]))
+            state["menu"][index]["price"] = n * 10
+            ops = [{"op": "replace", "path": make_pointer("menu", index, "price"), "value": n * 10}]
+        elif kind == "remove":
+            index = rng.randrange(len(state["menu"]))
+            removed = state["menu"].pop(index)
+            position = state["menu_order"].index(removed["id"])
+            del state["menu_order"][position]
+            ops = [{"op": "remove", "path": make_pointer("menu", index)},
+                   {"op": "remove", "path": make_pointer("menu_order", position)}]
+        elif kind == "content":
+            item_id = rng.choice(state["menu"])["id"]
+            state["generated_content"].setdefault(item_id, {})["en/ja"] = f"text {n}"
+            ops = [{"op": "add", "path": make_pointer("generated_content", item_id, "en/ja"), "value": f"text {n}"}]
+        else:
+            state["title"] = f"殿様~{n}"
+            ops = [{"op": "replace", "path": "/title", "value": state["title"]}]
+        yield copy.deepcopy(state), ops
+
+def test_apply_json_patch_escapes_and_appends():
+    document = {"content": {}, "order": ["a"]}
+    apply_json_patch(document, [
+        {"op": "add", "path": make_pointer("content", "m/1", "a~b"), "value": "x"},
+        {"op": "add", "path": "/order/-", "value": "b"},
+        {"op": "add", "path": "/order/0", "value": "z"},
+        {"op": "remove", "path": "/order/1"}
+    ])
+    
+    assert document == {"content": {"m/1": {"a~b": "x"}}, "order": ["z", "b"]}
+
+def test_snapshot_plus_journal_reproduces_state(store):
+    journal = DeltaJournal(store, compact_every=1000)
+    journal.stage_snapshot("s1", copy.deepcopy(INITIAL))
+    journal.flush("s1")
+    
+    for n, (expected, ops) in enumerate(random_edits(120), 1):
+        journal.record("s1", ops)
+        if n % 7 == 0:
+            journal.flush("s1")
+            assert journal.load("s1") == (n, expected)
+    journal.flush("s1")
+    
+    assert journal.load("s1") == (120, expected)
+    assert store.list_versions("s1")[0]["version"] == 0  # 再生のみ（スナップショットは初回のみ）
+
+def test_gap_stops_replay_at_last_contiguous_entry(store):
+    journal = DeltaJournal(store, compact_every=1000)
+    journal.stage_snapshot("s1", copy.deepcopy(INITIAL))
+    journal.flush("s1")
+    states = [copy.deepcopy(INITIAL)]
+    for expected, ops in random_edits(10):
+        journal.record("s1", ops)
+        states.append(expected)
+    journal.flush("s1")
+    
+    # 途中の欠落 - 欠落直前までの状態
+    store._conn.execute("DELETE FROM journal WHERE session_id = 's1' AND seq = 6")
+    assert journal.load("s1") == (5, states[5])
+    
+    # スナップショット直後の欠落 - スナップショットの状態へフォールバック
+    store._conn.execute("DELETE FROM journal WHERE session_id = 's1' AND seq = 1")
+    assert journal.load("s1") == (0, INITIAL)
+
+def test_compaction_bounds_journal_and_keeps_state(store):
+    journal = DeltaJournal(store, compact_every=25)
+    assert journal.compaction_due("s1")
+    states = {}
+    
+    for n, (expected, ops) in enumerate(random_edits(200), 1):
+        states[n] = expected
+        journal.record("s1", ops)
+        if journal.compaction_due("s1"):
+            journal.stage_snapshot("s1", copy.deepcopy(expected))
+        journal.flush("s1")
+        
+    versions = [v["version"] for v in store.list_versions("s1")]
+    # 初回記録時と以降25件ごと - 保持件数（3）を超えた古いスナップショットは削除
+    assert versions == [176, 151, 126]
+    
+    # 保持中の最古スナップショット以前の差分は削除済み
+    remaining = [seq for (seq,) in store._conn.execute("SELECT seq FROM journal WHERE session_id = 's1' ORDER BY seq")]
+    assert remaining[0] == 127 and remaining[-1] == 200
+    assert journal.load("s1") == (200, expected)
+    
+    # 過去バージョン指定時はその時点のスナップショット（再生なし）
+    assert journal.load("s1", 151) == (151, states[151])
+
+def test_resume_after_crash_continues_sequence(tmp_path):
+    db_path = tmp_path / "state_store.db"
+    edits = list(random_edits(12, seed=3))
+    
+    store = SQLiteStateStore(db_path)
+    journal = DeltaJournal(store)
+    journal.stage_snapshot("s1", copy.deepcopy(INITIAL))
+    for expected, ops in edits[:8]:
+        journal.record("s1", ops)
+    journal.flush("s1")
+    journal.record("s1", edits[8][1])  # 書き込み前にクラッシュ（失われる差分）
+    store.close()
+    
+    # 再起動後: 書き込み済みの差分まで復元し、シーケンス番号を引き継いで記録を継続
+    store = SQLiteStateStore(db_path)
+    journal = DeltaJournal(store)
+    seq, state = journal.load("s1")
+    assert (seq, state) == (8, edits[7][0])
+    
+    journal.resume("s1", seq)
+    state["title"] = "再開後"
+    assert journal.record("s1", [{"op": "replace", "path": "/title", "value": "再開後"}]) == 9
+    journal.flush("s1")
+    
+    assert journal.load("s1") == (9, state)
+    store.close()
+
+def test_resume_from_older_version_does_not_reuse_sequence(store):
+    journal = DeltaJournal(store, compact_every=1000)
+    journal.stage_snapshot("s1", copy.deepcopy(INITIAL))
+    for expected, ops in random_edits(5):
+        journal.record("s1", ops)
+    journal.flush("s1")
+    
+    # 過去バージョンの復元（StateManager._activate_restored_state と同じ手順）
+    seq, restored = journal.load("s1", 0)
+    journal.resume("s1", seq)
+    restored["title"] = "復元"
+    assert journal.record("s1", [{"op": "replace", "path": "/title", "value": "復元"}]) == 6
+    journal.stage_snapshot("s1", copy.deepcopy(restored))
+    journal.flush("s1")
+    
+    assert journal.load("s1") == (6, restored)
@@ -0,0 +1,84 @@
+"""
+TONOSAMA Professional System - State Store Tests
+セッション別状態ストアの保持件数・一覧・削除のテスト
+"""
+
+import pytest
+
+from modules.state_store import SQLiteStateStore
+
+@pytest.fixture
+def store(tmp_path):
+    opened = SQLiteStateStore(tmp_path / "state_store.db", keep_snapshots=3)
+    yield opened
+    opened.close()
+
+def state(store_name, version):
+    return {"store": {"store_name_ja": store_name}, "title": f"v{version}"}
+
+def journal_seqs(store, session_id):
+    return [seq for (seq,) in store._conn.execute(
+        "SELECT seq FROM journal WHERE session_id = ? ORDER BY seq", (session_id,)
+    )]
+
+def test_retention_is_per_session(store):
+    for version in range(1, 3):
+        store.put_snapshot("quiet", version, state("静か店", version))
+        
+    # 更新の多いセッションが保持件数を超えても他セッションのバックアップは残る
+    for version in range(1, 11):
+        store.append_journal("busy", [(version, '{"seq": %d, "ops": []}' % version)])
+        store.put_snapshot("busy", version, state("繁盛店", version))
+        
+    assert [v["version"] for v in store.list_versions("busy")] == [10, 9, 8]
+    assert [v["version"] for v in store.list_versions("quiet")] == [2, 1]
+    
+    # 保持中の最古スナップショット以前の差分は削除
+    assert journal_seqs(store, "busy") == [9, 10]
+    
+    assert store.load("busy", 7) is None
+    assert store.load("busy", 8)[1] == state("繁盛店", 8)
+
+def test_load_replays_only_entries_after_snapshot(store):
+    store.put_snapshot("s1", 2, state("店A", 2))
+    store.append_journal("s1", [(seq, '{"seq": %d, "ops": []}' % seq) for seq in range(1, 6)])
+    
+    version, data, entries = store.load("s1")
+    
+    assert version == 2 and data == state("店A", 2)
+    assert [entry["seq"] for entry in entries] == [3, 4, 5]
+    assert store.latest_seq("s1") == 5
+    assert store.load("s1", 2, replay=False)[2] == []
+
+def test_sessions_listed_by_last_update(store):
+    store.put_snapshot("s1", 1, state("店A", 1))
+    store.put_snapshot("s2", 1, state("店B", 1))
+    store.append_journal("s1", [(2, '{"seq": 2, "ops": []}')])
+    
+    sessions = store.list_sessions()
+    
+    assert [s["session_id"] for s in sessions] == ["s1", "s2"]
+    assert sessions[0]["store_name"] == "店A" and sessions[0]["latest_version"] == 1
+    assert store.list_sessions(limit=1)[0]["session_id"] == "s1"
+
+def test_delete_session_removes_all_rows(store):
+    store.put_snapshot("s1", 1, state("店A", 1))
+    store.append_journal("s1", [(2, '{"seq": 2, "ops": []}')])
+    store.put_snapshot("s2", 1, state("店B", 1))
+    
+    store.delete_session("s1")
+    
+    assert store.load("s1") is None and store.latest_seq("s1") == 0
+    assert [s["session_id"] for s in store.list_sessions()] == ["s2"]
+
+def test_prune_sessions_removes_only_expired(store):
+    store.put_snapshot("old", 1, state("旧店", 1))
+    store.append_journal("old", [(2, '{"seq": 2, "ops": []}')])
+    store.put_snapshot("new", 1, state("新店", 1))
+    store._conn.execute("UPDATE sessions SET updated_at = ? WHERE session_id = 'old'", ("2000-01-01T00:00:00+00:00",))
+    
+    assert store.prune_sessions(3600) == 1
+    
+    assert store.load("old") is None and journal_seqs(store, "old") == []
+    assert [s["session_id"] for s in store.list_sessions()] == ["new"]
+    assert store.prune_sessions(3600) == 0
@@ -0,0 +1,113 @@
+"""
+TONOSAMA Professional System - Workspace Tests
+複数店舗ワークスペースの店舗間分離・共有生成・一括パッケージ化のテスト
+"""
+
+import asyncio
+
+import pytest
+
+st = pytest.importorskip("streamlit")
+
+from modules.state_manager import MenuItem, StateManager, StoreInfo
+from modules.workspace import Workspace
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    workspace = Workspace("殿様チェーン")
+    workspace.add_dish(MenuItem(id="ramen", name="醤油ラーメン", price=900, recommendation_score=5))
+    workspace.add_dish(MenuItem(id="gyoza", name="餃子", price=400))
+    workspace.add_dish(MenuItem(id="beer", name="生ビール", price=600))
+    return workspace
+
+class FakeOpenAI:
+    def __init__(self):
+        self.calls = []
+        
+    async def generate_menu_description(self, menu_item, language, store_info):
+        self.calls.append((menu_item["id"], language))
+        return f"{menu_item['name']} ({language})"
+
+def test_branch_price_override_does_not_leak(workspace):
+    shibuya = workspace.add_branch(StoreInfo(store_name_ja="渋谷店"))
+    shinjuku = workspace.add_branch(StoreInfo(store_name_ja="新宿店"), ["ramen", "gyoza", "unknown"])
+    
+    workspace.set_price_override(shibuya, "ramen", 1100)
+    
+    assert [item.price for item in workspace.branch_menu(shibuya)] == [1100, 400, 600]
+    assert [item.price for item in workspace.branch_menu(shinjuku)] == [900, 400]
+    assert workspace.dishes["ramen"].price == 900
+    
+    workspace.set_price_override(shibuya, "ramen", None)
+    assert workspace.branch_menu(shibuya)[0] is workspace.dishes["ramen"]
+    assert workspace.shared_dish_counts() == {"ramen": 2, "gyoza": 2, "beer": 1}
+
+def test_branch_states_are_separate_sessions(workspace):
+    shibuya = workspace.add_branch(StoreInfo(store_name_ja="渋谷店"), ["gyoza", "ramen"])
+    shinjuku = workspace.add_branch(StoreInfo(store_name_ja="新宿店"), ["beer"])
+    
+    first, second = workspace.branch_state(shibuya), workspace.branch_state(shinjuku)
+    
+    assert first.session_id != second.session_id
+    assert first.menu_order == ["gyoza", "ramen"] and second.menu_order == ["beer"]
+    assert set(first.generated_content) == {"gyoza", "ramen"}
+    
+    # 共有食レポは全店舗へ反映
+    workspace.set_content("ramen", "en", "Soy ramen.")
+    assert workspace.branch_state(shibuya).generated_content["ramen"] == {"en": "Soy ramen."}
+    
+    other = Workspace("別チェーン")
+    assert other.dishes == {} and other.generated_content == {}
+
+def test_edits_in_opened_branch_stay_in_session(workspace, monkeypatch):
+    monkeypatch.delenv("TONOSAMA_STATE_BACKEND", raising=False)
+    monkeypatch.setattr(st, "session_state", {})
+    manager = StateManager()
+    shibuya = workspace.add_branch(StoreInfo(store_name_ja="渋谷店"))
+    shinjuku = workspace.add_branch(StoreInfo(store_name_ja="新宿店"))
+    workspace.set_content("ramen", "en", "Soy ramen.")
+    
+    workspace.open_branch(manager, shibuya)
+    manager.update_menu_item("ramen", price=1200, name="特製ラーメン")
+    manager.update_store_info(store_name_ja="渋谷本店")
+    manager.get_state().generated_content["ramen"]["en"] = "edited"
+    
+    # セッション内の編集は共有カタログ・他店舗へ波及しない
+    assert manager.get_state().menu[0].price == 1200
+    assert workspace.dishes["ramen"].price == 900 and workspace.dishes["ramen"].name == "醤油ラーメン"
+    assert workspace.branches[shibuya].store.store_name_ja == "渋谷店"
+    assert workspace.generated_content["ramen"] == {"en": "Soy ramen."}
+    assert workspace.branch_menu(shinjuku)[0].price == 900
+
+def test_shared_dishes_generated_once(workspace):
+    workspace.add_branch(StoreInfo(store_name_ja="渋谷店"), ["ramen", "gyoza"])
+    workspace.add_branch(StoreInfo(store_name_ja="新宿店"), ["ramen"])
+    workspace.set_content("gyoza", "en", "Gyoza.")
+    openai = FakeOpenAI()
+    
+    result = asyncio.run(workspace.generate_all(["en", "ko"], openai))
+    
+    # 未取り扱いの料理・生成済みの言語は対象外
+    assert sorted(openai.calls) == [("gyoza", "ko"), ("ramen", "en"), ("ramen", "ko")]
+    assert result == {"generated": 3, "branch_equivalent": 6}
+    assert workspace.generated_content["ramen"]["ko"] == "醤油ラーメン (ko)"
+    assert asyncio.run(workspace.generate_all(["en", "ko"], openai))["generated"] == 0
+
+def test_packages_are_built_per_branch(workspace):
+    from modules.blob_store import get_blob_store
+    
+    image_hash = get_blob_store().put(b"ramen image")
+    workspace.dishes["ramen"].image_hash = image_hash
+    workspace.dishes["ramen"].image_path = "ramen.jpg"
+    shibuya = workspace.add_branch(StoreInfo(store_name_ja="渋谷店"))
+    shinjuku = workspace.add_branch(StoreInfo(store_name_ja="新宿店"), ["gyoza"])
+    
+    packages = workspace.build_packages()
+    
+    assert packages[shibuya]["store_name"] == "渋谷店"
+    assert packages[shibuya]["images"] == {"ramen.jpg": b"ramen image"}
+    assert packages[shinjuku]["images"] == {}
+    
+    food_report = packages[shinjuku]["food_report_csv"].read().decode("utf-8-sig")
+    assert "餃子" in food_report and "醤油ラーメン" not in food_report